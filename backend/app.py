@@ -6,8 +6,19 @@ from flask_cors import CORS
 from backend.config import config
 from backend.models import db, User
 from backend.utils.preprocessing import processor
+from backend.utils.nlp_model import model_manager
 from backend.database.database_service import DatabaseService
+from backend.services.question_index import question_index
+from backend.services.index_store import ensure_bank_version
+from backend.services.response_cache import response_cache, negative_cache
+from backend.services.micro_batcher import micro_batcher
+from backend.services.nlp_pool import nlp_pool
+from backend.services.message_writer import message_writer
+from backend.services.usage_counter import usage_counter
+from backend.services.conversation_cache import conversation_cache
+from backend.services.conversation_sweeper import conversation_sweeper
 from backend.admin import init_admin
+from backend.cli import init_cli
 from backend.routes.chatbot_routes import chatbot_bp
 
 # Configurar logging
@@ -27,10 +38,22 @@ def create_app(config_name='development'):
     # Inicializar extensiones
     db.init_app(app)
     login_manager.init_app(app)
+    model_manager.init_app(app)
+    question_index.init_app(app)
+    response_cache.init_app(app)
+    negative_cache.init_app(app)
+    micro_batcher.init_app(app)
+    nlp_pool.init_app(app)
+    message_writer.init_app(app)
+    usage_counter.init_app(app)
+    conversation_cache.init_app(app)
+    conversation_sweeper.init_app(app)
     # Configurar sesiones
     app.secret_key = app.config['SECRET_KEY']
     # Inicializar panel de administración
     init_admin(app)
+    # Comandos de línea de órdenes (flask index build)
+    init_cli(app)
     
     # Registrar blueprints
     app.register_blueprint(chatbot_bp)
@@ -58,17 +81,16 @@ def get_response(user_input):
         if not session_id:
             session_id = f"session_{int(datetime.utcnow().timestamp())}"
             session['session_id'] = session_id
-        # Usar el servicio de base de datos
-        response, confidence = DatabaseService.get_best_response(user_input, session_id)
+        # Usar el servicio de base de datos (el análisis se reutiliza en el resultado)
+        result = DatabaseService.get_best_response(user_input, session_id)
+        response = result.response
         
         # Log para debugging
-        intent = processor.extract_intent(user_input)
-        keywords = processor.extract_keywords(user_input)
-        
-        logger.info(f"Usuario: '{user_input}' | Intención: {intent['type']} | Confianza: {confidence:.2f} | Keywords: {keywords}")
+        timings = ', '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in result.timings.items())
+        logger.info(f"Usuario: '{user_input}' | Intención: {result.intent} | Confianza: {result.confidence:.2f} | Keywords: {result.keywords} | Tiempos: {timings}")
         
         # Si la confianza es muy baja, sugerir reformular
-        if confidence < 0.3 and intent['type'] == 'question':
+        if result.confidence < 0.3 and result.intent == 'question':
             response += "\n\n💡 **Sugerencia**: Intenta reformular tu pregunta o usar palabras más específicas."
         
         return response
@@ -81,6 +103,12 @@ def get_response(user_input):
 def home():
     return jsonify({"message": "API del chatbot funcionando"})
 
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Estado de preparación del modelo de lenguaje"""
+    status = model_manager.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/get_response', methods=['POST'])
 def chatbot_response():
     """Endpoint para obtener respuesta del chatbot"""
@@ -107,13 +135,18 @@ def analyze_text():
         if not text:
             return jsonify({'error': 'Texto requerido'}), 400
         
-        # Análisis completo del texto
-        analysis = {
-            'keywords': processor.extract_keywords(text),
-            'intent': processor.extract_intent(text),
-            'question_type': processor.extract_question_type(text),
-            'processed_tokens': processor.preprocess(text)
-        }
+        if nlp_pool.enabled:
+            # Análisis en un proceso de trabajo
+            analysis = nlp_pool.analyze(text)
+        else:
+            # Análisis completo del texto (spaCy se ejecuta una sola vez)
+            analyzed = processor.analyze(text)
+            analysis = {
+                'keywords': processor.extract_keywords(analyzed),
+                'intent': processor.extract_intent(analyzed),
+                'question_type': processor.extract_question_type(analyzed),
+                'processed_tokens': processor.preprocess(analyzed)
+            }
         
         return jsonify(analysis)
         
@@ -242,8 +275,11 @@ def setup_database():
     """Configurar base de datos en el primer request"""
     try:
         db.create_all()
+        ensure_bank_version()
         logger.info("Base de datos inicializada correctamente")
         DatabaseService.save_daily_stats()
+        # Construir el índice de preguntas antes de atender peticiones
+        question_index.rebuild()
     except Exception as e:
         logger.error(f"Error configurando base de datos: {e}")
 
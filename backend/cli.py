@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Comandos de línea de órdenes de la aplicación (flask ...)
+"""
+
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from backend.database.schema import (EXPLAIN_DIALECTS, check_query_plans, create_missing_indexes,
+                                     invalid_indexes, missing_indexes)
+from backend.models import db
+from backend.services.conversation_sweeper import conversation_sweeper
+from backend.services.index_store import bank_signature, ensure_bank_version, read_header, save_index
+from backend.services.question_index import QuestionIndex, question_index
+from backend.utils.nlp_model import model_manager
+
+index_cli = AppGroup('index', help='Índice de preguntas en disco')
+conversations_cli = AppGroup('conversations', help='Conversaciones de los usuarios')
+schema_cli = AppGroup('schema', help='Índices y planes de consulta de la base de datos')
+
+
+@index_cli.command('build')
+@click.option('--path', default=None, help='Archivo de salida (por defecto QUESTION_INDEX_PATH)')
+def build_index(path):
+    """Construir el índice de preguntas y guardarlo en disco"""
+    path = path or current_app.config['QUESTION_INDEX_PATH']
+
+    start = time.time()
+    signature = bank_signature()
+    index = question_index.ensure_ann(QuestionIndex.from_database())
+    save_index(index, path, model_manager.model_name, signature)
+
+    size = os.path.getsize(path) / (1024 * 1024)
+    click.echo(f'Índice con {len(index)} preguntas guardado en {path} ({size:.1f} MB, {time.time() - start:.1f}s)')
+
+
+@index_cli.command('info')
+@click.option('--path', default=None, help='Archivo del índice (por defecto QUESTION_INDEX_PATH)')
+def index_info(path):
+    """Mostrar la cabecera del índice y si está al día con el banco"""
+    path = path or current_app.config['QUESTION_INDEX_PATH']
+    if not os.path.exists(path):
+        raise click.ClickException(f'No existe el índice {path}; créalo con: flask index build')
+
+    header = read_header(path)
+    up_to_date = (header['bank_signature'] == bank_signature()
+                  and header['model_name'] == model_manager.model_name)
+
+    click.echo(f'Archivo:   {path}')
+    click.echo(f"Formato:   {header['format_version']}")
+    click.echo(f"Preguntas: {header['questions']}")
+    if 'ann.centroids' in header['arrays']:
+        click.echo(f"IVF:       {header['arrays']['ann.centroids']['shape'][0]} listas")
+    click.echo(f"Modelo:    {header['model_name']}")
+    click.echo(f"Creado:    {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(header['created_at']))}")
+    click.echo(f"Estado:    {'al día' if up_to_date else 'desactualizado'}")
+
+
+@conversations_cli.command('sweep')
+@click.option('--idle', type=float, default=None,
+              help='Segundos sin mensajes para cerrar una conversación (por defecto CONVERSATION_IDLE_TIMEOUT)')
+def sweep_conversations(idle):
+    """Cerrar ahora las conversaciones inactivas"""
+    if idle is not None:
+        conversation_sweeper.idle_timeout = idle
+
+    start = time.time()
+    closed = conversation_sweeper.sweep()
+    click.echo(f'{closed} conversaciones cerradas en {time.time() - start:.2f}s; '
+               f'abiertas: {conversation_sweeper.open_conversations()}')
+
+
+@schema_cli.command('indexes')
+def schema_indexes():
+    """Mostrar los índices declarados en los modelos que faltan en la base de datos"""
+    missing = missing_indexes()
+    if not missing:
+        click.echo('Todos los índices de los modelos existen en la base de datos')
+        return
+    invalid = invalid_indexes()
+    for index in missing:
+        columns = ', '.join(column.name for column in index.columns)
+        status = 'No válido' if index.name in invalid else 'Falta'
+        click.echo(f'{status} {index.name} en {index.table.name} ({columns})')
+
+
+@schema_cli.command('migrate')
+@click.option('--dry-run', is_flag=True, help='Mostrar las sentencias sin ejecutarlas')
+def schema_migrate(dry_run):
+    """Crear la tabla bank_version si falta y los índices que faltan sin bloquear las tablas"""
+    start = time.time()
+    if ensure_bank_version(dry_run=dry_run):
+        click.echo(f"Versión del banco (tabla bank_version) {'por crear' if dry_run else 'creada'}")
+    statements = create_missing_indexes(dry_run=dry_run, echo=click.echo)
+    if dry_run:
+        for statement in statements:
+            click.echo(statement)
+    created = sum(1 for statement in statements if statement.startswith('CREATE'))
+    click.echo(f"{created} índices {'por crear' if dry_run else 'creados'} "
+               f'({time.time() - start:.1f}s)')
+
+
+@schema_cli.command('explain')
+@click.option('--max-rows', type=int, default=None,
+              help='Filas a partir de las que un recorrido completo falla (por defecto QUERY_PLAN_MAX_SCAN_ROWS)')
+def schema_explain(max_rows):
+    """Comprobar con EXPLAIN que las consultas de DatabaseService usan índices"""
+    dialect = db.engine.dialect.name
+    if dialect not in EXPLAIN_DIALECTS:
+        raise click.ClickException(f"EXPLAIN no soportado para {dialect} (soportados: {', '.join(EXPLAIN_DIALECTS)})")
+    if max_rows is None:
+        max_rows = current_app.config['QUERY_PLAN_MAX_SCAN_ROWS']
+
+    scans, analyzed = check_query_plans(max_rows)
+    failures = [scan for scan in scans if scan.filtered]
+    for scan in scans:
+        label = 'FALLA' if scan.filtered else 'aviso'
+        click.echo(f'{label}: {scan.source} recorre {scan.table} ({scan.rows} filas)')
+        click.echo(f"  {' '.join(scan.statement.split())[:200]}")
+        for line in scan.plan:
+            click.echo(f'    {line}')
+
+    click.echo(f'{analyzed} consultas analizadas; {len(failures)} recorridos completos con filtro '
+               f'y {len(scans) - len(failures)} sin filtro en tablas de más de {max_rows} filas')
+    if failures:
+        raise SystemExit(1)
+
+
+def init_cli(app):
+    """
+    Registrar los comandos en la aplicación
+    """
+    app.cli.add_command(index_cli)
+    app.cli.add_command(conversations_cli)
+    app.cli.add_command(schema_cli)
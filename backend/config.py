@@ -18,6 +18,91 @@ class Config:
     CHATBOT_VERSION = "2.0.0"
     DEFAULT_LANGUAGE = "es"
     
+    # Modelo de spaCy: 'lazy' (primer uso), 'background' (hilo al crear la app) o 'eager'
+    SPACY_MODEL = os.environ.get('SPACY_MODEL') or 'es_core_news_sm'
+    NLP_LOAD_MODE = os.environ.get('NLP_LOAD_MODE') or 'background'
+    NLP_WARMUP_TEXTS = None  # Textos de calentamiento del pipeline (None = los predeterminados)
+    
+    # Configuraciones de búsqueda de preguntas
+    # 'all' puntúa todo el banco si la entrada no comparte términos con ninguna pregunta, 'none' no responde
+    MATCH_CANDIDATE_FALLBACK = os.environ.get('MATCH_CANDIDATE_FALLBACK') or 'all'
+    # Candidatos que pasan de la etapa léxica al reordenamiento semántico (0 = todos)
+    MATCH_RERANK_TOP_N = int(os.environ.get('MATCH_RERANK_TOP_N') or 50)
+    MATCH_WEIGHT_SEMANTIC = float(os.environ.get('MATCH_WEIGHT_SEMANTIC') or 0.5)
+    MATCH_WEIGHT_LEXICAL = float(os.environ.get('MATCH_WEIGHT_LEXICAL') or 0.3)
+    MATCH_WEIGHT_CHARACTER = float(os.environ.get('MATCH_WEIGHT_CHARACTER') or 0.2)
+    # Candidatas por trigramas cuando ningún lema coincide (0 = desactivado)
+    MATCH_TRIGRAM_CANDIDATES = int(os.environ.get('MATCH_TRIGRAM_CANDIDATES') or 50)
+    # Similitud de caracteres: 'trigram' o 'sequence' (difflib, más lenta)
+    MATCH_CHARACTER_SCORER = os.environ.get('MATCH_CHARACTER_SCORER') or 'trigram'
+    # Etapa léxica: 'jaccard' o 'bm25' (parámetros k1 y b y pesos de pregunta, palabras clave y sinónimos)
+    MATCH_LEXICAL_SCORER = os.environ.get('MATCH_LEXICAL_SCORER') or 'jaccard'
+    MATCH_BM25_K1 = float(os.environ.get('MATCH_BM25_K1') or 1.2)
+    MATCH_BM25_B = float(os.environ.get('MATCH_BM25_B') or 0.75)
+    MATCH_BM25_FIELD_WEIGHTS = os.environ.get('MATCH_BM25_FIELD_WEIGHTS') or '1.0,0.7,0.5'
+    # Búsqueda por vector sin candidatos léxicos: 'exact' o 'ivf' (aproximada; listas exploradas y vecinos)
+    MATCH_VECTOR_SEARCH = os.environ.get('MATCH_VECTOR_SEARCH') or 'exact'
+    MATCH_ANN_PROBES = int(os.environ.get('MATCH_ANN_PROBES') or 8)
+    MATCH_ANN_CANDIDATES = int(os.environ.get('MATCH_ANN_CANDIDATES') or 100)
+    # Índice de preguntas en disco (lo escribe `flask index build`; se abre al arrancar si está al día)
+    QUESTION_INDEX_PATH = os.environ.get('QUESTION_INDEX_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'question_index.qidx')
+    # Compactar el índice cuando las filas borradas o añadidas superan esta fracción
+    INDEX_COMPACT_RATIO = float(os.environ.get('INDEX_COMPACT_RATIO') or 0.1)
+    # Instantáneas anteriores del índice que se conservan para poder revertir
+    INDEX_SNAPSHOT_HISTORY = int(os.environ.get('INDEX_SNAPSHOT_HISTORY') or 1)
+    # Segundos entre comprobaciones de la versión del banco para recoger los cambios
+    # hechos en otros procesos (0 = no comprobar)
+    INDEX_VERSION_CHECK_INTERVAL = float(os.environ.get('INDEX_VERSION_CHECK_INTERVAL') or 2.0)
+    # Workers que atienden la aplicación (lo fija gunicorn.conf.py). Con más de uno
+    # no se puede revertir el índice: las instantáneas son de cada proceso
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS') or 1)
+    # Listas del IVF (0 = raíz cuadrada del banco) y preguntas mínimas para entrenarlo
+    INDEX_ANN_LISTS = int(os.environ.get('INDEX_ANN_LISTS') or 0)
+    INDEX_ANN_MIN_QUESTIONS = int(os.environ.get('INDEX_ANN_MIN_QUESTIONS') or 20000)
+    # Textos por lote de nlp.pipe en /api/match/batch y máximo de entradas por petición
+    MATCH_BATCH_SIZE = int(os.environ.get('MATCH_BATCH_SIZE') or 256)
+    MATCH_BATCH_MAX_INPUTS = int(os.environ.get('MATCH_BATCH_MAX_INPUTS') or 5000)
+    # Microlotes de peticiones concurrentes (ventana en milisegundos y tamaño máximo del lote)
+    MICRO_BATCH_ENABLED = os.environ.get('MICRO_BATCH_ENABLED', 'false').lower() == 'true'
+    MICRO_BATCH_WINDOW_MS = float(os.environ.get('MICRO_BATCH_WINDOW_MS') or 2.0)
+    MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE') or 32)
+    # Pool de procesos para spaCy y la búsqueda (tamaño, segundos por trabajo, trabajos antes de reciclar).
+    # Un trabajo que supera NLP_POOL_TIMEOUT falla en la petición pero su proceso sigue ocupado
+    # hasta terminarlo: el pool se sustituye por otro y el anterior se cierra al acabar
+    NLP_POOL_ENABLED = os.environ.get('NLP_POOL_ENABLED', 'false').lower() == 'true'
+    NLP_POOL_SIZE = int(os.environ.get('NLP_POOL_SIZE') or os.cpu_count() or 1)
+    NLP_POOL_TIMEOUT = float(os.environ.get('NLP_POOL_TIMEOUT') or 10.0)
+    NLP_POOL_MAX_TASKS_PER_CHILD = int(os.environ.get('NLP_POOL_MAX_TASKS_PER_CHILD') or 1000)
+    # Registro de mensajes en segundo plano (tamaño de la cola, mensajes por lote, segundos
+    # entre escrituras y espera máxima de una petición con la cola llena antes de descartar)
+    MESSAGE_WRITER_ENABLED = os.environ.get('MESSAGE_WRITER_ENABLED', 'true').lower() == 'true'
+    MESSAGE_WRITER_QUEUE_SIZE = int(os.environ.get('MESSAGE_WRITER_QUEUE_SIZE') or 10000)
+    MESSAGE_WRITER_BATCH_SIZE = int(os.environ.get('MESSAGE_WRITER_BATCH_SIZE') or 500)
+    MESSAGE_WRITER_FLUSH_INTERVAL = float(os.environ.get('MESSAGE_WRITER_FLUSH_INTERVAL') or 1.0)
+    MESSAGE_WRITER_PUT_TIMEOUT = float(os.environ.get('MESSAGE_WRITER_PUT_TIMEOUT') or 0.05)
+    # Contadores de uso acumulados en memoria y guardados cada tantos segundos
+    USAGE_COUNTER_ENABLED = os.environ.get('USAGE_COUNTER_ENABLED', 'true').lower() == 'true'
+    USAGE_COUNTER_FLUSH_INTERVAL = float(os.environ.get('USAGE_COUNTER_FLUSH_INTERVAL') or 5.0)
+    
+    # Caché de respuestas (entradas máximas, 0 = desactivada; tiempo de vida en segundos)
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES') or 2048)
+    RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL') or 600)
+    # Caché de entradas sin respuesta
+    NEGATIVE_CACHE_MAX_ENTRIES = int(os.environ.get('NEGATIVE_CACHE_MAX_ENTRIES') or 4096)
+    NEGATIVE_CACHE_TTL = float(os.environ.get('NEGATIVE_CACHE_TTL') or 300)
+    # Caché sesión -> conversación activa (segundos sin mensajes antes de olvidar la sesión)
+    CONVERSATION_CACHE_MAX_ENTRIES = int(os.environ.get('CONVERSATION_CACHE_MAX_ENTRIES') or 10000)
+    CONVERSATION_CACHE_TTL = float(os.environ.get('CONVERSATION_CACHE_TTL') or 1800)
+    # Cierre de conversaciones sin mensajes durante CONVERSATION_IDLE_TIMEOUT segundos
+    # (mayor que CONVERSATION_CACHE_TTL), cada tantos segundos y por lotes
+    CONVERSATION_SWEEPER_ENABLED = os.environ.get('CONVERSATION_SWEEPER_ENABLED', 'true').lower() == 'true'
+    CONVERSATION_IDLE_TIMEOUT = float(os.environ.get('CONVERSATION_IDLE_TIMEOUT') or 3600)
+    CONVERSATION_SWEEP_INTERVAL = float(os.environ.get('CONVERSATION_SWEEP_INTERVAL') or 300)
+    CONVERSATION_SWEEP_BATCH_SIZE = int(os.environ.get('CONVERSATION_SWEEP_BATCH_SIZE') or 500)
+    # flask schema explain: filas a partir de las que un recorrido completo de tabla falla
+    QUERY_PLAN_MAX_SCAN_ROWS = int(os.environ.get('QUERY_PLAN_MAX_SCAN_ROWS') or 1000)
+    
     # Configuraciones de logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
     LOG_FILE = 'chatbot.log'
@@ -36,7 +121,12 @@ class TestingConfig(Config):
     """Configuración para testing"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    NLP_LOAD_MODE = 'lazy'
     WTF_CSRF_ENABLED = False
+    # Los mensajes y los contadores se guardan dentro de la petición para poder comprobarlos
+    MESSAGE_WRITER_ENABLED = False
+    USAGE_COUNTER_ENABLED = False
+    CONVERSATION_SWEEPER_ENABLED = False
 
 # Diccionario de configuraciones
 config = {
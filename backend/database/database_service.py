@@ -5,41 +5,66 @@ Servicio de base de datos para el chatbot
 
 import time
 import json
+from dataclasses import dataclass, field
 from datetime import datetime, date
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 from backend.models import db, Question, Category, Conversation, Message, User, SystemLog, ChatbotStats
-from backend.utils.preprocessing import processor
+from backend.utils.preprocessing import processor, AnalyzedText, TextInput
+from backend.services.question_index import question_index, QuestionIndex
+from backend.services.response_cache import response_cache, negative_cache, CachedMatch
+from backend.services.micro_batcher import micro_batcher
+from backend.services.nlp_pool import nlp_pool
+from backend.services.message_writer import message_writer, MessageRecord
+from backend.services.conversation_cache import active_conversation_ids, add_message_counts, conversation_cache
+
+@dataclass
+class ResponseResult:
+    """Resultado estructurado de get_best_response"""
+    response: str
+    confidence: float
+    intent: str
+    keywords: List[str] = field(default_factory=list)
+    question_id: Optional[int] = None
+    timings: Dict[str, float] = field(default_factory=dict)  # Segundos por etapa
 
 class DatabaseService:
     """Servicio para manejar operaciones de base de datos"""
     
     @staticmethod
-    def get_best_response(user_input: str, session_id: Optional[str] = None) -> Tuple[str, float]:
+    def get_best_response(user_input: TextInput, session_id: Optional[str] = None) -> ResponseResult:
         """
-        Obtener la mejor respuesta desde la base de datos
+        Obtener la mejor respuesta desde la base de datos.
+        Acepta texto o un AnalyzedText ya procesado; el análisis se reutiliza
+        para el registro del mensaje y lo devuelve el resultado.
         """
         start_time = time.time()
+        timings = {}
+        intent_type = 'question'
+        keywords = None
         
         try:
-            # Extraer intención
-            intent = processor.extract_intent(user_input)
+            # Analizar la entrada una sola vez
+            analysis = processor.analyze(user_input)
+            intent_type = analysis.intent_type
+            question_id = None
             
             # Manejar intenciones especiales
-            if intent['type'] == 'greeting':
+            if intent_type == 'greeting':
                 response = "¡Hola! Soy tu asistente académico. ¿En qué puedo ayudarte hoy?"
                 confidence = 1.0
-            elif intent['type'] == 'farewell':
+            elif intent_type == 'farewell':
                 response = "¡Hasta luego! ¡Mucho éxito en tus estudios!"
                 confidence = 1.0
-            elif intent['type'] == 'thanks':
+            elif intent_type == 'thanks':
                 response = "¡De nada! Estoy aquí para ayudarte."
                 confidence = 1.0
             else:
-                # Buscar en la base de datos
-                best_match, confidence = DatabaseService._find_best_question(user_input)
+                # Buscar la pregunta (coincidencia exacta, caché o búsqueda completa)
+                best_match, confidence, keywords = DatabaseService._match_question(analysis, timings)
                 
                 if best_match and confidence >= 0.3:
                     response = best_match.answer_text
+                    question_id = best_match.id
                     # Incrementar contador de uso
                     best_match.increment_usage()
                 else:
@@ -49,101 +74,331 @@ class DatabaseService:
             # Calcular tiempo de respuesta
             response_time = time.time() - start_time
             
+            result = ResponseResult(
+                response=response,
+                confidence=confidence,
+                intent=intent_type,
+                keywords=keywords if keywords is not None else analysis.keywords,
+                question_id=question_id,
+                timings=timings
+            )
+            
             # Guardar mensaje en la base de datos
-            DatabaseService._save_message(user_input, response, intent, confidence, response_time, session_id)
+            stage_start = time.time()
+            DatabaseService._save_message(analysis, result, response_time, session_id)
+            timings['save'] = time.time() - stage_start
+            timings['total'] = time.time() - start_time
             
-            return response, confidence
+            return result
             
         except Exception as e:
             # Log del error
             DatabaseService._log_error(f"Error obteniendo respuesta: {str(e)}")
-            return "Lo siento, tuve un problema procesando tu pregunta. ¿Podrías intentar de nuevo?", 0.0
+            return ResponseResult(
+                response="Lo siento, tuve un problema procesando tu pregunta. ¿Podrías intentar de nuevo?",
+                confidence=0.0,
+                intent=intent_type,
+                timings=timings
+            )
     
     @staticmethod
-    def _find_best_question(user_input: str) -> Tuple[Optional[Question], float]:
+    def match_batch(inputs: List[str], top_k: int = 1, log_messages: bool = False,
+                    session_id: Optional[str] = None, batch_size: int = 256) -> List[Dict]:
         """
-        Encontrar la mejor pregunta en la base de datos
+        Buscar las mejores preguntas para un lote de entradas.
+        Procesa los textos con nlp.pipe y los puntúa contra el índice por
+        tramos de `batch_size`; opcionalmente guarda cada entrada como mensaje.
         """
         try:
-            # Obtener todas las preguntas activas
-            questions = Question.query.filter_by(is_active=True).all()
+            return list(DatabaseService.iter_match_batch(inputs, top_k, log_messages, session_id, batch_size))
+        except Exception as e:
+            DatabaseService._log_error(f"Error buscando lote de preguntas: {str(e)}")
+            db.session.rollback()
+            return []
+    
+    @staticmethod
+    def iter_match_batch(inputs: List[str], top_k: int = 1, log_messages: bool = False,
+                         session_id: Optional[str] = None, batch_size: int = 256) -> Iterator[Dict]:
+        """
+        Como `match_batch`, pero devolviendo los resultados de cada tramo de
+        `batch_size` entradas en cuanto están listos (la memoria no crece con
+        el tamaño del lote). Los errores se propagan a quien itera.
+        """
+        # Todo el lote se puntúa con la misma instantánea del índice
+        index = question_index.get()
+        session_id = session_id or f"batch_{int(time.time())}"
+        
+        for chunk_start in range(0, len(inputs), batch_size):
+            start_time = time.time()
+            analyses = processor.analyze_many(inputs[chunk_start:chunk_start + batch_size], batch_size=batch_size)
+            ranked = index.search_many(analyses, threshold=0.3, top_k=top_k, settings=question_index.settings)
+            
+            # Misma redacción que una pregunta del banco: confianza máxima
+            for analysis, matches in zip(analyses, ranked):
+                exact_id = index.lookup_exact(analysis)
+                if exact_id is not None:
+                    matches[:] = [(exact_id, 1.0)] + [m for m in matches if m[0] != exact_id][:top_k - 1]
+            
+            # Cargar las preguntas encontradas en el tramo con una sola consulta
+            question_ids = {question_id for matches in ranked for question_id, _ in matches}
+            questions = {q.id: q for q in Question.query.filter(Question.id.in_(question_ids)).all()} if question_ids else {}
+            
+            results = []
+            for analysis, matches in zip(analyses, ranked):
+                results.append({
+                    'input': analysis.text,
+                    'intent': analysis.intent_type,
+                    'keywords': analysis.keywords,
+                    'matches': [
+                        {
+                            'question_id': question_id,
+                            'question': questions[question_id].question_text,
+                            'answer': questions[question_id].answer_text,
+                            'confidence': confidence
+                        }
+                        for question_id, confidence in matches if question_id in questions
+                    ]
+                })
             
-            if not questions:
-                return None, 0.0
+            if log_messages:
+                response_time = (time.time() - start_time) / max(len(results), 1)
+                DatabaseService._save_batch_messages(results, response_time, session_id)
+            
+            yield from results
+    
+    @staticmethod
+    def _match_question(analysis: AnalyzedText, timings: Dict[str, float]) -> Tuple[Optional[Question], float, Optional[List[str]]]:
+        """
+        Buscar la pregunta que responde a la entrada, de la vía más barata a la
+        más cara: coincidencia exacta, caché de respuestas, caché de entradas
+        sin respuesta y búsqueda completa.
+        Devuelve la pregunta, la confianza y las palabras clave. Si la búsqueda
+        falla no se guarda nada en las cachés (un error no es "sin respuesta").
+        """
+        # Toda la petición usa la misma instantánea del índice, y su versión
+        # identifica el banco en las cachés
+        index = question_index.get()
+        bank_version = index.version
+        
+        # Misma redacción que una pregunta del banco: sin spaCy ni puntuación
+        # (y por tanto sin palabras clave de la entrada que registrar)
+        stage_start = time.time()
+        question = DatabaseService._find_exact_question(analysis, index)
+        timings['exact'] = time.time() - stage_start
+        if question:
+            return question, 1.0, []
+        
+        # Entrada ya respondida con esta versión del banco
+        stage_start = time.time()
+        cached = response_cache.get(analysis.normalized, bank_version)
+        question = Question.query.get(cached.question_id) if cached else None
+        timings['cache'] = time.time() - stage_start
+        if question:
+            return question, cached.confidence, cached.keywords
+        
+        # Entrada que ya se buscó sin éxito con esta versión del banco
+        keywords = negative_cache.get(analysis.normalized, bank_version)
+        if keywords is not None:
+            return None, 0.0, keywords
+        
+        if nlp_pool.enabled:
+            # spaCy y la búsqueda se ejecutan en un proceso de trabajo
+            stage_start = time.time()
+            found = DatabaseService._find_best_question_in_pool(analysis, index)
+            timings['matching'] = time.time() - stage_start
+        else:
+            # Procesar con spaCy (única pasada de la petición); con microlotes se
+            # procesa junto con las peticiones concurrentes y cuenta como matching
+            if not micro_batcher.enabled:
+                stage_start = time.time()
+                analysis.doc
+                timings['nlp'] = time.time() - stage_start
+            
+            # Buscar en el índice de preguntas
+            stage_start = time.time()
+            found = DatabaseService._find_best_question(analysis, index)
+            timings['matching'] = time.time() - stage_start
+            if found is not None:
+                found = found + (analysis.keywords,)
+        
+        if found is None:
+            return None, 0.0, None
+        question, confidence, keywords = found
+        
+        if question and confidence >= 0.3:
+            response_cache.set(analysis.normalized, bank_version, CachedMatch(
+                question_id=question.id,
+                confidence=confidence,
+                intent=analysis.intent_type,
+                keywords=keywords
+            ))
+        else:
+            negative_cache.add(analysis.normalized, bank_version, keywords)
+        
+        return question, confidence, keywords
+    
+    @staticmethod
+    def _find_exact_question(user_input: TextInput, index: Optional[QuestionIndex] = None) -> Optional[Question]:
+        """
+        Buscar una pregunta con la misma redacción normalizada que la entrada
+        (en la instantánea dada o en la actual)
+        """
+        try:
+            question_id = (index or question_index.get()).lookup_exact(user_input)
+            return Question.query.get(question_id) if question_id is not None else None
             
-            best_match = None
-            best_score = 0.0
+        except Exception as e:
+            DatabaseService._log_error(f"Error buscando coincidencia exacta: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _find_best_question(user_input: TextInput, index: Optional[QuestionIndex] = None) -> Optional[Tuple[Optional[Question], float]]:
+        """
+        Encontrar la mejor pregunta en la base de datos (en la instantánea
+        dada o en la actual). Devuelve None si la búsqueda falla.
+        """
+        try:
+            # Puntuar contra el índice precalculado de preguntas activas
+            if micro_batcher.enabled:
+                question_id, best_score = micro_batcher.search(processor.analyze(user_input), threshold=0.3, index=index)
+            else:
+                index = index or question_index.get()
+                question_id, best_score = index.search(user_input, threshold=0.3, settings=question_index.settings)
             
-            for question in questions:
-                score = processor.calculate_similarity(user_input, question.question_text)
-                if score > best_score and score >= 0.3:
-                    best_score = score
-                    best_match = question
+            if question_id is None:
+                return None, 0.0
             
-            return best_match, best_score
+            return Question.query.get(question_id), best_score
             
         except Exception as e:
             DatabaseService._log_error(f"Error buscando pregunta: {str(e)}")
-            return None, 0.0
+            return None
     
     @staticmethod
-    def _save_message(user_input: str, bot_response: str, intent: Dict, confidence: float, response_time: float, session_id: Optional[str] = None):
+    def _find_best_question_in_pool(analysis: AnalyzedText, index: Optional[QuestionIndex] = None) -> Optional[Tuple[Optional[Question], float, List[str]]]:
         """
-        Guardar mensaje en la base de datos
+        Encontrar la mejor pregunta usando el pool de procesos NLP (con la
+        versión de la instantánea dada, si se da). Si el pool falla (tiempo
+        agotado, trabajo atascado o pool roto) se busca en este proceso; devuelve
+        None solo si también falla esa búsqueda.
         """
         try:
-            # Obtener o crear conversación
-            conversation = DatabaseService._get_or_create_conversation(session_id)
+            question_id, best_score, keywords = nlp_pool.match(analysis.text, threshold=0.3, index=index)
+            
+            if question_id is None:
+                return None, 0.0, keywords
+            
+            return Question.query.get(question_id), best_score, keywords
+            
+        except Exception as e:
+            DatabaseService._log_error(f"Error buscando pregunta en el pool NLP: {str(e) or type(e).__name__}")
+        
+        found = DatabaseService._find_best_question(analysis, index)
+        return found + (analysis.keywords,) if found is not None else None
+    
+    @staticmethod
+    def _save_message(analysis: AnalyzedText, result: ResponseResult, response_time: float, session_id: Optional[str] = None):
+        """
+        Guardar mensaje en la base de datos (o encolarlo para el registro en
+        segundo plano si está activado)
+        """
+        session_id = session_id or f"anon_{int(time.time())}"
+        if message_writer.enabled:
+            message_writer.submit(MessageRecord(
+                session_id=session_id,
+                question_id=result.question_id,
+                user_input=analysis.text,
+                bot_response=result.response,
+                intent_detected=result.intent,
+                confidence_score=result.confidence,
+                response_time=response_time,
+                keywords_extracted=', '.join(result.keywords)
+            ))
+            return
+        
+        try:
+            # Conversación activa de la sesión (de la caché, o creada en esta transacción)
+            conversation_id = active_conversation_ids([session_id])[session_id]
             
             # Crear mensaje
             message = Message(
-                conversation_id=conversation.id,
-                user_input=user_input,
-                bot_response=bot_response,
-                intent_detected=intent['type'],
-                confidence_score=confidence,
+                conversation_id=conversation_id,
+                question_id=result.question_id,
+                user_input=analysis.text,
+                bot_response=result.response,
+                intent_detected=result.intent,
+                confidence_score=result.confidence,
                 response_time=response_time,
-                keywords_extracted=', '.join(intent.get('keywords', [])),
+                keywords_extracted=', '.join(result.keywords),
                 timestamp=datetime.utcnow()
             )
             
             db.session.add(message)
             
             # Actualizar contador de mensajes en la conversación
-            conversation.total_messages += 1
+            add_message_counts({conversation_id: 1})
             
             db.session.commit()
             
         except Exception as e:
-            DatabaseService._log_error(f"Error guardando mensaje: {str(e)}")
             db.session.rollback()
+            conversation_cache.forget([session_id])
+            DatabaseService._log_error(f"Error guardando mensaje: {str(e)}")
     
     @staticmethod
-    def _get_or_create_conversation(session_id: Optional[str] = None) -> Conversation:
+    def _save_batch_messages(results: List[Dict], response_time: float, session_id: Optional[str] = None):
         """
-        Obtener o crear una conversación
+        Guardar los resultados de un lote como mensajes de una conversación
+        con una sola transacción
         """
-        if not session_id:
-            session_id = f"anon_{int(time.time())}"
+        fallback = "Lo siento, no tengo una respuesta específica para esa pregunta. ¿Podrías reformularla o preguntar sobre otro tema?"
+        session_id = session_id or f"batch_{int(time.time())}"
         
-        # Buscar conversación activa para esta sesión
-        conversation = Conversation.query.filter_by(
-            session_id=session_id,
-            ended_at=None
-        ).first()
+        if message_writer.enabled:
+            now = datetime.utcnow()
+            for result in results:
+                best = result['matches'][0] if result['matches'] else None
+                message_writer.submit(MessageRecord(
+                    session_id=session_id,
+                    question_id=best['question_id'] if best else None,
+                    user_input=result['input'],
+                    bot_response=best['answer'] if best else fallback,
+                    intent_detected=result['intent'],
+                    confidence_score=best['confidence'] if best else 0.0,
+                    response_time=response_time,
+                    keywords_extracted=', '.join(result['keywords']),
+                    timestamp=now
+                ))
+            return
         
-        if not conversation:
-            # Crear nueva conversación
-            conversation = Conversation(
-                session_id=session_id,
-                started_at=datetime.utcnow(),
-                total_messages=0,
-                language='es'
-            )
-            db.session.add(conversation)
+        try:
+            conversation_id = active_conversation_ids([session_id])[session_id]
+            now = datetime.utcnow()
+            
+            messages = []
+            for result in results:
+                best = result['matches'][0] if result['matches'] else None
+                messages.append(Message(
+                    conversation_id=conversation_id,
+                    question_id=best['question_id'] if best else None,
+                    user_input=result['input'],
+                    bot_response=best['answer'] if best else fallback,
+                    intent_detected=result['intent'],
+                    confidence_score=best['confidence'] if best else 0.0,
+                    response_time=response_time,
+                    keywords_extracted=', '.join(result['keywords']),
+                    timestamp=now
+                ))
+            
+            db.session.add_all(messages)
+            add_message_counts({conversation_id: len(messages)})
+            
             db.session.commit()
-        
-        return conversation
+            
+        except Exception as e:
+            db.session.rollback()
+            conversation_cache.forget([session_id])
+            DatabaseService._log_error(f"Error guardando lote de mensajes: {str(e)}")
     
     @staticmethod
     def _log_error(message: str, level: str = 'ERROR'):
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Índices del esquema y comprobación de los planes de consulta
+
+- `missing_indexes` / `create_missing_indexes`: añadir a una base de datos
+  existente los índices declarados en los modelos (db.create_all solo crea
+  las tablas que no existen). En PostgreSQL se crean con CONCURRENTLY para
+  no bloquear las escrituras.
+- `check_query_plans`: ejecutar las consultas de DatabaseService sin
+  guardar nada, pedir el plan de cada una con EXPLAIN y señalar las que
+  recorren completa una tabla grande.
+"""
+
+import json
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, text
+
+from backend.models import db
+
+# Sentencias que se analizan con EXPLAIN (las inserciones no buscan filas)
+EXPLAINABLE = re.compile(r'^\s*(SELECT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+
+# Bases de datos cuyo plan de consulta sabe interpretar `explain`
+EXPLAIN_DIALECTS = ('sqlite', 'postgresql', 'mysql', 'mariadb')
+
+
+def invalid_indexes(engine=None) -> Set[str]:
+    """
+    Índices marcados como no válidos en PostgreSQL (los deja así un
+    CREATE INDEX CONCURRENTLY que falla a medias; existen pero no se usan)
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != 'postgresql':
+        return set()
+
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            'SELECT c.relname FROM pg_index i '
+            'JOIN pg_class c ON c.oid = i.indexrelid '
+            'JOIN pg_namespace n ON n.oid = c.relnamespace '
+            'WHERE NOT i.indisvalid AND n.nspname = current_schema()'
+        ))
+        return {row[0] for row in rows}
+
+
+def missing_indexes(engine=None) -> List[db.Index]:
+    """
+    Índices declarados en los modelos que no existen en la base de datos
+    (o que existen pero no son válidos)
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    invalid = invalid_indexes(engine)
+
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)} - invalid
+        missing.extend(index for index in sorted(table.indexes, key=lambda i: i.name)
+                       if index.name not in existing)
+    return missing
+
+
+def create_index_sql(index: db.Index, dialect) -> str:
+    """
+    CREATE INDEX para añadir el índice a una tabla con datos
+    """
+    dialect_name = dialect.name
+    preparer = dialect.identifier_preparer
+    columns = ', '.join(preparer.quote(column.name) for column in index.columns)
+    unique = 'UNIQUE ' if index.unique else ''
+    name = preparer.quote(index.name)
+    table = preparer.format_table(index.table)
+
+    if dialect_name == 'postgresql':
+        return f'CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})'
+    if dialect_name in ('mysql', 'mariadb'):
+        return f'CREATE {unique}INDEX {name} ON {table} ({columns}) ALGORITHM=INPLACE LOCK=NONE'
+    return f'CREATE {unique}INDEX IF NOT EXISTS {name} ON {table} ({columns})'
+
+
+def create_missing_indexes(engine=None, dry_run: bool = False,
+                           echo: Optional[Callable[[str], None]] = None) -> List[str]:
+    """
+    Crear los índices que faltan, uno por sentencia y fuera de transacción
+    (CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una). Los
+    índices no válidos de PostgreSQL se borran y se vuelven a crear.
+    Devuelve las sentencias ejecutadas (o las que se ejecutarían).
+    """
+    engine = engine or db.engine
+    invalid = invalid_indexes(engine)
+    statements = []
+    for index in missing_indexes(engine):
+        if index.name in invalid:
+            # Un índice no válido no se repara con IF NOT EXISTS: hay que borrarlo
+            statements.append(f'DROP INDEX CONCURRENTLY IF EXISTS {engine.dialect.identifier_preparer.quote(index.name)}')
+        statements.append(create_index_sql(index, engine.dialect))
+    if dry_run:
+        return statements
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for statement in statements:
+            if echo:
+                echo(statement)
+            connection.exec_driver_sql(statement)
+    return statements
+
+
+@dataclass
+class CapturedQuery:
+    """Sentencia ejecutada por un método de DatabaseService"""
+    source: str
+    statement: str
+    parameters: object
+
+
+@dataclass
+class TableScan:
+    """Recorrido completo de una tabla en el plan de una consulta"""
+    source: str
+    statement: str
+    table: str
+    rows: int
+    filtered: bool  # False: la consulta no filtra (totales, exportaciones)
+    plan: List[str] = field(default_factory=list)
+
+
+@contextmanager
+def _without_commits():
+    """
+    Ejecutar código de la aplicación sin confirmar nada: los commit de la
+    sesión actual solo envían los cambios y al salir se deshacen
+    """
+    session = db.session()
+    session.commit = session.flush
+    try:
+        yield
+    finally:
+        del session.commit
+        session.rollback()
+
+
+@contextmanager
+def _capture(engine, queries: List[CapturedQuery], source: List[str]):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if EXPLAINABLE.match(statement):
+            if executemany:
+                parameters = parameters[0] if parameters else ()
+            queries.append(CapturedQuery(source[0], statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def capture_service_queries() -> List[CapturedQuery]:
+    """
+    Ejecutar los métodos de DatabaseService que consultan la base de datos
+    (y la búsqueda de conversaciones y el barrido de conversaciones
+    inactivas) con datos de ejemplo y devolver las consultas que hicieron.
+    No se guarda nada. Requiere un contexto de aplicación activo.
+    """
+    from backend.database.database_service import DatabaseService
+    from backend.models import Category, Conversation, Question
+    from backend.services.conversation_cache import active_conversation_ids, conversation_cache
+    from backend.services.conversation_sweeper import conversation_sweeper
+    from backend.services.message_writer import message_writer
+    from backend.services.usage_counter import usage_counter
+
+    conversation = Conversation.query.order_by(Conversation.id.desc()).first()
+    session_id = conversation.session_id if conversation else 'explain'
+    question = Question.query.filter_by(is_active=True).first()
+    category = Category.query.first()
+
+    calls: List[Tuple[str, Callable[[], object]]] = [
+        ('get_best_response', lambda: DatabaseService.get_best_response('¿Qué es la programación?', session_id)),
+        ('match_batch', lambda: DatabaseService.match_batch(['qué es python'], log_messages=True, session_id=session_id)),
+        ('get_questions_by_category', lambda: DatabaseService.get_questions_by_category(category.id if category else None)),
+        ('get_categories', DatabaseService.get_categories),
+        ('get_stats', DatabaseService.get_stats),
+        ('update_question_accuracy', lambda: DatabaseService.update_question_accuracy(question.id if question else 0, 0.5)),
+        ('get_conversation_history', lambda: DatabaseService.get_conversation_history(session_id)),
+        ('save_daily_stats', DatabaseService.save_daily_stats),
+        ('get_question_suggestions', lambda: DatabaseService.get_question_suggestions(session_id)),
+        ('get_detailed_analytics', DatabaseService.get_detailed_analytics),
+        ('export_data', lambda: [DatabaseService.export_data(kind) for kind in ('conversations', 'messages', 'questions')]),
+        ('active_conversation_ids', lambda: active_conversation_ids([session_id, 'explain-nueva'])),
+        ('conversation_sweeper.sweep', conversation_sweeper.sweep),
+    ]
+
+    # Todo se ejecuta en esta sesión: sin registro en segundo plano y sin
+    # conversaciones en caché, para que se vean sus consultas
+    saved = (message_writer.enabled, usage_counter.enabled)
+    message_writer.enabled = usage_counter.enabled = False
+    conversation_cache.clear()
+
+    queries: List[CapturedQuery] = []
+    source = ['']
+    try:
+        with _capture(db.engine, queries, source), _without_commits():
+            for name, call in calls:
+                source[0] = name
+                call()
+    finally:
+        message_writer.enabled, usage_counter.enabled = saved
+        conversation_cache.clear()
+    return queries
+
+
+def explain(statement: str, parameters) -> Tuple[List[str], List[str]]:
+    """
+    Plan de una sentencia: líneas del plan y tablas que recorre completas
+    """
+    dialect = db.engine.dialect.name
+    connection = db.session.connection()
+
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        plan = [row[-1] for row in rows]
+        tables = {table.name for table in db.metadata.sorted_tables}
+        scans = [detail.split()[1] for detail in plan
+                 if detail.startswith('SCAN ') and ' USING ' not in detail and detail.split()[1] in tables]
+        return plan, scans
+
+    if dialect == 'postgresql':
+        result = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+        root = (json.loads(result) if isinstance(result, str) else result)[0]['Plan']
+        plan, scans = [], []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            plan.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+            if node['Node Type'] == 'Seq Scan':
+                scans.append(node['Relation Name'])
+            stack.extend(node.get('Plans', []))
+        return plan, scans
+
+    if dialect in ('mysql', 'mariadb'):
+        result = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).mappings().all()
+        plan = [f"{row['table']}: {row['type']} {row.get('key') or ''}".strip() for row in result]
+        return plan, [row['table'] for row in result if row['type'] == 'ALL']
+
+    raise ValueError(f"EXPLAIN no soportado para {dialect} (soportados: {', '.join(EXPLAIN_DIALECTS)})")
+
+
+def check_query_plans(max_rows: int = 1000) -> Tuple[List[TableScan], int]:
+    """
+    Recorridos completos de tablas con más de `max_rows` filas en las
+    consultas de DatabaseService. Devuelve los recorridos y el número de
+    consultas analizadas. Requiere un contexto de aplicación activo.
+    """
+    queries = capture_service_queries()
+    row_counts: Dict[str, int] = {}
+    scans: List[TableScan] = []
+    seen = set()
+
+    with _without_commits():
+        for query in queries:
+            key = (query.source, query.statement)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            plan, tables = explain(query.statement, query.parameters)
+            for table in tables:
+                if table not in row_counts:
+                    row_counts[table] = db.session.execute(
+                        text(f'SELECT count(*) FROM {db.engine.dialect.identifier_preparer.quote(table)}')
+                    ).scalar()
+                if row_counts[table] > max_rows:
+                    filtered = re.search(r'\bWHERE\b', query.statement, re.IGNORECASE) is not None
+                    scans.append(TableScan(query.source, query.statement, table, row_counts[table], filtered, plan))
+    return scans, len(seen)
@@ -54,6 +54,10 @@ class Category(db.Model):
 class Question(db.Model):
     """Modelo para preguntas y respuestas"""
     __tablename__ = 'questions'
+    __table_args__ = (
+        db.Index('ix_questions_is_active_usage_count', 'is_active', 'usage_count'),  # Preguntas populares
+        db.Index('ix_questions_category_id_is_active', 'category_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     question_text = db.Column(db.Text, nullable=False)
@@ -83,7 +87,11 @@ class Question(db.Model):
         return f'<Question {self.question_text[:50]}...>'
     
     def increment_usage(self):
-        """Incrementar contador de uso"""
+        """Incrementar contador de uso (acumulado y guardado por lotes si está activado)"""
+        from backend.services.usage_counter import usage_counter
+        if usage_counter.enabled:
+            usage_counter.add(Question, self.id)
+            return
         self.usage_count += 1
         db.session.commit()
     
@@ -96,9 +104,25 @@ class Question(db.Model):
             self.accuracy_score = (self.accuracy_score + score) / 2
         db.session.commit()
 
+class BankVersion(db.Model):
+    """Versión del banco de preguntas (una sola fila, compartida por todos los procesos)"""
+    __tablename__ = 'bank_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)  # Se incrementa en cada transacción que cambia preguntas
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<BankVersion {self.version}>'
+
 class Conversation(db.Model):
     """Modelo para conversaciones de usuarios"""
     __tablename__ = 'conversations'
+    __table_args__ = (
+        db.Index('ix_conversations_session_id_ended_at', 'session_id', 'ended_at'),  # Conversación activa
+        db.Index('ix_conversations_ended_at', 'ended_at'),  # Conversaciones abiertas
+        db.Index('ix_conversations_started_at', 'started_at'),  # Estadísticas diarias
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -124,6 +148,11 @@ class Conversation(db.Model):
 class Message(db.Model):
     """Modelo para mensajes individuales"""
     __tablename__ = 'messages'
+    __table_args__ = (
+        db.Index('ix_messages_conversation_id_timestamp', 'conversation_id', 'timestamp'),  # Historial
+        db.Index('ix_messages_timestamp', 'timestamp'),  # Estadísticas diarias
+        db.Index('ix_messages_intent_detected', 'intent_detected'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
@@ -1,7 +1,17 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_login import current_user, login_required
 from backend.database.database_service import DatabaseService
 from backend.models import db, Message, Question
+from backend.services.response_cache import response_cache, negative_cache
+from backend.services.micro_batcher import micro_batcher
+from backend.services.nlp_pool import nlp_pool
+from backend.services.message_writer import message_writer
+from backend.services.usage_counter import usage_counter
+from backend.services.conversation_cache import conversation_cache
+from backend.services.conversation_sweeper import conversation_sweeper
+from backend.services.question_index import question_index
+import json
+import os
 import logging
 
 logger = logging.getLogger(__name__)
@@ -65,6 +75,129 @@ def get_suggestions():
         logger.error(f"Error obteniendo sugerencias: {e}")
         return jsonify({'error': 'Error obteniendo sugerencias'}), 500
 
+@chatbot_bp.route('/api/match/batch', methods=['POST'])
+def match_batch():
+    """Buscar las mejores preguntas para un lote de entradas"""
+    try:
+        data = request.get_json() or {}
+        inputs = data.get('inputs')
+        top_k = data.get('top_k', 1)
+        
+        if not isinstance(inputs, list) or not all(isinstance(text, str) for text in inputs):
+            return jsonify({'error': 'inputs debe ser una lista de textos'}), 400
+        
+        if len(inputs) > current_app.config['MATCH_BATCH_MAX_INPUTS']:
+            return jsonify({'error': f"Máximo {current_app.config['MATCH_BATCH_MAX_INPUTS']} entradas por petición"}), 400
+        
+        if not isinstance(top_k, int) or top_k < 1:
+            return jsonify({'error': 'top_k debe ser un entero positivo'}), 400
+        
+        results = DatabaseService.iter_match_batch(
+            inputs,
+            top_k=top_k,
+            log_messages=bool(data.get('log_messages', False)),
+            session_id=data.get('session_id'),
+            batch_size=current_app.config['MATCH_BATCH_SIZE']
+        )
+        
+        def generate():
+            # Los resultados se envían por tramos a medida que se calculan; un
+            # error a mitad ya no puede cambiar el estado HTTP y se indica en 'error'
+            yield '{"results": ['
+            try:
+                for i, result in enumerate(results):
+                    yield (', ' if i else '') + json.dumps(result)
+            except Exception as e:
+                logger.error(f"Error en búsqueda por lotes: {e}")
+                db.session.rollback()
+                yield '], "error": "Error en búsqueda por lotes"}'
+                return
+            yield ']}'
+        
+        return Response(stream_with_context(generate()), mimetype='application/json')
+        
+    except Exception as e:
+        logger.error(f"Error en búsqueda por lotes: {e}")
+        return jsonify({'error': 'Error en búsqueda por lotes'}), 500
+
+@chatbot_bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas internas del motor de respuestas (cachés, índice)"""
+    try:
+        return jsonify({
+            'response_cache': response_cache.stats(),
+            'negative_cache': negative_cache.stats(),
+            'micro_batcher': micro_batcher.stats(),
+            'nlp_pool': nlp_pool.stats(),
+            'message_writer': message_writer.stats(),
+            'usage_counter': usage_counter.stats(),
+            'conversation_cache': conversation_cache.stats(),
+            'conversations': conversation_sweeper.stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error obteniendo métricas: {e}")
+        return jsonify({'error': 'Error obteniendo métricas'}), 500
+
+@chatbot_bp.route('/api/admin/snapshots', methods=['GET'])
+@login_required
+def list_snapshots():
+    """Versiones del índice de preguntas del worker que atiende la petición: la actual y las anteriores (solo para admins)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Acceso denegado'}), 403
+        
+        return jsonify({
+            'pid': os.getpid(),
+            'workers': current_app.config.get('SERVER_WORKERS', 1),
+            'bank_version': question_index.version,
+            'stale': question_index.is_stale,
+            'snapshots': question_index.snapshots()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error listando instantáneas del índice: {e}")
+        return jsonify({'error': 'Error listando instantáneas del índice'}), 500
+
+@chatbot_bp.route('/api/admin/snapshots/rebuild', methods=['POST'])
+@login_required
+def rebuild_snapshot():
+    """Construir una instantánea nueva en segundo plano en todos los workers (solo para admins)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Acceso denegado'}), 403
+        
+        question_index.rebuild_everywhere()
+        return jsonify({'message': 'Reconstrucción del índice iniciada'}), 202
+        
+    except Exception as e:
+        logger.error(f"Error reconstruyendo el índice: {e}")
+        return jsonify({'error': 'Error reconstruyendo el índice'}), 500
+
+@chatbot_bp.route('/api/admin/snapshots/rollback', methods=['POST'])
+@login_required
+def rollback_snapshot():
+    """Volver a la instantánea anterior del índice; solo con un worker (solo para admins)"""
+    try:
+        if not current_user.is_admin:
+            return jsonify({'error': 'Acceso denegado'}), 403
+        
+        # El historial de instantáneas es de cada proceso: con varios workers
+        # solo se revertiría el que atiende la petición
+        if current_app.config.get('SERVER_WORKERS', 1) > 1:
+            return jsonify({'error': 'Con varios workers no se puede revertir el índice; '
+                                     'deshaz el cambio de las preguntas o reconstruye el índice'}), 409
+        
+        info = question_index.rollback()
+        if info is None:
+            return jsonify({'error': 'No hay una instantánea anterior'}), 409
+        
+        return jsonify({'message': f'Índice devuelto a la versión {info.version}', 'version': info.version})
+        
+    except Exception as e:
+        logger.error(f"Error revirtiendo el índice: {e}")
+        return jsonify({'error': 'Error revirtiendo el índice'}), 500
+
 @chatbot_bp.route('/api/analytics', methods=['GET'])
 @login_required
 def get_analytics():
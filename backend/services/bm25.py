@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Puntuación BM25 sobre las listas invertidas del índice de preguntas
+"""
+
+from typing import Dict, Hashable, Iterable, Sequence, Tuple
+
+import numpy as np
+
+from backend.services.postings import Postings
+
+
+def idf(document_frequency, n_docs: int):
+    """
+    IDF de BM25 (variante de Lucene, siempre positiva)
+    """
+    df = np.minimum(document_frequency, n_docs)
+    return np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+
+class BM25Index:
+    """
+    Estadísticas BM25 de los campos del índice de preguntas.
+
+    Por cada campo se guardan en arreglos la longitud de cada fila (términos
+    distintos), su media sobre las filas vigentes y el IDF de cada término
+    del CSR (los términos que solo están en el `delta` de Postings se
+    calculan al consultarlos). Las listas invertidas no guardan frecuencias,
+    así que la frecuencia de un término en un campo es 0 o 1; en textos tan
+    cortos como las preguntas casi nunca se repite un lema.
+
+    Las filas borradas siguen contando en la frecuencia de documento hasta
+    que el índice se compacta.
+    """
+
+    def __init__(self, postings: Dict[str, Postings], fields: Sequence[str], alive: np.ndarray):
+        self.postings = postings
+        self.fields = tuple(fields)
+        self.alive = alive
+        self.n_docs = max(int(alive.sum()), 1)
+        self.lengths: Dict[str, np.ndarray] = {}
+        self.avg_length: Dict[str, float] = {}
+        self.idf: Dict[str, np.ndarray] = {}
+
+        for field in self.fields:
+            field_postings = postings[field]
+            lengths = np.bincount(field_postings.rows, minlength=len(alive))
+            if field_postings.delta:
+                added = np.concatenate(list(field_postings.delta.values()))
+                lengths = lengths + np.bincount(added, minlength=len(alive))
+            lengths = lengths.astype(np.float32)
+            live_lengths = lengths[alive]
+            average = float(live_lengths.mean()) if len(live_lengths) else 0.0
+            self.lengths[field] = lengths
+            self.avg_length[field] = average or 1.0
+            self.idf[field] = idf(np.diff(field_postings.offsets), self.n_docs).astype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(array.nbytes for array in (*self.lengths.values(), *self.idf.values())))
+
+    def term_idf(self, field: str, term: Hashable) -> float:
+        """
+        IDF de un término en un campo (el de un término desconocido si no aparece)
+        """
+        field_postings = self.postings[field]
+        term_id = field_postings.vocab.get(term)
+        if term_id is not None and term not in field_postings.delta:
+            return float(self.idf[field][term_id])
+        return float(idf(len(field_postings.get(term)), self.n_docs))
+
+    def score(self, terms: Iterable[Hashable], weights: Sequence[float],
+              k1: float = 1.2, b: float = 0.75) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filas vigentes que contienen algún término y su puntuación BM25
+        normalizada entre 0 y 1.
+
+        La puntuación es la suma por campo de BM25 multiplicada por el peso
+        del campo, dividida por la de una fila de longitud media que tuviera
+        cada término de la entrada en su mejor campo (los términos que no
+        están en el índice también cuentan, como en Jaccard). Solo se
+        recorren las listas de los términos de la entrada, así que el coste
+        no depende del tamaño del banco sino de la longitud de esas listas.
+        """
+        row_lists = []
+        score_lists = []
+        ideal = 0.0
+        for term in set(terms):
+            best = 0.0
+            for field, weight in zip(self.fields, weights):
+                if not weight:
+                    continue
+                term_idf = self.term_idf(field, term)
+                best = max(best, weight * term_idf)
+                rows = self.postings[field].get(term)
+                if not len(rows):
+                    continue
+                norm = k1 * (1.0 - b + b * self.lengths[field][rows] / self.avg_length[field])
+                row_lists.append(rows)
+                score_lists.append(weight * term_idf * (k1 + 1.0) / (1.0 + norm))
+            ideal += best
+
+        if not row_lists:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        rows, inverse = np.unique(np.concatenate(row_lists), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_lists), minlength=len(rows))
+        live = self.alive[rows]
+        return rows[live], np.minimum(scores[live] / ideal, 1.0)
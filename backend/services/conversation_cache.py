@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Caché de la conversación activa de cada sesión
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import bindparam, func
+
+from backend.utils.cache import LRUCache
+
+
+class ConversationCache:
+    """
+    Id de la conversación activa de cada sesión, para que los mensajes de una
+    sesión ya vista no consulten la tabla de conversaciones.
+
+    Las entradas caducan tras `ttl` segundos sin mensajes de la sesión
+    (expiración deslizante); ese tiempo debe ser menor que el de inactividad
+    tras el que se cierran las conversaciones, para no asociar mensajes a una
+    conversación ya cerrada.
+    """
+
+    def __init__(self):
+        self._cache = LRUCache(max_entries=10000, ttl=1800, sliding=True)
+
+    def init_app(self, app):
+        """
+        Leer la configuración de la caché desde la aplicación
+        """
+        self._cache = LRUCache(
+            max_entries=app.config.get('CONVERSATION_CACHE_MAX_ENTRIES', 10000),
+            ttl=app.config.get('CONVERSATION_CACHE_TTL', 1800),
+            sliding=True
+        )
+
+    def get(self, session_id: str) -> Optional[int]:
+        return self._cache.get(session_id)
+
+    def set(self, session_id: str, conversation_id: int):
+        self._cache.set(session_id, conversation_id)
+
+    def forget(self, session_ids: Iterable[str]):
+        """
+        Olvidar sesiones (conversación cerrada o creada en una transacción fallida)
+        """
+        for session_id in session_ids:
+            self._cache.pop(session_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+def active_conversation_ids(session_ids: Iterable[str]) -> Dict[str, int]:
+    """
+    Id de la conversación activa de cada sesión: de la caché, con una sola
+    consulta para las que no están y creando las que no existen dentro de la
+    transacción en curso (si la transacción falla, hay que olvidar las
+    sesiones con `conversation_cache.forget`)
+    """
+    from backend.models import db, Conversation
+
+    session_ids = set(session_ids)
+    found = {}
+    for session_id in session_ids:
+        conversation_id = conversation_cache.get(session_id)
+        if conversation_id is not None:
+            found[session_id] = conversation_id
+
+    missing = session_ids - found.keys()
+    if missing:
+        found.update(
+            db.session.query(Conversation.session_id, Conversation.id)
+            .filter(Conversation.session_id.in_(missing), Conversation.ended_at.is_(None))
+            .all()
+        )
+        missing -= found.keys()
+
+    if missing:
+        now = datetime.utcnow()
+        created = [Conversation(session_id=session_id, started_at=now, total_messages=0, language='es')
+                   for session_id in missing]
+        db.session.add_all(created)
+        db.session.flush()
+        found.update((conversation.session_id, conversation.id) for conversation in created)
+
+    for session_id, conversation_id in found.items():
+        conversation_cache.set(session_id, conversation_id)
+    return found
+
+
+def add_message_counts(counts: Dict[int, int]):
+    """
+    Sumar mensajes a `total_messages` de cada conversación (en la transacción en curso)
+    """
+    from backend.models import db, Conversation
+
+    conversations = Conversation.__table__
+    db.session.execute(
+        conversations.update()
+        .where(conversations.c.id == bindparam('conversation_id'))
+        .values(total_messages=func.coalesce(conversations.c.total_messages, 0) + bindparam('added')),
+        [{'conversation_id': conversation_id, 'added': added} for conversation_id, added in counts.items()]
+    )
+
+
+# Instancia global de la caché de conversaciones
+conversation_cache = ConversationCache()
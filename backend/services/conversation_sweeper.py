@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Cierre periódico de las conversaciones inactivas
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select
+
+from backend.services.conversation_cache import conversation_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationSweeper:
+    """
+    Cierra las conversaciones sin mensajes desde hace más de `idle_timeout`
+    segundos.
+
+    Cada `interval` segundos busca las conversaciones abiertas cuya última
+    actividad (el último mensaje o, si no tiene, el inicio) es anterior al
+    límite y las cierra por lotes de `batch_size` con un UPDATE que fija
+    `ended_at` y recalcula `total_messages` a partir de los mensajes. El
+    hilo arranca con la primera petición de cada proceso; si varios workers
+    barren a la vez no pasa nada, porque solo se actualizan conversaciones
+    que siguen abiertas.
+    """
+
+    def __init__(self, idle_timeout: float = 3600, interval: float = 300, batch_size: int = 500):
+        self.enabled = False
+        self.idle_timeout = idle_timeout
+        self.interval = interval
+        self.batch_size = batch_size
+        self._app = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+
+        # Métricas
+        self._sweeps = 0
+        self._closed = 0
+        self._failures = 0
+        self._last_sweep_at: Optional[float] = None
+        self._last_sweep_ms = 0.0
+
+    def init_app(self, app):
+        """
+        Leer la configuración del barrido desde la aplicación
+        """
+        self._app = app
+        self.enabled = bool(app.config.get('CONVERSATION_SWEEPER_ENABLED', False))
+        self.idle_timeout = float(app.config.get('CONVERSATION_IDLE_TIMEOUT', self.idle_timeout))
+        self.interval = float(app.config.get('CONVERSATION_SWEEP_INTERVAL', self.interval))
+        self.batch_size = int(app.config.get('CONVERSATION_SWEEP_BATCH_SIZE', self.batch_size))
+
+        cache_ttl = float(app.config.get('CONVERSATION_CACHE_TTL', 0) or 0)
+        if self.enabled and cache_ttl >= self.idle_timeout:
+            logger.warning(
+                f"CONVERSATION_CACHE_TTL ({cache_ttl:.0f}s) debería ser menor que "
+                f"CONVERSATION_IDLE_TIMEOUT ({self.idle_timeout:.0f}s)"
+            )
+
+        if self.enabled:
+            app.before_request(self._ensure_worker)
+
+    def sweep(self) -> int:
+        """
+        Cerrar las conversaciones inactivas; devuelve cuántas se cerraron.
+        Requiere un contexto de aplicación activo.
+        """
+        from backend.models import db, Conversation, Message
+
+        started = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.idle_timeout)
+        last_activity = select(func.max(Message.timestamp))\
+            .where(Message.conversation_id == Conversation.id)\
+            .scalar_subquery()
+        message_count = select(func.count(Message.id))\
+            .where(Message.conversation_id == Conversation.id)\
+            .scalar_subquery()
+        # Se repite en el UPDATE: una conversación que recibe un mensaje entre
+        # la consulta y el UPDATE ya no está inactiva y no se cierra
+        idle = func.coalesce(last_activity, Conversation.started_at) < cutoff
+
+        closed = 0
+        with self._sweep_lock:
+            try:
+                while True:
+                    rows = db.session.query(Conversation.id, Conversation.session_id)\
+                        .filter(Conversation.ended_at.is_(None))\
+                        .filter(idle)\
+                        .limit(self.batch_size)\
+                        .all()
+                    if not rows:
+                        break
+
+                    now = datetime.utcnow()
+                    result = db.session.query(Conversation)\
+                        .filter(Conversation.id.in_([row.id for row in rows]), Conversation.ended_at.is_(None), idle)\
+                        .update({Conversation.ended_at: now, Conversation.total_messages: message_count},
+                                synchronize_session=False)
+                    db.session.commit()
+                    conversation_cache.forget(row.session_id for row in rows)
+                    closed += result
+                    if len(rows) < self.batch_size:
+                        break
+            except Exception as e:
+                db.session.rollback()
+                self._failures += 1
+                logger.error(f"Error cerrando conversaciones inactivas: {e}")
+
+        self._sweeps += 1
+        self._closed += closed
+        self._last_sweep_at = time.time()
+        self._last_sweep_ms = (time.monotonic() - started) * 1000.0
+        if closed:
+            logger.info(f"{closed} conversaciones inactivas cerradas")
+        return closed
+
+    def open_conversations(self) -> int:
+        """
+        Conversaciones abiertas. Requiere un contexto de aplicación activo.
+        """
+        from backend.models import Conversation
+
+        return Conversation.query.filter(Conversation.ended_at.is_(None)).count()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Conversaciones abiertas y contadores del barrido.
+        Requiere un contexto de aplicación activo.
+        """
+        return {
+            'enabled': self.enabled,
+            'open_conversations': self.open_conversations(),
+            'idle_timeout': self.idle_timeout,
+            'interval': self.interval,
+            'sweeps': self._sweeps,
+            'closed': self._closed,
+            'failures': self._failures,
+            'last_sweep_at': self._last_sweep_at,
+            'last_sweep_ms': self._last_sweep_ms,
+        }
+
+    def _ensure_worker(self):
+        """
+        Arrancar el hilo del barrido en el primer uso (después de un fork)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='conversation-sweeper', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    self.sweep()
+            except Exception as e:
+                logger.error(f"Error en el barrido de conversaciones: {e}")
+            time.sleep(self.interval)
+
+
+# Instancia global del barrido de conversaciones
+conversation_sweeper = ConversationSweeper()
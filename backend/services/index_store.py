@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Formato en disco del índice de preguntas (mapeado en memoria)
+
+Un único archivo con una cabecera JSON y los arreglos del índice alineados
+a 64 bytes:
+
+    b'QIDX' | longitud de la cabecera (uint32, little endian) | cabecera | arreglos
+
+La cabecera guarda la versión del formato, la firma del banco de preguntas,
+el modelo de spaCy y, por cada arreglo, su tipo, forma y posición en el
+archivo. Los arreglos se abren con np.memmap en modo de solo lectura, así
+que abrir el índice no copia datos y los procesos que lo usan comparten
+las páginas a través de la caché del sistema operativo.
+"""
+
+import json
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from backend.services.postings import Postings
+from backend.services.vector_index import IVFIndex
+
+FORMAT_VERSION = 1
+MAGIC = b'QIDX'
+ALIGNMENT = 64
+
+# Campos cuyo vocabulario son cadenas (el de 'trigrams' son enteros)
+STRING_VOCAB_FIELDS = ('question', 'keywords', 'synonyms')
+
+# Fila de la tabla bank_version con la versión del banco
+BANK_VERSION_ID = 1
+
+
+class IndexFormatError(ValueError):
+    """El archivo no es un índice válido o su formato no es compatible"""
+
+
+class StringColumn:
+    """
+    Lista de cadenas de solo lectura guardada como bytes UTF-8 contiguos y
+    sus desplazamientos (las cadenas se decodifican al acceder a ellas)
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def encode(cls, values: List[str]) -> 'StringColumn':
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        data = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode('utf-8')
+
+
+def read_bank_version(connection=None) -> int:
+    """
+    Versión del banco guardada en la base de datos (0 si aún no se ha
+    cambiado ninguna pregunta). Sin `connection` se lee en la sesión
+    actual, que requiere un contexto de aplicación activo.
+    """
+    from backend.models import db, BankVersion
+
+    statement = db.select(BankVersion.version).where(BankVersion.id == BANK_VERSION_ID)
+    version = (connection or db.session).execute(statement).scalar()
+    return version or 0
+
+
+def bump_bank_version(connection) -> int:
+    """
+    Incrementar la versión del banco en la transacción de `connection` y
+    devolver la nueva. En PostgreSQL y MySQL el UPDATE bloquea la fila
+    hasta el final de la transacción, así que las versiones de dos
+    transacciones concurrentes nunca coinciden.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from backend.models import BankVersion
+
+    table = BankVersion.__table__
+    update = (table.update()
+              .where(table.c.id == BANK_VERSION_ID)
+              .values(version=table.c.version + 1, updated_at=datetime.utcnow()))
+    if connection.execute(update).rowcount == 0:
+        # Sin la fila (base de datos sin `flask schema migrate`): si otra
+        # transacción la inserta a la vez, se deshace solo el punto de
+        # guardado y se incrementa la fila que dejó la otra
+        try:
+            with connection.begin_nested():
+                connection.execute(table.insert().values(id=BANK_VERSION_ID, version=1, updated_at=datetime.utcnow()))
+        except IntegrityError:
+            connection.execute(update)
+    return read_bank_version(connection)
+
+
+def ensure_bank_version(engine=None, dry_run: bool = False) -> bool:
+    """
+    Crear la tabla bank_version y su fila si faltan (bases de datos creadas
+    antes de que existiera; db.create_all no añade la fila). Devuelve True
+    si faltaba algo (con `dry_run` no se crea nada).
+    """
+    from sqlalchemy import inspect
+    from sqlalchemy.exc import IntegrityError
+    from backend.models import db, BankVersion
+
+    engine = engine or db.engine
+    table = BankVersion.__table__
+    if not inspect(engine).has_table(table.name):
+        if dry_run:
+            return True
+        with engine.begin() as connection:
+            table.create(connection, checkfirst=True)
+
+    try:
+        with engine.begin() as connection:
+            if connection.execute(db.select(table.c.id).where(table.c.id == BANK_VERSION_ID)).first():
+                return False
+            if not dry_run:
+                connection.execute(table.insert().values(id=BANK_VERSION_ID, version=0, updated_at=datetime.utcnow()))
+    except IntegrityError:
+        pass  # La insertó otro proceso a la vez
+    return True
+
+
+def bank_signature() -> str:
+    """
+    Marca del estado del banco sin recorrer las preguntas: su versión (la
+    incrementa cada transacción que cambia preguntas), el número de
+    preguntas activas y el mayor id. Los cambios hechos con SQL directo
+    sin pasar por los modelos solo se notan si cambian el número o el
+    mayor id. Requiere un contexto de aplicación activo.
+    """
+    from backend.models import db, Question
+
+    active = db.session.query(db.func.count(Question.id)).filter(Question.is_active.is_(True)).scalar()
+    max_id = db.session.query(db.func.max(Question.id)).scalar()
+    return f'v{read_bank_version()}-n{active}-m{max_id or 0}'
+
+
+def save_index(index, path: str, model_name: str, signature: str):
+    """
+    Escribir el índice en `path` (se escribe en un archivo temporal y se
+    renombra, de modo que los lectores nunca ven un archivo a medias)
+    """
+    arrays = _index_arrays(index)
+    header = {
+        'format_version': FORMAT_VERSION,
+        'bank_signature': signature,
+        'model_name': model_name,
+        'questions': len(index),
+        'created_at': time.time(),
+        'arrays': {}
+    }
+
+    # Calcular la posición de cada arreglo; la cabecera se rellena hasta
+    # alinear el primer arreglo (se reserva espacio de sobra para ella)
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        offset = _align(offset)
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        layout.append((offset, array))
+        offset += array.nbytes
+
+    data_start = _align(len(MAGIC) + 4 + len(json.dumps(header).encode('utf-8')) + 1024)
+    header['data_start'] = data_start
+    header_bytes = json.dumps(header).encode('utf-8')
+    if len(MAGIC) + 4 + len(header_bytes) > data_start:
+        raise IndexFormatError('Cabecera demasiado grande')
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.question_index.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header_bytes)))
+            f.write(header_bytes)
+            for array_offset, array in layout:
+                f.seek(data_start + array_offset)
+                f.write(array.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """
+    Leer la cabecera del archivo del índice
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise IndexFormatError(f'{path} no es un índice de preguntas')
+        (length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length).decode('utf-8'))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise IndexFormatError(
+            f"Versión de formato {header.get('format_version')} no soportada (se esperaba {FORMAT_VERSION})"
+        )
+    return header
+
+
+def load_index(path: str, version: int = 0) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Abrir el índice guardado en `path` mapeando sus arreglos en memoria.
+    Devuelve el índice y la cabecera.
+    """
+    from backend.services.question_index import QuestionIndex
+
+    header = read_header(path)
+    arrays = {
+        name: np.memmap(path, dtype=np.dtype(spec['dtype']), mode='r',
+                        offset=header['data_start'] + spec['offset'], shape=tuple(spec['shape']))
+        if int(np.prod(spec['shape'])) else np.zeros(spec['shape'], dtype=np.dtype(spec['dtype']))
+        for name, spec in header['arrays'].items()
+    }
+
+    postings = {}
+    for field in STRING_VOCAB_FIELDS + ('trigrams',):
+        if field == 'trigrams':
+            terms = arrays['trigrams.terms'].tolist()
+        else:
+            terms = list(StringColumn(arrays[f'{field}.terms.blob'], arrays[f'{field}.terms.offsets']))
+        vocab = {term: term_id for term_id, term in enumerate(terms)}
+        postings[field] = Postings(vocab, arrays[f'{field}.offsets'], arrays[f'{field}.rows'])
+
+    exact_keys = StringColumn(arrays['exact.keys.blob'], arrays['exact.keys.offsets'])
+    exact = dict(zip(exact_keys, arrays['exact.ids'].tolist()))
+
+    ann = None
+    if 'ann.centroids' in arrays:
+        lists_vocab = {term: term_id for term_id, term in enumerate(arrays['ann.terms'].tolist())}
+        ann = IVFIndex(arrays['ann.centroids'], Postings(lists_vocab, arrays['ann.offsets'], arrays['ann.rows']))
+
+    index = QuestionIndex(
+        arrays['ids'],
+        StringColumn(arrays['texts.blob'], arrays['texts.offsets']),
+        arrays['vectors'],
+        postings,
+        arrays['token_counts'],
+        arrays['trigram_offsets'],
+        arrays['trigram_values'],
+        version,
+        exact=exact,
+        ann=ann
+    )
+    return index, header
+
+
+def _index_arrays(index) -> Dict[str, np.ndarray]:
+    """
+    Arreglos que forman el índice en disco
+    """
+    texts = StringColumn.encode(list(index.texts))
+    exact_keys = StringColumn.encode(list(index.exact.keys()))
+    arrays = {
+        'ids': np.asarray(index.ids, dtype=np.int64),
+        'vectors': np.asarray(index.vectors, dtype=np.float32),
+        'token_counts': np.asarray(index.token_counts, dtype=np.int32),
+        'trigram_offsets': np.asarray(index.trigram_offsets, dtype=np.int64),
+        'trigram_values': np.asarray(index.trigram_values, dtype=np.int64),
+        'texts.blob': texts.blob,
+        'texts.offsets': texts.offsets,
+        'exact.keys.blob': exact_keys.blob,
+        'exact.keys.offsets': exact_keys.offsets,
+        'exact.ids': np.fromiter(index.exact.values(), dtype=np.int64, count=len(index.exact)),
+    }
+    for field, postings in index.postings.items():
+        terms = sorted(postings.vocab, key=postings.vocab.get)
+        if field == 'trigrams':
+            arrays['trigrams.terms'] = np.asarray(terms, dtype=np.int64)
+        else:
+            column = StringColumn.encode(terms)
+            arrays[f'{field}.terms.blob'] = column.blob
+            arrays[f'{field}.terms.offsets'] = column.offsets
+        arrays[f'{field}.offsets'] = np.asarray(postings.offsets, dtype=np.int64)
+        arrays[f'{field}.rows'] = np.asarray(postings.rows, dtype=np.int32)
+    if index.ann is not None:
+        lists = index.ann.lists
+        arrays['ann.centroids'] = np.asarray(index.ann.centroids, dtype=np.float32)
+        arrays['ann.terms'] = np.asarray(sorted(lists.vocab, key=lists.vocab.get), dtype=np.int64)
+        arrays['ann.offsets'] = np.asarray(lists.offsets, dtype=np.int64)
+        arrays['ann.rows'] = np.asarray(lists.rows, dtype=np.int32)
+    return arrays
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Registro de mensajes en segundo plano (write-behind) con inserciones por lotes
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from backend.services.conversation_cache import active_conversation_ids, add_message_counts, conversation_cache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MessageRecord:
+    """Mensaje pendiente de guardar (solo los datos de la fila)"""
+    session_id: str
+    user_input: str
+    bot_response: str
+    intent_detected: str
+    confidence_score: float
+    response_time: float
+    keywords_extracted: str
+    question_id: Optional[int] = None
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+
+
+class MessageWriter:
+    """
+    Guarda los mensajes del chat fuera de la petición.
+
+    La petición encola un MessageRecord y sigue; un hilo vacía la cola en
+    lotes de hasta `batch_size` mensajes (o los que haya cada
+    `flush_interval` segundos) y los guarda en una sola transacción: las
+    conversaciones activas de las sesiones del lote (de la caché de
+    conversaciones o con una consulta), las conversaciones que falten, una
+    inserción múltiple de los mensajes y un UPDATE de `total_messages` por
+    conversación.
+
+    La cola está acotada a `max_queue_size` mensajes. Si está llena, la
+    petición espera como mucho `put_timeout` segundos (contrapresión) y
+    después el mensaje se descarta y se cuenta en `dropped`. Al terminar el
+    proceso se guardan los mensajes pendientes.
+    """
+
+    def __init__(self, max_queue_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, put_timeout: float = 0.05):
+        self.enabled = False
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._app = None
+        self._queue: 'queue.Queue[MessageRecord]' = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._atexit_registered = False
+
+        # Métricas
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+        self._blocked = 0
+        self._last_batch_ms = 0.0
+
+    def init_app(self, app):
+        """
+        Leer la configuración del registro desde la aplicación
+        """
+        self._app = app
+        self.enabled = bool(app.config.get('MESSAGE_WRITER_ENABLED', False))
+        self.batch_size = int(app.config.get('MESSAGE_WRITER_BATCH_SIZE', self.batch_size))
+        self.flush_interval = float(app.config.get('MESSAGE_WRITER_FLUSH_INTERVAL', self.flush_interval))
+        self.put_timeout = float(app.config.get('MESSAGE_WRITER_PUT_TIMEOUT', self.put_timeout))
+        max_queue_size = int(app.config.get('MESSAGE_WRITER_QUEUE_SIZE', self._queue.maxsize))
+        if max_queue_size != self._queue.maxsize and self._queue.empty():
+            self._queue = queue.Queue(maxsize=max_queue_size)
+
+        if self.enabled and not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+
+    def submit(self, record: MessageRecord) -> bool:
+        """
+        Encolar un mensaje; devuelve False si se descartó por tener la cola llena
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._blocked += 1
+            try:
+                self._queue.put(record, timeout=self.put_timeout)
+            except queue.Full:
+                self._dropped += 1
+                return False
+        self._enqueued += 1
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Guardar ya los mensajes encolados y esperar al lote que esté
+        escribiendo el hilo (al terminar el proceso o en pruebas). Devuelve
+        False si quedan mensajes pendientes al cumplirse `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            batch = self._drain(self.batch_size)
+            if batch:
+                self._write(batch)
+            elif not self._queue.unfinished_tasks:
+                return True
+            else:
+                time.sleep(0.01)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores del registro en segundo plano
+        """
+        return {
+            'enabled': self.enabled,
+            'queue_depth': self._queue.qsize(),
+            'max_queue_size': self._queue.maxsize,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+            'enqueued': self._enqueued,
+            'written': self._written,
+            'dropped': self._dropped,
+            'failed': self._failed,
+            'blocked': self._blocked,
+            'batches': self._batches,
+            'last_batch_ms': self._last_batch_ms,
+        }
+
+    def _ensure_worker(self):
+        """
+        Arrancar el hilo de escritura en el primer uso (después de un fork)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # Esperar hasta completar el lote o hasta el intervalo de escritura
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _drain(self, limit: int) -> List[MessageRecord]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[MessageRecord]):
+        """
+        Guardar un lote de mensajes en una transacción
+        """
+        from backend.models import db, Message
+
+        started = time.monotonic()
+        session_ids = {record.session_id for record in batch}
+        with self._write_lock, self._app.app_context():
+            try:
+                conversation_ids = active_conversation_ids(session_ids)
+                rows = []
+                for record in batch:
+                    row = asdict(record)
+                    row['conversation_id'] = conversation_ids[row.pop('session_id')]
+                    rows.append(row)
+                db.session.execute(Message.__table__.insert(), rows)
+                add_message_counts(Counter(row['conversation_id'] for row in rows))
+                db.session.commit()
+                self._written += len(batch)
+            except Exception as e:
+                db.session.rollback()
+                conversation_cache.forget(session_ids)
+                self._failed += len(batch)
+                logger.error(f"Error guardando {len(batch)} mensajes: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+        self._batches += 1
+        self._last_batch_ms = (time.monotonic() - started) * 1000.0
+
+
+# Instancia global del registro de mensajes
+message_writer = MessageWriter()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Agrupación de búsquedas concurrentes en microlotes
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.services.question_index import question_index, QuestionIndex
+from backend.utils.preprocessing import processor, AnalyzedText
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Job:
+    """Búsqueda pendiente de un microlote"""
+    analysis: AnalyzedText
+    threshold: float
+    index: Optional[QuestionIndex] = None  # Instantánea de la petición (None: la vigente)
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class MicroBatcher:
+    """
+    Agrupa las búsquedas que llegan casi a la vez.
+
+    Un hilo recoge las peticiones que llegan dentro de una ventana de
+    `window_ms` milisegundos desde la primera (o hasta `max_batch_size`),
+    las procesa con nlp.pipe, las puntúa con QuestionIndex.search_many en una
+    sola pasada (por cada instantánea del índice que usan las peticiones)
+    y completa el Future de cada una. Con tráfico bajo cada
+    petición espera como mucho la ventana; con ráfagas, el coste de spaCy y
+    del producto matricial se reparte entre todo el lote.
+    """
+
+    def __init__(self, window_ms: float = 2.0, max_batch_size: int = 32):
+        self.enabled = False
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._app = None
+        self._queue: 'queue.Queue[_Job]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Métricas
+        self._batches = 0
+        self._requests = 0
+        self._max_batch = 0
+        self._recent_sizes = deque(maxlen=1024)
+        self._recent_waits = deque(maxlen=1024)
+
+    def init_app(self, app):
+        """
+        Leer la configuración del microlote desde la aplicación
+        """
+        self._app = app
+        self.enabled = bool(app.config.get('MICRO_BATCH_ENABLED', False))
+        self.window = float(app.config.get('MICRO_BATCH_WINDOW_MS', 2.0)) / 1000.0
+        self.max_batch_size = int(app.config.get('MICRO_BATCH_MAX_SIZE', 32))
+
+    def search(self, analysis: AnalyzedText, threshold: float = 0.3,
+               index: Optional[QuestionIndex] = None) -> Tuple[Optional[int], float]:
+        """
+        Buscar la mejor pregunta para la entrada dentro del próximo microlote
+        (bloquea hasta que el lote se procesa)
+        """
+        return self.submit(analysis, threshold, index).result()
+
+    def submit(self, analysis: AnalyzedText, threshold: float = 0.3,
+               index: Optional[QuestionIndex] = None) -> Future:
+        """
+        Encolar una búsqueda en la instantánea `index` (la que tomó la
+        petición; sin ella, la vigente al procesar el lote). El Future
+        devuelve (id de la pregunta, confianza)
+        """
+        self._ensure_worker()
+        job = _Job(analysis, threshold, index)
+        self._queue.put(job)
+        return job.future
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Tamaño de los lotes y espera en cola (milisegundos) de las peticiones recientes
+        """
+        sizes = sorted(self._recent_sizes)
+        waits = sorted(self._recent_waits)
+        return {
+            'enabled': self.enabled,
+            'window_ms': self.window * 1000.0,
+            'max_batch_size': self.max_batch_size,
+            'batches': self._batches,
+            'requests': self._requests,
+            'max_batch': self._max_batch,
+            'avg_batch_size': sum(sizes) / len(sizes) if sizes else 0.0,
+            'queue_wait_p50_ms': _percentile(waits, 0.50) * 1000.0,
+            'queue_wait_p95_ms': _percentile(waits, 0.95) * 1000.0,
+            'queue_depth': self._queue.qsize(),
+        }
+
+    def _ensure_worker(self):
+        """
+        Arrancar el hilo del microlote en el primer uso (después de un fork)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"Error procesando microlote: {e}")
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+
+    def _collect(self) -> List[_Job]:
+        """
+        Esperar la primera petición y reunir las que lleguen durante la ventana
+        """
+        first = self._queue.get()
+        batch = [first]
+        deadline = first.enqueued_at + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch: List[_Job]):
+        """
+        Procesar el lote con nlp.pipe y puntuarlo en una sola pasada
+        """
+        started = time.monotonic()
+        self._batches += 1
+        self._requests += len(batch)
+        self._max_batch = max(self._max_batch, len(batch))
+        self._recent_sizes.append(len(batch))
+        self._recent_waits.extend(started - job.enqueued_at for job in batch)
+
+        with self._app.app_context():
+            processor.parse_pending([job.analysis for job in batch], batch_size=len(batch))
+
+            # Cada petición se puntúa con su instantánea; normalmente todo el
+            # lote comparte la misma y basta una pasada
+            groups: Dict[int, Tuple[QuestionIndex, List[_Job]]] = {}
+            for job in batch:
+                index = job.index or question_index.get()
+                groups.setdefault(id(index), (index, []))[1].append(job)
+
+            for index, jobs in groups.values():
+                ranked = index.search_many([job.analysis for job in jobs], threshold=0.0, top_k=1,
+                                           settings=question_index.settings)
+                for job, matches in zip(jobs, ranked):
+                    if matches and matches[0][1] >= job.threshold:
+                        job.future.set_result(matches[0])
+                    else:
+                        job.future.set_result((None, 0.0))
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """
+    Percentil de una lista ya ordenada (0 si está vacía)
+    """
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+# Instancia global del microlote
+micro_batcher = MicroBatcher()
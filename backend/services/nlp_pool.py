@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Procesos de trabajo para el procesamiento con spaCy fuera del GIL
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.services.question_index import question_index, QuestionIndex, MatchSettings
+from backend.utils.nlp_model import model_manager
+from backend.utils.preprocessing import processor
+
+logger = logging.getLogger(__name__)
+
+# Índice de preguntas del proceso de trabajo (lo fija el inicializador)
+_worker_index: Optional[QuestionIndex] = None
+
+
+def _init_worker(model_name: str, index: QuestionIndex):
+    """
+    Cargar el modelo y el índice al arrancar cada proceso de trabajo
+    """
+    global _worker_index
+    model_manager.model_name = model_name
+    model_manager.load()
+    _worker_index = index
+
+
+def _match_job(texts: List[str], threshold: float, settings: MatchSettings) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Buscar la mejor pregunta para cada texto en el índice del proceso de
+    trabajo. Devuelve también la versión del índice con que se buscó.
+    """
+    return _worker_index.version, _match_texts(_worker_index, texts, threshold, settings)
+
+
+def _match_texts(index: QuestionIndex, texts: List[str], threshold: float,
+                 settings: MatchSettings) -> List[Dict[str, Any]]:
+    """
+    Buscar la mejor pregunta para cada texto y extraer sus palabras clave
+    """
+    analyses = processor.analyze_many(texts)
+    ranked = index.search_many(analyses, threshold=threshold, top_k=1, settings=settings)
+    return [
+        {
+            'question_id': matches[0][0] if matches else None,
+            'confidence': matches[0][1] if matches else 0.0,
+            'keywords': analysis.keywords
+        }
+        for analysis, matches in zip(analyses, ranked)
+    ]
+
+
+def _index_version_job(_=None) -> int:
+    """
+    Versión del índice del proceso de trabajo (sirve para arrancar los procesos)
+    """
+    return _worker_index.version
+
+
+def _analyze_job(text: str) -> Dict[str, Any]:
+    """
+    Análisis completo del texto (mismo formato que /api/analyze)
+    """
+    analyzed = processor.analyze(text)
+    return {
+        'keywords': processor.extract_keywords(analyzed),
+        'intent': processor.extract_intent(analyzed),
+        'question_type': processor.extract_question_type(analyzed),
+        'processed_tokens': processor.preprocess(analyzed)
+    }
+
+
+class NLPWorkerPool:
+    """
+    Pool opcional de procesos de trabajo de larga duración.
+
+    Cada proceso carga el modelo de spaCy y una copia del índice de preguntas
+    al arrancar, de modo que el análisis y la búsqueda escalan con los
+    núcleos en lugar de competir por el GIL de los hilos de Flask. Los
+    procesos se reciclan tras `max_tasks_per_child` trabajos.
+
+    Cuando cambia el índice se sigue usando el pool actual (match_many
+    descarta sus resultados de otra versión) mientras se arranca otro con
+    la nueva versión en segundo plano; al estar listo sustituye al anterior.
+    Los cambios seguidos se agrupan: nunca se prepara más de un pool a la vez.
+
+    Un trabajo que supera `timeout` segundos se da por fallido, pero no se
+    puede interrumpir: su proceso sigue ocupado hasta terminarlo. Para no
+    perder capacidad, tras un timeout se prepara un pool nuevo y el anterior
+    se cierra cuando acaben sus trabajos (mientras, hay más procesos que `size`).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.size = os.cpu_count() or 1
+        self.timeout = 10.0
+        self.max_tasks_per_child = 1000
+        self.start_method = 'spawn'
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._index: Optional[QuestionIndex] = None
+        self._lock = threading.Lock()
+        self._replacement: Optional[threading.Thread] = None
+        self._version_mismatches = 0
+        self._recycles = 0
+        self._timeouts = 0
+
+    def init_app(self, app):
+        """
+        Leer la configuración del pool desde la aplicación
+        """
+        self.enabled = bool(app.config.get('NLP_POOL_ENABLED', False))
+        self.size = int(app.config.get('NLP_POOL_SIZE') or self.size)
+        self.timeout = float(app.config.get('NLP_POOL_TIMEOUT', self.timeout))
+        self.max_tasks_per_child = int(app.config.get('NLP_POOL_MAX_TASKS_PER_CHILD', self.max_tasks_per_child))
+        self.start_method = app.config.get('NLP_POOL_START_METHOD', self.start_method)
+
+    def match(self, text: str, threshold: float = 0.3,
+              index: Optional[QuestionIndex] = None) -> Tuple[Optional[int], float, List[str]]:
+        """
+        Buscar la mejor pregunta en un proceso de trabajo.
+        Devuelve el id de la pregunta, la confianza y las palabras clave.
+        Requiere un contexto de aplicación activo.
+        """
+        result = self.match_many([text], threshold, index)[0]
+        return result['question_id'], result['confidence'], result['keywords']
+
+    def match_many(self, texts: List[str], threshold: float = 0.3,
+                   index: Optional[QuestionIndex] = None) -> List[Dict[str, Any]]:
+        """
+        Buscar la mejor pregunta para un lote de textos en un proceso de
+        trabajo. `index` es la instantánea que tomó la petición: si los
+        procesos de trabajo tienen otra versión del índice, su resultado se
+        descarta y el lote se busca en este proceso con esa instantánea (sin
+        enviarlo al pool si ya se sabe que su versión es otra, por ejemplo
+        mientras se prepara el pool de la nueva).
+        """
+        if index is not None:
+            self._get_executor()
+            if self._index is not None and self._index.version != index.version:
+                self._version_mismatches += 1
+                return _match_texts(index, texts, threshold, question_index.settings)
+
+        version, results = self._run(_match_job, texts, threshold, question_index.settings)
+        if index is not None and version != index.version:
+            self._version_mismatches += 1
+            return _match_texts(index, texts, threshold, question_index.settings)
+        return results
+
+    def analyze(self, text: str) -> Dict[str, Any]:
+        """
+        Analizar un texto en un proceso de trabajo
+        """
+        return self._run(_analyze_job, text)
+
+    def shutdown(self):
+        """
+        Detener los procesos de trabajo
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._index = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'size': self.size,
+            'running': self._executor is not None,
+            'index_version': self._index.version if self._index is not None else None,
+            'version_mismatches': self._version_mismatches,
+            'recycles': self._recycles,
+            'replacing': self._replacement is not None and self._replacement.is_alive(),
+            'timeouts': self._timeouts,
+            'max_tasks_per_child': self.max_tasks_per_child,
+            'timeout': self.timeout
+        }
+
+    def _run(self, fn, *args):
+        """
+        Ejecutar un trabajo y esperar el resultado; si el pool se rompe
+        (p. ej. un proceso murió) se recrea en la siguiente petición
+        """
+        executor = self._get_executor()
+        try:
+            return executor.submit(fn, *args).result(timeout=self.timeout)
+        except TimeoutError:
+            self._timeouts += 1
+            logger.warning(f"Trabajo del pool NLP sin terminar tras {self.timeout}s; se prepara otro pool")
+            self._replace_in_background(self._index, force=True)
+            raise
+        except BrokenProcessPool:
+            logger.error("Pool de procesos NLP roto; se recreará en la siguiente petición")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Pool de procesos de trabajo. Solo el primero se crea en la petición;
+        si después cambia la versión del índice, se prepara el siguiente en
+        segundo plano y mientras tanto se usa el actual.
+        """
+        index = question_index.get()
+        executor = self._executor
+        if executor is not None:
+            if self._index.version != index.version:
+                self._replace_in_background(index)
+            return executor
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor(index)
+                self._index = index
+            return self._executor
+
+    def _create_executor(self, index: QuestionIndex) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(model_manager.model_name, index),
+            max_tasks_per_child=self.max_tasks_per_child
+        )
+
+    def _replace_in_background(self, index: QuestionIndex, force: bool = False):
+        """
+        Preparar en un hilo un pool con `index` (si no hay ya uno en
+        preparación) y sustituir con él al actual cuando sus procesos estén
+        listos. Sin `force` no se hace nada si el pool ya tiene esa versión.
+        """
+        if self._replacement is not None and self._replacement.is_alive():
+            return
+        with self._lock:
+            if self._replacement is not None and self._replacement.is_alive():
+                return
+            if not force and self._index is not None and self._index.version == index.version:
+                return
+            self._replacement = threading.Thread(target=self._replace, args=(index,),
+                                                 name='nlp-pool-replacement', daemon=True)
+            self._replacement.start()
+
+    def _replace(self, index: QuestionIndex):
+        executor = None
+        try:
+            executor = self._create_executor(index)
+            # Arrancar los procesos (cargan el modelo y el índice) antes de publicarlo
+            list(executor.map(_index_version_job, range(self.size)))
+        except Exception as e:
+            logger.error(f"Error preparando el pool de procesos NLP: {e}")
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            return
+
+        with self._lock:
+            if self._executor is None:
+                # Se detuvo el pool mientras se preparaba
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+            previous = self._executor
+            self._executor, self._index = executor, index
+            self._recycles += 1
+        # Los trabajos en curso del pool anterior terminan antes de cerrarlo
+        previous.shutdown(wait=False)
+
+
+# Instancia global del pool
+nlp_pool = NLPWorkerPool()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Listas invertidas (término -> filas del índice de preguntas)
+"""
+
+from typing import Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+
+
+class Postings:
+    """
+    Índice invertido compacto en formato CSR.
+
+    Las filas de todos los términos se guardan en un único arreglo `rows`;
+    las del término con id `t` están en `rows[offsets[t]:offsets[t + 1]]`.
+    Las filas añadidas después de construir el CSR se guardan aparte en
+    `delta` (término -> filas) hasta que `compact` las fusiona.
+    """
+
+    def __init__(self, vocab: Dict[Hashable, int], offsets: np.ndarray, rows: np.ndarray,
+                 delta: Optional[Dict[Hashable, np.ndarray]] = None):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.rows = rows
+        self.delta: Dict[Hashable, np.ndarray] = delta or {}
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def __contains__(self, term: Hashable) -> bool:
+        return term in self.vocab or term in self.delta
+
+    @classmethod
+    def build(cls, documents: Iterable[Iterable[Hashable]]) -> 'Postings':
+        """
+        Construir a partir de los términos de cada fila (la posición es la fila)
+        """
+        buckets: Dict[Hashable, List[int]] = {}
+        for row, terms in enumerate(documents):
+            for term in set(terms):
+                buckets.setdefault(term, []).append(row)
+
+        vocab = {}
+        offsets = np.zeros(len(buckets) + 1, dtype=np.int64)
+        chunks = []
+        for term_id, (term, term_rows) in enumerate(buckets.items()):
+            vocab[term] = term_id
+            offsets[term_id + 1] = offsets[term_id] + len(term_rows)
+            chunks.append(term_rows)
+
+        rows = np.fromiter((row for chunk in chunks for row in chunk), dtype=np.int32, count=int(offsets[-1]))
+        return cls(vocab, offsets, rows)
+
+    @classmethod
+    def from_csr(cls, offsets: np.ndarray, values: np.ndarray) -> 'Postings':
+        """
+        Construir a partir de términos enteros guardados por fila en formato
+        CSR (los de la fila `r` están en `values[offsets[r]:offsets[r + 1]]`,
+        sin repetir), sin recorrer las filas en Python
+        """
+        row_ids = np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+        order = np.argsort(values, kind='stable')
+        terms, starts = np.unique(values[order], return_index=True)
+
+        vocab = {int(term): term_id for term_id, term in enumerate(terms)}
+        term_offsets = np.append(starts, len(values)).astype(np.int64)
+        return cls(vocab, term_offsets, row_ids[order])
+
+    def get(self, term: Hashable) -> np.ndarray:
+        """
+        Filas que contienen el término (arreglo vacío si no existe)
+        """
+        term_id = self.vocab.get(term)
+        rows = self.rows[self.offsets[term_id]:self.offsets[term_id + 1]] if term_id is not None else self.rows[:0]
+        added = self.delta.get(term)
+        if added is None:
+            return rows
+        return np.concatenate([rows, added]) if len(rows) else added
+
+    def lookup(self, terms: Iterable[Hashable]) -> List[np.ndarray]:
+        """
+        Listas de filas de cada término conocido
+        """
+        return [self.get(term) for term in terms if term in self]
+
+    def union(self, terms: Iterable[Hashable]) -> np.ndarray:
+        """
+        Filas que contienen al menos uno de los términos (ordenadas, sin repetir)
+        """
+        lists = self.lookup(terms)
+        if not lists:
+            return self.rows[:0]
+        return np.unique(np.concatenate(lists))
+
+    def count_matches(self, terms: Iterable[Hashable], n_rows: int) -> np.ndarray:
+        """
+        Número de términos distintos compartidos por cada fila
+        """
+        lists = self.lookup(set(terms))
+        if not lists:
+            return np.zeros(n_rows, dtype=np.int32)
+        return np.bincount(np.concatenate(lists), minlength=n_rows).astype(np.int32)
+
+    def add_rows(self, documents: Iterable[Iterable[Hashable]], first_row: int) -> 'Postings':
+        """
+        Nuevo índice con filas añadidas a partir de `first_row` (comparte el
+        CSR con este; las filas nuevas van a `delta`)
+        """
+        delta = dict(self.delta)
+        for row, terms in enumerate(documents, start=first_row):
+            for term in set(terms):
+                added = np.array([row], dtype=np.int32)
+                delta[term] = added if term not in delta else np.concatenate([delta[term], added])
+        return Postings(self.vocab, self.offsets, self.rows, delta)
+
+    def compact(self, keep: np.ndarray) -> 'Postings':
+        """
+        Fusionar `delta` en el CSR quitando las filas con `keep[fila] = False`
+        y renumerando las demás (la fila `r` pasa a ser `keep[:r].sum()`)
+        """
+        vocab = dict(self.vocab)
+        term_ids = [np.repeat(np.arange(len(self.vocab), dtype=np.int64), np.diff(self.offsets))]
+        rows = [np.asarray(self.rows)]
+        for term, added in self.delta.items():
+            term_ids.append(np.full(len(added), vocab.setdefault(term, len(vocab)), dtype=np.int64))
+            rows.append(added)
+        term_ids = np.concatenate(term_ids)
+        rows = np.concatenate(rows)
+
+        kept = keep[rows]
+        term_ids, rows = term_ids[kept], rows[kept]
+        order = np.argsort(term_ids, kind='stable')
+        term_ids, rows = term_ids[order], rows[order]
+
+        # Quitar los términos que se quedan sin filas y renumerar el resto
+        counts = np.bincount(term_ids, minlength=len(vocab))
+        present = counts > 0
+        new_ids = np.cumsum(present) - 1
+        vocab = {term: int(new_ids[term_id]) for term, term_id in vocab.items() if present[term_id]}
+
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(counts[present], out=offsets[1:])
+        new_rows = (np.cumsum(keep) - 1).astype(np.int32)
+        return Postings(vocab, offsets, new_rows[rows])
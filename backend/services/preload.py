@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Preparación del proceso maestro antes de crear los workers (preload)
+"""
+
+import gc
+import logging
+import time
+
+from backend.models import db
+from backend.services.index_store import ensure_bank_version
+from backend.services.question_index import question_index
+from backend.utils.nlp_model import model_manager
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_for_fork(app):
+    """
+    Cargar el modelo y construir el índice en el proceso maestro para que
+    los workers los compartan por copy-on-write.
+
+    Los arreglos grandes del índice (vectores, listas invertidas, trigramas)
+    son arreglos de numpy: sus datos no llevan contador de referencias, así
+    que leerlos no copia páginas. Los objetos de Python que quedan se mueven
+    a la generación permanente del recolector (gc.freeze) para que las
+    recolecciones de los workers no escriban en ellos. Las conexiones a la
+    base de datos abiertas en el maestro se descartan para no compartirlas.
+    """
+    start = time.time()
+    model_manager.load()
+    with app.app_context():
+        # Bases de datos anteriores a la versión compartida del banco
+        ensure_bank_version()
+        index = question_index.rebuild()
+        if question_index.settings.lexical_scorer == 'bm25':
+            index.bm25  # Calcular las estadísticas antes de compartirlas
+        db.engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        f"Preload completado en {time.time() - start:.2f}s "
+        f"({gc.get_freeze_count()} objetos congelados)"
+    )
+
+
+def after_fork():
+    """
+    Reactivar el recolector en el worker (el maestro lo desactiva al cargar)
+    """
+    gc.enable()
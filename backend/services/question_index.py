@@ -0,0 +1,1049 @@
+#!/usr/bin/env python3
+"""
+Índice en memoria de preguntas para la búsqueda de respuestas
+"""
+
+import difflib
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from functools import cached_property
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from flask import has_app_context
+
+from backend.services.bm25 import BM25Index
+from backend.services.index_store import bank_signature, bump_bank_version, load_index, read_bank_version, IndexFormatError
+from backend.services.postings import Postings
+from backend.services.vector_index import IVFIndex
+from backend.utils.normalization import normalize_text
+from backend.utils.nlp_model import model_manager
+from backend.utils.preprocessing import processor, AnalyzedText, TextInput
+
+logger = logging.getLogger(__name__)
+
+# Campos de la pregunta que alimentan el índice invertido
+INDEXED_FIELDS = ('question', 'keywords', 'synonyms')
+
+# Qué hacer cuando ningún término de la entrada aparece en el índice invertido:
+# 'all' puntúa todo el banco (comportamiento original), 'none' no devuelve coincidencia
+FALLBACK_MODES = ('all', 'none')
+
+# Columnas de Question que afectan al índice (los cambios en otras, como
+# usage_count, no lo modifican)
+TRACKED_COLUMNS = ('question_text', 'keywords', 'synonyms', 'is_active')
+
+# Cambios pendientes mínimos antes de compactar el índice
+COMPACT_MIN_CHANGES = 32
+
+# Celdas (entradas x preguntas) de la matriz de similitud semántica que
+# `search_many` calcula de una vez: unos 16 MB en float32
+SEARCH_MANY_MAX_CELLS = 4_000_000
+
+# Similitud de caracteres de la etapa de reordenamiento: 'trigram' (Dice sobre
+# trigramas precalculados) o 'sequence' (difflib.SequenceMatcher, la original)
+CHARACTER_SCORERS = ('trigram', 'sequence')
+
+# Puntuación de la etapa léxica: 'jaccard' (lemas del texto, la original) o
+# 'bm25' (texto, palabras clave y sinónimos ponderados por su rareza)
+LEXICAL_SCORERS = ('jaccard', 'bm25')
+
+# Búsqueda por vector cuando no hay candidatos léxicos: 'exact' (todo el
+# banco) o 'ivf' (aproximada, si el índice tiene IVF)
+VECTOR_SEARCH_MODES = ('exact', 'ivf')
+
+
+@dataclass(frozen=True)
+class MatchSettings:
+    """
+    Parámetros de la búsqueda en cascada.
+
+    La etapa léxica (Jaccard sobre lemas) ordena todos los candidatos y solo
+    los `rerank_top_n` mejores pasan a la etapa semántica y de caracteres.
+    Con `rerank_top_n = 0` se puntúan todos los candidatos y con
+    `prune_candidates = False` se ignora el índice invertido. Si ningún lema
+    coincide, las `trigram_candidates` preguntas con más trigramas en común
+    se usan como candidatas (entradas con errores tipográficos).
+
+    Con `lexical_scorer = 'bm25'` la etapa léxica usa BM25 con los
+    parámetros `bm25_k1` y `bm25_b` y los pesos `bm25_field_weights` de los
+    campos pregunta, palabras clave y sinónimos.
+
+    Con `vector_search = 'ivf'` las búsquedas que no encuentran candidatos
+    léxicos ni por trigramas toman los `ann_candidates` vecinos más
+    cercanos del IVF (explorando `ann_probes` listas) en lugar de puntuar
+    todo el banco, y los lotes no calculan la similitud con todo el banco.
+    """
+    fallback: str = 'all'
+    prune_candidates: bool = True
+    trigram_candidates: int = 50
+    rerank_top_n: int = 50
+    character_scorer: str = 'trigram'
+    lexical_scorer: str = 'jaccard'
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+    bm25_field_weights: Tuple[float, float, float] = (1.0, 0.7, 0.5)
+    vector_search: str = 'exact'
+    ann_probes: int = 8
+    ann_candidates: int = 100
+    semantic_weight: float = 0.5
+    lexical_weight: float = 0.3
+    character_weight: float = 0.2
+
+    @classmethod
+    def from_config(cls, config) -> 'MatchSettings':
+        settings = cls(
+            fallback=config.get('MATCH_CANDIDATE_FALLBACK', cls.fallback),
+            trigram_candidates=int(config.get('MATCH_TRIGRAM_CANDIDATES', cls.trigram_candidates)),
+            rerank_top_n=int(config.get('MATCH_RERANK_TOP_N', cls.rerank_top_n)),
+            character_scorer=config.get('MATCH_CHARACTER_SCORER', cls.character_scorer),
+            lexical_scorer=config.get('MATCH_LEXICAL_SCORER', cls.lexical_scorer),
+            bm25_k1=float(config.get('MATCH_BM25_K1', cls.bm25_k1)),
+            bm25_b=float(config.get('MATCH_BM25_B', cls.bm25_b)),
+            bm25_field_weights=_parse_weights(config.get('MATCH_BM25_FIELD_WEIGHTS'), cls.bm25_field_weights),
+            vector_search=config.get('MATCH_VECTOR_SEARCH', cls.vector_search),
+            ann_probes=int(config.get('MATCH_ANN_PROBES', cls.ann_probes)),
+            ann_candidates=int(config.get('MATCH_ANN_CANDIDATES', cls.ann_candidates)),
+            semantic_weight=float(config.get('MATCH_WEIGHT_SEMANTIC', cls.semantic_weight)),
+            lexical_weight=float(config.get('MATCH_WEIGHT_LEXICAL', cls.lexical_weight)),
+            character_weight=float(config.get('MATCH_WEIGHT_CHARACTER', cls.character_weight)),
+        )
+        if settings.fallback not in FALLBACK_MODES:
+            raise ValueError(f"MATCH_CANDIDATE_FALLBACK debe ser uno de {FALLBACK_MODES}")
+        if settings.character_scorer not in CHARACTER_SCORERS:
+            raise ValueError(f"MATCH_CHARACTER_SCORER debe ser uno de {CHARACTER_SCORERS}")
+        if settings.lexical_scorer not in LEXICAL_SCORERS:
+            raise ValueError(f"MATCH_LEXICAL_SCORER debe ser uno de {LEXICAL_SCORERS}")
+        if settings.vector_search not in VECTOR_SEARCH_MODES:
+            raise ValueError(f"MATCH_VECTOR_SEARCH debe ser uno de {VECTOR_SEARCH_MODES}")
+        return settings
+
+
+def _parse_weights(value, default: Tuple[float, ...]) -> Tuple[float, ...]:
+    """
+    Pesos separados por comas ('1.0,0.7,0.5'), uno por campo indexado
+    """
+    if not value:
+        return default
+    weights = tuple(float(weight) for weight in str(value).split(','))
+    if len(weights) != len(INDEXED_FIELDS):
+        raise ValueError(f"Se esperaban {len(INDEXED_FIELDS)} pesos ({', '.join(INDEXED_FIELDS)})")
+    return weights
+
+
+# Búsqueda exhaustiva de referencia (sin poda ni cascada, similitud original)
+EXHAUSTIVE_SETTINGS = MatchSettings(prune_candidates=False, rerank_top_n=0, character_scorer='sequence')
+
+
+@dataclass(frozen=True)
+class QuestionChange:
+    """Cambio en una pregunta registrado al guardarla en la base de datos"""
+    question_id: int
+    question_text: str = ''
+    keywords: Optional[str] = None
+    synonyms: Optional[str] = None
+    is_active: bool = True
+    deleted: bool = False
+
+    @property
+    def id(self) -> int:
+        return self.question_id
+
+
+class QuestionIndex:
+    """
+    Índice inmutable de preguntas activas.
+
+    Guarda el vector de documento de cada pregunta en una matriz contigua
+    (normalizada por filas) y un índice invertido de lemas por campo, de modo
+    que solo se puntúan las preguntas que comparten algún término con la
+    entrada, y la similitud semántica se calcula con un producto matricial.
+    Los trigramas de caracteres de cada pregunta se guardan en formato CSR
+    (`trigram_values[trigram_offsets[r]:trigram_offsets[r + 1]]`) junto con
+    su propio índice invertido (`postings['trigrams']`). `exact` asocia el
+    texto normalizado de cada pregunta con su id.
+
+    Los cambios en las preguntas se aplican con `apply`, que devuelve un
+    índice nuevo: las filas nuevas se añaden al final, las antiguas se marcan
+    como borradas en `alive` y las listas invertidas nuevas van al `delta`
+    de cada Postings. `compact` elimina las filas borradas y fusiona los delta.
+
+    `ann` es el índice IVF opcional de los vectores (ver `build_ann`).
+    """
+
+    def __init__(self, ids: List[int], texts: List[str], vectors: np.ndarray,
+                 postings: Dict[str, Postings], token_counts: np.ndarray,
+                 trigram_offsets: np.ndarray, trigram_values: np.ndarray, version: int = 0,
+                 exact: Optional[Dict[str, int]] = None, alive: Optional[np.ndarray] = None,
+                 base_rows: Optional[int] = None, ann: Optional[IVFIndex] = None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.texts = texts
+        self.vectors = vectors
+        self.postings = postings
+        self.token_counts = token_counts  # Tokens del texto de cada pregunta (para Jaccard)
+        self.trigram_offsets = trigram_offsets
+        self.trigram_values = trigram_values
+        self.version = version
+
+        if exact is None:
+            exact = {}
+            for question_id, text in zip(ids, texts):
+                normalized = normalize_text(text)
+                if normalized:
+                    exact.setdefault(normalized, question_id)
+        self.exact: Dict[str, int] = exact
+
+        # Filas vigentes (False = pregunta editada, desactivada o borrada)
+        self.alive = alive if alive is not None else np.ones(len(texts), dtype=bool)
+        self.live_count = int(self.alive.sum())
+        # Filas del CSR original (las siguientes se añadieron con `apply`)
+        self.base_rows = base_rows if base_rows is not None else len(texts)
+        self.ann = ann
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def pending_changes(self) -> int:
+        """Filas borradas o añadidas desde la última compactación"""
+        return (len(self) - self.live_count) + (len(self) - self.base_rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria de los arreglos del índice (sin diccionarios ni textos)"""
+        arrays = [self.ids, self.vectors, self.token_counts, self.trigram_offsets, self.trigram_values, self.alive]
+        for postings in self.postings.values():
+            arrays += [postings.offsets, postings.rows, *postings.delta.values()]
+        ann_bytes = self.ann.nbytes if self.ann is not None else 0
+        return int(sum(array.nbytes for array in arrays)) + ann_bytes
+
+    @cached_property
+    def bm25(self) -> BM25Index:
+        """Estadísticas BM25 de los campos indexados (se calculan al primer uso)"""
+        return BM25Index(self.postings, INDEXED_FIELDS, self.alive)
+
+    def build_ann(self, n_lists: int = 0) -> 'QuestionIndex':
+        """
+        Entrenar el índice IVF de los vectores (antes de publicar el índice)
+        """
+        self.ann = IVFIndex.train(self.vectors, n_lists)
+        return self
+
+    def live_rows(self) -> np.ndarray:
+        """Todas las filas vigentes"""
+        if self.live_count == len(self):
+            return np.arange(len(self))
+        return np.flatnonzero(self.alive)
+
+    @classmethod
+    def build(cls, questions, version: int = 0) -> 'QuestionIndex':
+        """
+        Construir el índice a partir de una lista de objetos Question
+        """
+        rows = _analyze_questions(questions)
+
+        postings = {
+            'question': Postings.build(rows.tokens),
+            'keywords': Postings.build(rows.keyword_terms),
+            'synonyms': Postings.build(rows.synonym_terms),
+            'trigrams': Postings.from_csr(rows.trigram_offsets, rows.trigram_values),
+        }
+
+        return cls(rows.ids, rows.texts, rows.vectors, postings, rows.token_counts,
+                   rows.trigram_offsets, rows.trigram_values, version)
+
+    @classmethod
+    def from_database(cls, version: int = 0) -> 'QuestionIndex':
+        """
+        Construir el índice con las preguntas activas de la base de datos.
+        Requiere un contexto de aplicación activo.
+        """
+        from backend.models import Question
+
+        questions = Question.query.filter_by(is_active=True).order_by(Question.id).all()
+        return cls.build(questions, version)
+
+    def apply(self, changes: List['QuestionChange'], version: int) -> 'QuestionIndex':
+        """
+        Nuevo índice con los cambios aplicados: las filas de las preguntas
+        cambiadas se marcan como borradas y las que siguen activas se
+        analizan y se añaden al final
+        """
+        latest = {change.question_id: change for change in changes}
+        alive = self.alive.copy()
+        exact = dict(self.exact)
+
+        orphaned = []
+        for row in np.flatnonzero(np.isin(self.ids, list(latest)) & alive):
+            alive[row] = False
+            normalized = normalize_text(self.texts[row])
+            if exact.get(normalized) == int(self.ids[row]):
+                del exact[normalized]
+                orphaned.append((row, normalized))
+
+        # Otra pregunta vigente con la misma redacción pasa a ocupar la entrada
+        for row, normalized in orphaned:
+            survivors = self._duplicate_rows(row, normalized, alive)
+            if len(survivors):
+                exact[normalized] = int(self.ids[survivors].min())
+
+        added = [change for change in latest.values() if change.is_active and not change.deleted]
+        if not added:
+            return QuestionIndex(self.ids, self.texts, self.vectors, self.postings, self.token_counts,
+                                 self.trigram_offsets, self.trigram_values, version,
+                                 exact=exact, alive=alive, base_rows=self.base_rows, ann=self.ann)
+
+        rows = _analyze_questions(added)
+        first_row = len(self)
+        for question_id, text in zip(rows.ids, rows.texts):
+            normalized = normalize_text(text)
+            if normalized:
+                # Entre preguntas con la misma redacción gana la de menor id, como en `build`
+                exact[normalized] = min(exact.get(normalized, question_id), question_id)
+
+        postings = {
+            'question': self.postings['question'].add_rows(rows.tokens, first_row),
+            'keywords': self.postings['keywords'].add_rows(rows.keyword_terms, first_row),
+            'synonyms': self.postings['synonyms'].add_rows(rows.synonym_terms, first_row),
+            'trigrams': self.postings['trigrams'].add_rows(
+                (rows.trigram_values[start:end].tolist()
+                 for start, end in zip(rows.trigram_offsets[:-1], rows.trigram_offsets[1:])),
+                first_row
+            ),
+        }
+
+        return QuestionIndex(
+            np.concatenate([self.ids, np.asarray(rows.ids, dtype=np.int64)]),
+            list(self.texts) + rows.texts,
+            np.concatenate([self.vectors, rows.vectors]),
+            postings,
+            np.concatenate([self.token_counts, rows.token_counts]),
+            np.concatenate([self.trigram_offsets, self.trigram_offsets[-1] + rows.trigram_offsets[1:]]),
+            np.concatenate([self.trigram_values, rows.trigram_values]),
+            version,
+            exact=exact,
+            alive=np.concatenate([alive, np.ones(len(rows.ids), dtype=bool)]),
+            base_rows=self.base_rows,
+            ann=self.ann.add(rows.vectors, first_row) if self.ann is not None else None
+        )
+
+    def _duplicate_rows(self, row: int, normalized: str, alive: np.ndarray) -> np.ndarray:
+        """
+        Filas vigentes (según `alive`) con el mismo texto normalizado que
+        `row`: tienen exactamente sus mismos trigramas, así que se buscan en
+        el índice de trigramas y se comprueban después
+        """
+        trigrams = self.trigram_values[self.trigram_offsets[row]:self.trigram_offsets[row + 1]]
+        if not len(trigrams):
+            return np.zeros(0, dtype=np.int64)
+
+        shared = self.postings['trigrams'].count_matches(trigrams.tolist(), len(self))
+        rows = np.flatnonzero((shared == len(trigrams))
+                              & (np.diff(self.trigram_offsets) == len(trigrams))
+                              & alive)
+        return np.asarray([r for r in rows if normalize_text(self.texts[r]) == normalized], dtype=np.int64)
+
+    def compact(self) -> 'QuestionIndex':
+        """
+        Nuevo índice sin las filas borradas y con los delta fusionados en el CSR
+        """
+        keep = self.alive
+        lengths = np.diff(self.trigram_offsets)[keep]
+        trigram_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=trigram_offsets[1:])
+
+        return QuestionIndex(
+            self.ids[keep],
+            [text for text, alive in zip(self.texts, keep.tolist()) if alive],
+            np.ascontiguousarray(self.vectors[keep]),
+            {name: postings.compact(keep) for name, postings in self.postings.items()},
+            self.token_counts[keep],
+            trigram_offsets,
+            self.trigram_values[np.repeat(keep, np.diff(self.trigram_offsets))],
+            self.version,
+            exact=self.exact,
+            ann=self.ann.compact(keep) if self.ann is not None else None
+        )
+
+    def lookup_exact(self, user_input: TextInput) -> Optional[int]:
+        """
+        Id de la pregunta cuyo texto normalizado coincide con la entrada
+        (no requiere procesar con spaCy)
+        """
+        return self.exact.get(processor.analyze(user_input).normalized)
+
+    def candidates(self, terms) -> np.ndarray:
+        """
+        Filas que comparten al menos un término con la entrada en algún campo
+        """
+        lists = [self.postings[name].union(terms) for name in INDEXED_FIELDS]
+        rows = np.unique(np.concatenate(lists))
+        if self.live_count < len(self):
+            rows = rows[self.alive[rows]]
+        return rows
+
+    def trigram_candidates(self, trigrams: np.ndarray, limit: int) -> np.ndarray:
+        """
+        Las `limit` filas con mayor similitud de trigramas con la entrada
+        """
+        shared = self.postings['trigrams'].count_matches(trigrams.tolist(), len(self))
+        if self.live_count < len(self):
+            shared[~self.alive] = 0
+        rows = np.flatnonzero(shared)
+        if len(rows) > limit:
+            dice = 2.0 * shared[rows] / (np.diff(self.trigram_offsets)[rows] + len(trigrams))
+            rows = np.sort(rows[np.argpartition(-dice, limit - 1)[:limit]])
+        return rows
+
+    def character_similarity(self, trigrams: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Coeficiente de Dice de trigramas entre la entrada y cada fila,
+        vectorizado sobre los segmentos CSR de las filas pedidas
+        """
+        starts = self.trigram_offsets[rows]
+        lengths = self.trigram_offsets[rows + 1] - starts
+        totals = lengths + len(trigrams)
+
+        segment = np.repeat(np.arange(len(rows)), lengths)
+        positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        # Los trigramas de la entrada están ordenados; los de las filas se repiten entre filas
+        values = self.trigram_values[np.repeat(starts, lengths) + positions]
+        found = np.minimum(np.searchsorted(trigrams, values), max(len(trigrams) - 1, 0))
+        hits = trigrams[found] == values if len(trigrams) else np.zeros(len(values), dtype=bool)
+        shared = np.bincount(segment, weights=hits, minlength=len(rows))
+
+        return np.divide(2.0 * shared, totals, out=np.zeros(len(rows)), where=totals > 0)
+
+    def search(self, user_input: TextInput, threshold: float = 0.3,
+               settings: MatchSettings = MatchSettings()) -> Tuple[Optional[int], float]:
+        """
+        Encontrar la pregunta más parecida a la entrada del usuario.
+
+        Con los pesos por defecto la puntuación final es la misma que la de
+        AdvancedTextProcessor.calculate_similarity (semántica 0.5, Jaccard 0.3,
+        caracteres 0.2), pero se calcula en cascada:
+
+        1. Candidatos: preguntas que comparten algún término con la entrada
+           (o, si no hay ninguna, las más parecidas por trigramas).
+        2. Etapa léxica: Jaccard vectorizado (o BM25, según
+           `settings.lexical_scorer`) sobre todos los candidatos (Dice de
+           trigramas si los candidatos salieron de los trigramas).
+        3. Reordenamiento: similitud semántica y de caracteres solo para los
+           `settings.rerank_top_n` mejores de la etapa léxica.
+
+        La similitud de caracteres por trigramas no coincide exactamente con
+        la de SequenceMatcher; `character_scorer='sequence'` reproduce la
+        puntuación original.
+        """
+        if not self.live_count:
+            return None, 0.0
+
+        rows, scores = self._rank(processor.analyze(user_input), settings)
+        if not len(rows):
+            return None, 0.0
+
+        best = int(np.argmax(scores))
+        best_score = float(scores[best])
+        if best_score < threshold:
+            return None, 0.0
+
+        return int(self.ids[rows[best]]), best_score
+
+    def search_many(self, analyses: List[AnalyzedText], threshold: float = 0.3, top_k: int = 1,
+                    settings: MatchSettings = MatchSettings()) -> List[List[Tuple[int, float]]]:
+        """
+        Buscar las `top_k` preguntas más parecidas a cada entrada de un lote.
+
+        La similitud semántica se calcula con un producto matricial (entradas
+        x banco) por tramos de entradas, de modo que la matriz nunca supera
+        SEARCH_MANY_MAX_CELLS celdas; las etapas léxica y de caracteres son
+        las mismas que en `search`. Devuelve, por entrada, pares (id,
+        puntuación) ordenados de mayor a menor puntuación.
+        """
+        return list(self.iter_search_many(analyses, threshold, top_k, settings))
+
+    def iter_search_many(self, analyses: List[AnalyzedText], threshold: float = 0.3, top_k: int = 1,
+                         settings: MatchSettings = MatchSettings()) -> Iterator[List[Tuple[int, float]]]:
+        """
+        Como `search_many`, pero devolviendo los resultados de cada entrada a
+        medida que se calculan
+        """
+        if not self.live_count:
+            for _ in analyses:
+                yield []
+            return
+
+        chunk_size = max(1, SEARCH_MANY_MAX_CELLS // len(self))
+        for start in range(0, len(analyses), chunk_size):
+            chunk = analyses[start:start + chunk_size]
+            if settings.vector_search == 'ivf' and self.ann is not None:
+                # Sin producto con todo el banco: cada entrada calcula solo sus filas
+                semantic = [None] * len(chunk)
+            else:
+                queries = np.vstack([analysis.vector for analysis in chunk]).astype(np.float32)
+                semantic = _normalize_rows(queries) @ self.vectors.T
+
+            for analysis, semantic_row in zip(chunk, semantic):
+                rows, scores = self._rank(analysis, settings, semantic_row)
+                order = np.argsort(-scores, kind='stable')[:top_k]
+                yield [(int(self.ids[rows[i]]), float(scores[i])) for i in order if scores[i] >= threshold]
+
+    def _rank(self, analysis: AnalyzedText, settings: MatchSettings,
+              semantic_row: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filas candidatas y su puntuación final según la cascada de `search`.
+        `semantic_row` es la similitud semántica precalculada de la entrada
+        con todo el banco (si no se da, se calcula solo para las filas necesarias)
+        """
+        input_tokens = analysis.token_set
+
+        bm25_rows = None
+        if settings.lexical_scorer == 'bm25':
+            # Las filas con puntuación BM25 son justamente los candidatos
+            bm25_rows, bm25_scores = self.bm25.score(input_tokens, settings.bm25_field_weights,
+                                                     settings.bm25_k1, settings.bm25_b)
+            rows = bm25_rows if settings.prune_candidates else self.live_rows()
+        else:
+            rows = self.candidates(input_tokens) if settings.prune_candidates else self.live_rows()
+        fuzzy = False
+        if not len(rows) and settings.trigram_candidates:
+            rows = self.trigram_candidates(analysis.trigrams, settings.trigram_candidates)
+            fuzzy = True
+        query = None
+        if not len(rows):
+            if settings.fallback == 'none':
+                return rows, np.zeros(0)
+            if settings.vector_search == 'ivf' and self.ann is not None:
+                query = _normalize_rows(analysis.vector.reshape(1, -1).astype(np.float32))[0]
+                alive = self.alive if self.live_count < len(self) else None
+                rows, _ = self.ann.search(query, self.vectors, settings.ann_candidates, settings.ann_probes, alive)
+                rows = np.sort(rows)
+            else:
+                rows = self.live_rows()
+
+        question_counts = self.token_counts[rows]
+        if bm25_rows is not None:
+            # Etapa léxica: BM25 (cero en las filas que no comparten ningún término)
+            if rows is bm25_rows:
+                lexical = bm25_scores
+            else:
+                lexical = np.zeros(len(rows))
+                positions = np.searchsorted(bm25_rows, rows)
+                found = positions < len(bm25_rows)
+                found[found] = bm25_rows[positions[found]] == rows[found]
+                lexical[found] = bm25_scores[positions[found]]
+        else:
+            # Etapa léxica: Jaccard a partir de las listas invertidas del texto
+            intersection = self.postings['question'].count_matches(input_tokens, len(self))[rows]
+            union = question_counts + len(input_tokens) - intersection
+            lexical = np.divide(intersection, union, out=np.zeros(len(rows)), where=union > 0)
+        if fuzzy:
+            # Ningún lema coincide (errores tipográficos): la señal léxica es la de trigramas
+            lexical = self.character_similarity(analysis.trigrams, rows)
+
+        if semantic_row is None:
+            if query is None:
+                query = _normalize_rows(analysis.vector.reshape(1, -1).astype(np.float32))[0]
+            semantic_of = lambda selected: self.vectors[selected] @ query
+        else:
+            semantic_of = lambda selected: semantic_row[selected]
+
+        top_n = settings.rerank_top_n
+        if top_n and len(rows) > top_n:
+            # Sin señal léxica (p. ej. al puntuar todo el banco) se ordena por el vector
+            key = lexical if lexical.any() else semantic_of(rows)
+            top = np.argpartition(-key, top_n - 1)[:top_n]
+            rows, lexical, question_counts = rows[top], lexical[top], question_counts[top]
+
+        # Etapa de reordenamiento: semántica y caracteres solo para los mejores
+        semantic = semantic_of(rows)
+        if settings.character_scorer == 'trigram':
+            character = self.character_similarity(analysis.trigrams, rows)
+        else:
+            character = np.fromiter(
+                (difflib.SequenceMatcher(None, analysis.lower, self.texts[row]).ratio() for row in rows),
+                dtype=np.float64, count=len(rows)
+            )
+
+        scores = (semantic * settings.semantic_weight
+                  + lexical * settings.lexical_weight
+                  + character * settings.character_weight)
+        # Sin tokens en alguno de los textos solo cuenta la similitud semántica
+        no_tokens = (question_counts == 0) if input_tokens else np.ones(len(rows), dtype=bool)
+        scores = np.where(no_tokens, semantic, scores)
+        np.minimum(scores, 1.0, out=scores)
+        return rows, scores
+
+
+@dataclass(frozen=True)
+class SnapshotInfo:
+    """Datos de una versión publicada del índice"""
+    version: int
+    source: str  # 'database', 'disk', 'incremental' o 'compaction'
+    built_at: float
+    build_seconds: float
+    questions: int
+    memory_bytes: int
+
+
+class QuestionIndexManager:
+    """
+    Mantiene el índice vigente y lo reconstruye cuando cambian las preguntas.
+
+    Cada índice publicado es una instantánea inmutable identificada por la
+    versión del banco. Las instantáneas nuevas se construyen aparte (las
+    reconstrucciones completas en un hilo en segundo plano) y sustituyen a
+    la anterior con una sola asignación, así que una petición que ya tomó
+    una instantánea termina con ella. Se guardan las últimas
+    `history_size` instantáneas anteriores para poder volver a ellas.
+
+    Los cambios confirmados en este proceso se aplican al confirmar la
+    transacción; los de otros procesos (otros workers de gunicorn) se
+    detectan comparando cada `version_check_interval` segundos la versión
+    del banco de la base de datos con la del índice, y se recogen con una
+    reconstrucción completa en segundo plano.
+    """
+
+    def __init__(self):
+        self._index: Optional[QuestionIndex] = None
+        self._info: Optional[SnapshotInfo] = None
+        self._history = deque(maxlen=1)
+        self._stale = True
+        self._lock = threading.Lock()
+        self._app = None
+        self._builder: Optional[threading.Thread] = None
+        self.version = 0
+        self.bank_version: Optional[int] = None  # Versión del banco en la base de datos que refleja el índice
+        self.version_check_interval = 2.0
+        self._checked_at = 0.0
+        self.settings = MatchSettings()
+        self.index_path: Optional[str] = None
+        self.compact_ratio = 0.1
+        self.ann_lists = 0
+        self.ann_min_questions = 20000
+
+    def init_app(self, app):
+        """
+        Leer la configuración de la búsqueda desde la aplicación y registrar
+        los eventos que mantienen el índice al día
+        """
+        self.settings = MatchSettings.from_config(app.config)
+        self.index_path = app.config.get('QUESTION_INDEX_PATH')
+        self.compact_ratio = float(app.config.get('INDEX_COMPACT_RATIO', self.compact_ratio))
+        self.ann_lists = int(app.config.get('INDEX_ANN_LISTS', self.ann_lists))
+        self.ann_min_questions = int(app.config.get('INDEX_ANN_MIN_QUESTIONS', self.ann_min_questions))
+        self.version_check_interval = float(app.config.get('INDEX_VERSION_CHECK_INTERVAL', self.version_check_interval))
+        self._history = deque(self._history, maxlen=int(app.config.get('INDEX_SNAPSHOT_HISTORY', 1)))
+        self._app = app
+        _register_question_events()
+
+    def get(self) -> QuestionIndex:
+        """
+        Obtener la instantánea actual. Si está desactualizada se sigue usando
+        mientras se construye la nueva en segundo plano; solo la primera vez
+        se construye de forma bloqueante. Requiere un contexto de aplicación activo.
+        """
+        index = self._index
+        if index is None:
+            return self.rebuild()
+        self._check_bank_version()
+        if self._stale and self.rebuild_in_background() is None:
+            # Sin aplicación registrada no hay hilo: reconstruir aquí
+            return self.rebuild()
+        return index
+
+    def _check_bank_version(self):
+        """
+        Marcar el índice como desactualizado si la versión del banco de la
+        base de datos ya no es la suya (otro proceso cambió preguntas).
+        Se consulta como mucho una vez cada `version_check_interval` segundos.
+        """
+        if self.version_check_interval <= 0 or self._stale or not has_app_context():
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.version_check_interval:
+            return
+        self._checked_at = now
+
+        try:
+            current = read_bank_version()
+        except Exception as e:
+            logger.warning(f"No se pudo leer la versión del banco: {e}")
+            return
+        if current != self.bank_version:
+            logger.info(f"Banco de preguntas cambiado por otro proceso (versión {self.bank_version} -> {current}); "
+                        f"se reconstruirá el índice")
+            self.mark_stale()
+
+    def lookup_exact(self, user_input: TextInput) -> Optional[int]:
+        """
+        Buscar una coincidencia exacta (normalizada) en el índice actual
+        """
+        return self.get().lookup_exact(user_input)
+
+    def search(self, user_input: TextInput, threshold: float = 0.3) -> Tuple[Optional[int], float]:
+        """
+        Buscar en el índice actual con la configuración de la aplicación
+        """
+        return self.get().search(user_input, threshold=threshold, settings=self.settings)
+
+    def search_many(self, analyses: List[AnalyzedText], threshold: float = 0.3,
+                    top_k: int = 1) -> List[List[Tuple[int, float]]]:
+        """
+        Buscar un lote de entradas en el índice actual con la configuración de la aplicación
+        """
+        return self.get().search_many(analyses, threshold=threshold, top_k=top_k, settings=self.settings)
+
+    def rebuild(self) -> QuestionIndex:
+        """
+        Reconstruir el índice desde la base de datos
+        """
+        with self._lock:
+            return self._rebuild_locked()
+
+    def rebuild_in_background(self, force: bool = False) -> Optional[threading.Thread]:
+        """
+        Construir una instantánea nueva desde la base de datos en un hilo y
+        publicarla al terminar (con `force` aunque no esté desactualizada)
+        """
+        if self._app is None:
+            return None
+        if self._builder is not None and self._builder.is_alive():
+            return self._builder
+
+        with self._lock:
+            if self._builder is not None and self._builder.is_alive():
+                return self._builder
+            if force:
+                self.version += 1
+                self._stale = True
+            self._builder = threading.Thread(target=self._background_rebuild, name='question-index-builder', daemon=True)
+            self._builder.start()
+            return self._builder
+
+    def _background_rebuild(self):
+        try:
+            with self._app.app_context():
+                self.rebuild()
+        except Exception as e:
+            logger.error(f"Error reconstruyendo el índice en segundo plano: {e}")
+
+    def _rebuild_locked(self) -> QuestionIndex:
+        """
+        Reconstruir el índice si hace falta (con el candado adquirido). La
+        primera vez se intenta abrir el índice guardado en disco.
+        """
+        if not self._stale and self._index is not None:
+            return self._index
+
+        self._stale = False
+        version = self.version
+        start = time.time()
+        try:
+            # La versión se lee antes que las preguntas: si cambian entre
+            # medias, la próxima comprobación volverá a reconstruir
+            bank_version = self._read_bank_version()
+            index = self._load_from_disk(version) if self._index is None else None
+            source = 'disk' if index is not None else 'database'
+            if index is None:
+                index = QuestionIndex.from_database(version)
+            self.ensure_ann(index)
+        except Exception:
+            self._stale = True
+            raise
+        self._publish(index, source, time.time() - start)
+        self.bank_version = bank_version
+        return index
+
+    def _read_bank_version(self) -> Optional[int]:
+        """
+        Versión del banco en la base de datos (None si no se puede leer, por
+        ejemplo si aún no existe la tabla bank_version)
+        """
+        try:
+            return read_bank_version()
+        except Exception as e:
+            from backend.models import db
+            db.session.rollback()
+            logger.warning(f"No se pudo leer la versión del banco: {e}")
+            return None
+
+    def ensure_ann(self, index: QuestionIndex) -> QuestionIndex:
+        """
+        Entrenar el IVF del índice si la búsqueda por vector es aproximada y
+        el banco tiene al menos INDEX_ANN_MIN_QUESTIONS preguntas
+        """
+        if (self.settings.vector_search == 'ivf' and index.ann is None
+                and index.live_count >= self.ann_min_questions):
+            start = time.time()
+            index.build_ann(self.ann_lists)
+            logger.info(f"IVF de {len(index.ann)} listas entrenado en {time.time() - start:.2f}s")
+        return index
+
+    def _publish(self, index: QuestionIndex, source: str, build_seconds: float):
+        """
+        Publicar una instantánea (con el candado adquirido); la actual pasa al historial
+        """
+        info = SnapshotInfo(
+            version=index.version,
+            source=source,
+            built_at=time.time(),
+            build_seconds=round(build_seconds, 4),
+            questions=index.live_count,
+            memory_bytes=index.nbytes
+        )
+        if self._index is not None:
+            self._history.appendleft((self._index, self._info))
+        self._index, self._info = index, info
+
+    @property
+    def is_stale(self) -> bool:
+        return self._stale
+
+    def snapshots(self) -> List[Dict]:
+        """
+        Instantánea actual y anteriores (de la más reciente a la más antigua)
+        """
+        entries = [(self._info, True)] if self._info is not None else []
+        entries += [(info, False) for _, info in list(self._history)]
+        return [dict(asdict(info), current=current) for info, current in entries]
+
+    def rebuild_everywhere(self) -> Optional[threading.Thread]:
+        """
+        Reconstruir el índice en todos los procesos: se incrementa la versión
+        del banco en la base de datos (los demás workers lo notan en su
+        próxima comprobación) y se reconstruye este en segundo plano
+        """
+        from backend.models import db
+
+        with db.engine.begin() as connection:
+            bump_bank_version(connection)
+        return self.rebuild_in_background(force=True)
+
+    def rollback(self) -> Optional[SnapshotInfo]:
+        """
+        Volver a la instantánea anterior (la actual pasa al historial).
+        Devuelve la instantánea publicada o None si no hay ninguna anterior.
+
+        Solo afecta a este proceso (el historial es de cada worker) y dura
+        hasta el próximo cambio del banco, hecho aquí o en otro proceso.
+        """
+        with self._lock:
+            if not self._history:
+                return None
+            index, info = self._history.popleft()
+            self._history.appendleft((self._index, self._info))
+            self._index, self._info = index, info
+            self._stale = False
+            logger.warning(f"Índice de preguntas devuelto a la versión {info.version}")
+            return info
+
+    def mark_stale(self):
+        """
+        Marcar el índice como desactualizado para reconstruirlo por completo
+        """
+        self.version += 1
+        self._stale = True
+
+    def apply_changes(self, changes: List[QuestionChange], bank_version: Optional[int] = None):
+        """
+        Aplicar cambios en las preguntas al índice actual sin reconstruirlo,
+        compactándolo cuando acumula demasiadas filas borradas o añadidas.
+        `bank_version` es la versión del banco que dejó la transacción; si
+        no sigue a la del índice, otro proceso cambió preguntas entre medias
+        y el índice se reconstruye por completo, igual que si falla.
+        """
+        with self._lock:
+            self.version += 1
+            index = self._index
+            if index is None or self._stale:
+                # Se reconstruirá completo en el próximo uso
+                return
+            if bank_version is not None and self.bank_version is not None and bank_version != self.bank_version + 1:
+                logger.info(f"Versión del banco {bank_version} tras la {self.bank_version}: se reconstruirá el índice")
+                self._stale = True
+                return
+
+            start = time.time()
+            try:
+                index = index.apply(changes, self.version)
+                source = 'incremental'
+                if index.pending_changes > max(COMPACT_MIN_CHANGES, self.compact_ratio * len(index)):
+                    index = index.compact()
+                    source = 'compaction'
+            except Exception as e:
+                logger.error(f"Error aplicando cambios al índice: {e}; se reconstruirá")
+                self._stale = True
+                return
+
+            self._publish(index, source, time.time() - start)
+            if bank_version is not None:
+                self.bank_version = bank_version
+
+    def _load_from_disk(self, version: int) -> Optional[QuestionIndex]:
+        """
+        Abrir el índice de QUESTION_INDEX_PATH si corresponde al banco y al
+        modelo actuales (None si no existe o está desactualizado)
+        """
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+
+        try:
+            index, header = load_index(self.index_path, version)
+        except (IndexFormatError, OSError, KeyError, ValueError) as e:
+            logger.warning(f"No se pudo abrir el índice {self.index_path}: {e}; se reconstruirá")
+            return None
+
+        if header['model_name'] != model_manager.model_name or header['bank_signature'] != bank_signature():
+            logger.info(f"El índice {self.index_path} está desactualizado; se reconstruirá")
+            return None
+
+        logger.info(f"Índice de preguntas abierto desde {self.index_path} ({len(index)} preguntas)")
+        return index
+
+
+@dataclass
+class _AnalyzedRows:
+    """Filas del índice calculadas a partir de un grupo de preguntas"""
+    ids: List[int]
+    texts: List[str]
+    tokens: List[Set[str]]
+    vectors: np.ndarray
+    token_counts: np.ndarray
+    trigram_offsets: np.ndarray
+    trigram_values: np.ndarray
+    keyword_terms: List[List[str]]
+    synonym_terms: List[List[str]]
+
+
+def _analyze_questions(questions) -> _AnalyzedRows:
+    """
+    Analizar con spaCy el texto, las palabras clave y los sinónimos de un
+    grupo de preguntas (objetos Question o QuestionChange)
+    """
+    ids = [q.id for q in questions]
+    texts = [q.question_text.lower() for q in questions]
+
+    tokens = []
+    vectors = []
+    trigrams = []
+    for analysis in processor.analyze_many(texts):
+        tokens.append(analysis.token_set)
+        vectors.append(analysis.vector)
+        trigrams.append(analysis.trigrams)
+
+    trigram_offsets = np.zeros(len(trigrams) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in trigrams], out=trigram_offsets[1:])
+    trigram_values = np.concatenate(trigrams) if trigrams else np.zeros(0, dtype=np.int64)
+
+    if vectors:
+        matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+    else:
+        matrix = np.zeros((0, processor.nlp.vocab.vectors_length or 0), dtype=np.float32)
+
+    return _AnalyzedRows(
+        ids=ids,
+        texts=texts,
+        tokens=tokens,
+        vectors=_normalize_rows(matrix),
+        token_counts=np.fromiter((len(t) for t in tokens), dtype=np.int32, count=len(tokens)),
+        trigram_offsets=trigram_offsets,
+        trigram_values=trigram_values,
+        keyword_terms=_column_terms([q.keywords for q in questions]),
+        synonym_terms=_column_terms([q.synonyms for q in questions])
+    )
+
+
+def _column_terms(values: List[Optional[str]]) -> List[List[str]]:
+    """
+    Lematizar columnas de texto separadas por comas (keywords, synonyms)
+    """
+    texts = [(value or '').replace(',', ' ').lower() for value in values]
+    return [analysis.tokens for analysis in processor.analyze_many(texts)]
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Normalizar cada fila a norma 1 (las filas nulas se dejan en cero)
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# Instancia global del índice
+question_index = QuestionIndexManager()
+
+
+def _record_change(connection, target, deleted: bool = False):
+    """
+    Anotar el estado de una pregunta en la sesión que la guarda. El primer
+    cambio de cada transacción incrementa también la versión del banco, en
+    la misma transacción, para que los demás procesos lo detecten.
+    """
+    from sqlalchemy import inspect
+
+    session = inspect(target).session
+    if session is None:
+        return
+    if 'bank_version' not in session.info:
+        session.info['bank_version'] = bump_bank_version(connection)
+    session.info.setdefault('question_changes', []).append(QuestionChange(
+        question_id=target.id,
+        question_text=target.question_text or '',
+        keywords=target.keywords,
+        synonyms=target.synonyms,
+        is_active=bool(target.is_active),
+        deleted=deleted
+    ))
+
+
+def _on_question_insert(mapper, connection, target):
+    _record_change(connection, target)
+
+
+def _on_question_update(mapper, connection, target):
+    from sqlalchemy import inspect
+
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in TRACKED_COLUMNS):
+        _record_change(connection, target)
+
+
+def _on_question_delete(mapper, connection, target):
+    _record_change(connection, target, deleted=True)
+
+
+def _on_commit(session):
+    changes = session.info.pop('question_changes', None)
+    bank_version = session.info.pop('bank_version', None)
+    if changes:
+        question_index.apply_changes(changes, bank_version)
+
+
+def _on_rollback(session):
+    session.info.pop('question_changes', None)
+    session.info.pop('bank_version', None)
+
+
+def _register_question_events():
+    """
+    Registrar los eventos de SQLAlchemy que anotan los cambios en Question
+    durante el flush y los aplican al índice al confirmar la transacción
+    (al deshacerla se descartan)
+    """
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+    from backend.models import Question
+
+    if event.contains(Question, 'after_insert', _on_question_insert):
+        return
+    event.listen(Question, 'after_insert', _on_question_insert)
+    event.listen(Question, 'after_update', _on_question_update)
+    event.listen(Question, 'after_delete', _on_question_delete)
+    event.listen(Session, 'after_commit', _on_commit)
+    event.listen(Session, 'after_rollback', _on_rollback)
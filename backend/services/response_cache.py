@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Caché de respuestas del chatbot
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from backend.services.question_index import question_index
+from backend.utils.cache import LRUCache
+
+
+@dataclass(frozen=True)
+class CachedMatch:
+    """Resultado de búsqueda guardado en caché"""
+    question_id: int
+    confidence: float
+    intent: str
+    keywords: List[str] = field(default_factory=list)
+
+
+class ResponseCache:
+    """
+    Caché de coincidencias indexada por la entrada normalizada y la versión
+    del banco de preguntas.
+
+    Cualquier cambio en las preguntas incrementa la versión del banco, así que
+    las entradas antiguas dejan de coincidir sin vaciar la caché y acaban
+    descartándose por LRU o por tiempo de vida.
+    """
+
+    def __init__(self):
+        self._cache = LRUCache(max_entries=2048, ttl=600)
+
+    def init_app(self, app):
+        """
+        Leer la configuración de la caché desde la aplicación
+        """
+        self._cache = LRUCache(
+            max_entries=app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 2048),
+            ttl=app.config.get('RESPONSE_CACHE_TTL', 600)
+        )
+
+    def get(self, normalized: str, bank_version: int) -> Optional[CachedMatch]:
+        """
+        Buscar la coincidencia guardada para una entrada normalizada
+        """
+        return self._cache.get((normalized, bank_version))
+
+    def set(self, normalized: str, bank_version: int, match: CachedMatch):
+        """
+        Guardar la coincidencia de una entrada normalizada. La versión debe
+        leerse antes de buscar, para no asociar un resultado antiguo a una
+        versión nueva del banco.
+        """
+        if normalized:
+            self._cache.set((normalized, bank_version), match)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estadísticas de la caché, con la versión actual del banco
+        """
+        return {**self._cache.stats(), 'bank_version': question_index.version}
+
+
+class NegativeCache:
+    """
+    Caché de entradas normalizadas que no obtuvieron respuesta (por debajo del
+    umbral de confianza), para no repetir la búsqueda completa.
+
+    Igual que ResponseCache depende de la versión del banco, de modo que
+    agregar o editar una pregunta invalida todas las entradas. Guarda las
+    palabras clave de la entrada para registrar el mensaje sin spaCy.
+    """
+
+    def __init__(self):
+        self._cache = LRUCache(max_entries=4096, ttl=300)
+
+    def init_app(self, app):
+        """
+        Leer la configuración de la caché desde la aplicación
+        """
+        self._cache = LRUCache(
+            max_entries=app.config.get('NEGATIVE_CACHE_MAX_ENTRIES', 4096),
+            ttl=app.config.get('NEGATIVE_CACHE_TTL', 300)
+        )
+
+    def get(self, normalized: str, bank_version: int) -> Optional[List[str]]:
+        """
+        Palabras clave de una entrada sin respuesta (None si no está en caché)
+        """
+        return self._cache.get((normalized, bank_version))
+
+    def add(self, normalized: str, bank_version: int, keywords: List[str]):
+        """
+        Registrar una entrada sin respuesta
+        """
+        if normalized:
+            self._cache.set((normalized, bank_version), list(keywords))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estadísticas de la caché, con la versión actual del banco
+        """
+        return {**self._cache.stats(), 'bank_version': question_index.version}
+
+
+# Instancias globales de las cachés
+response_cache = ResponseCache()
+negative_cache = NegativeCache()
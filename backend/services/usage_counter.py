@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Contadores de uso acumulados en memoria y guardados por lotes
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from sqlalchemy import bindparam, func
+
+logger = logging.getLogger(__name__)
+
+
+class UsageCounter:
+    """
+    Acumula los incrementos de `usage_count` (de las preguntas) del
+    proceso y los guarda cada `flush_interval` segundos.
+
+    Cada guardado es una transacción con un
+    `UPDATE <tabla> SET usage_count = usage_count + :delta WHERE id = :id`
+    por fila, así que los incrementos de varios workers se suman en la base
+    de datos sin perderse. Los contadores leídos de la base de datos pueden
+    ir atrasados como mucho un intervalo. Si el guardado falla, los
+    incrementos vuelven a acumularse para el siguiente.
+    """
+
+    def __init__(self, flush_interval: float = 5.0):
+        self.enabled = False
+        self.flush_interval = flush_interval
+        self._app = None
+        self._pending: Counter = Counter()  # (tabla, id) -> incremento
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._atexit_registered = False
+
+        # Métricas
+        self._increments = 0
+        self._flushes = 0
+        self._rows_updated = 0
+        self._failures = 0
+        self._last_flush_ms = 0.0
+
+    def init_app(self, app):
+        """
+        Leer la configuración de los contadores desde la aplicación
+        """
+        self._app = app
+        self.enabled = bool(app.config.get('USAGE_COUNTER_ENABLED', False))
+        self.flush_interval = float(app.config.get('USAGE_COUNTER_FLUSH_INTERVAL', self.flush_interval))
+
+        if self.enabled and not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+
+    def add(self, model, row_id: int, delta: int = 1):
+        """
+        Sumar `delta` al contador de uso de la fila `row_id` del modelo
+        """
+        with self._lock:
+            self._pending[(model.__tablename__, row_id)] += delta
+            self._increments += 1
+        self._ensure_worker()
+
+    def pending(self, model, row_id: int) -> int:
+        """
+        Incremento todavía no guardado de una fila
+        """
+        return self._pending.get((model.__tablename__, row_id), 0)
+
+    def flush(self) -> int:
+        """
+        Guardar los incrementos acumulados; devuelve las filas actualizadas
+        """
+        from backend.models import db
+
+        deltas = self._take()
+        if not deltas:
+            return 0
+
+        started = time.monotonic()
+        with self._app.app_context():
+            try:
+                for table_name, rows in deltas.items():
+                    table = db.metadata.tables[table_name]
+                    db.session.execute(
+                        table.update()
+                        .where(table.c.id == bindparam('row_id'))
+                        .values(usage_count=func.coalesce(table.c.usage_count, 0) + bindparam('delta')),
+                        [{'row_id': row_id, 'delta': delta} for row_id, delta in rows.items()]
+                    )
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self._failures += 1
+                logger.error(f"Error guardando contadores de uso: {e}")
+                with self._lock:
+                    for table_name, rows in deltas.items():
+                        for row_id, delta in rows.items():
+                            self._pending[(table_name, row_id)] += delta
+                return 0
+
+        updated = sum(len(rows) for rows in deltas.values())
+        self._flushes += 1
+        self._rows_updated += updated
+        self._last_flush_ms = (time.monotonic() - started) * 1000.0
+        return updated
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores del guardado por lotes
+        """
+        return {
+            'enabled': self.enabled,
+            'flush_interval': self.flush_interval,
+            'pending_rows': len(self._pending),
+            'increments': self._increments,
+            'flushes': self._flushes,
+            'rows_updated': self._rows_updated,
+            'failures': self._failures,
+            'last_flush_ms': self._last_flush_ms,
+        }
+
+    def _take(self) -> Dict[str, Dict[int, int]]:
+        """
+        Retirar los incrementos acumulados agrupados por tabla
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+
+        grouped: Dict[str, Dict[int, int]] = {}
+        for (table_name, row_id), delta in pending.items():
+            if delta:
+                grouped.setdefault(table_name, {})[row_id] = delta
+        return grouped
+
+    def _ensure_worker(self):
+        """
+        Arrancar el hilo de guardado en el primer uso (después de un fork)
+        """
+        if self._app is None or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='usage-counter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error en el guardado de contadores de uso: {e}")
+
+
+# Instancia global de los contadores de uso
+usage_counter = UsageCounter()
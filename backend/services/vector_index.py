@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Búsqueda aproximada de vecinos más cercanos sobre los vectores de las preguntas
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from backend.services.postings import Postings
+
+# Filas por bloque al asignar vectores a listas (limita la matriz temporal)
+ASSIGN_CHUNK = 16384
+
+
+class IVFIndex:
+    """
+    Índice de archivo invertido (IVF) sobre vectores normalizados.
+
+    Los vectores se agrupan con k-means esférico en `len(centroids)` listas;
+    las filas de cada lista se guardan en un Postings cuyo término es el
+    número de lista. Una búsqueda solo compara la consulta con los vectores
+    de las `n_probe` listas de centroide más parecido: más listas exploradas
+    dan más exhaustividad (recall) a cambio de más tiempo.
+
+    Las filas nuevas se asignan a su centroide más cercano sin reentrenar
+    (van al `delta` del Postings), así que los centroides envejecen hasta la
+    siguiente reconstrucción completa del índice.
+    """
+
+    def __init__(self, centroids: np.ndarray, lists: Postings):
+        self.centroids = centroids
+        self.lists = lists
+
+    def __len__(self):
+        return len(self.centroids)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.centroids, self.lists.offsets, self.lists.rows, *self.lists.delta.values()]
+        return int(sum(array.nbytes for array in arrays))
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, n_lists: int = 0, iterations: int = 10,
+              sample_size: int = 0, seed: int = 0) -> 'IVFIndex':
+        """
+        Entrenar los centroides con una muestra de los vectores (normalizados
+        por filas) y asignar todos los vectores a su lista. Con `n_lists = 0`
+        se usan sqrt(n) listas y con `sample_size = 0`, 32 vectores por lista.
+        """
+        n_rows = len(vectors)
+        n_lists = max(1, min(n_lists or int(math.sqrt(n_rows)), n_rows))
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(sample_size or 32 * n_lists, n_rows)
+        sample = np.asarray(vectors[np.sort(rng.choice(n_rows, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+
+            # Las listas vacías se reinician con vectores de la muestra al azar
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.divide(sums, norms, out=np.zeros_like(sums), where=norms > 0)
+
+        index = cls(centroids, Postings({}, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32)))
+        assignment = index.assign(vectors)
+        index.lists = Postings.from_csr(np.arange(n_rows + 1, dtype=np.int64), assignment)
+        return index
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Lista (centroide más parecido) de cada vector
+        """
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), ASSIGN_CHUNK):
+            block = np.asarray(vectors[start:start + ASSIGN_CHUNK], dtype=np.float32)
+            assignment[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignment
+
+    def add(self, vectors: np.ndarray, first_row: int) -> 'IVFIndex':
+        """
+        Nuevo índice con filas añadidas a partir de `first_row` (comparte
+        los centroides y las listas con este)
+        """
+        assignment = self.assign(vectors).tolist()
+        return IVFIndex(self.centroids, self.lists.add_rows(([cluster] for cluster in assignment), first_row))
+
+    def compact(self, keep: np.ndarray) -> 'IVFIndex':
+        """
+        Nuevo índice sin las filas con `keep[fila] = False` (renumeradas como
+        en Postings.compact)
+        """
+        return IVFIndex(self.centroids, self.lists.compact(keep))
+
+    def search(self, query: np.ndarray, vectors: np.ndarray, k: int, n_probe: int = 8,
+               alive: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Las `k` filas más parecidas a la consulta (normalizada) entre las de
+        las `n_probe` listas más cercanas, con su similitud coseno
+        """
+        n_probe = max(1, min(n_probe, len(self.centroids)))
+        closest = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        lists = [self.lists.get(int(cluster)) for cluster in closest]
+        rows = np.concatenate(lists) if lists else self.lists.rows[:0]
+        if alive is not None:
+            rows = rows[alive[rows]]
+
+        scores = vectors[rows] @ query
+        if len(rows) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return rows[order], scores[order]
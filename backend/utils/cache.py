@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Caché LRU acotada con expiración por tiempo
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Caché en memoria, segura entre hilos, con un máximo de entradas (se
+    descarta la usada hace más tiempo) y un tiempo de vida por entrada.
+
+    Con `sliding=True` cada lectura renueva el tiempo de vida de la entrada
+    (expiración por inactividad). Con `max_entries = 0` la caché no guarda nada.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None, sliding: bool = False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sliding = sliding
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Obtener un valor (y marcarlo como usado recientemente)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            if self.sliding and self.ttl is not None:
+                self._data[key] = (value, now + self.ttl)
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """
+        Guardar un valor, descartando el menos usado si la caché está llena
+        """
+        if self.max_entries <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Eliminar una entrada y devolver su valor
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else default
+
+    def clear(self):
+        """
+        Vaciar la caché (las estadísticas se conservan)
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Estadísticas de uso de la caché
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
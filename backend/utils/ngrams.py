@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Similitud por trigramas de caracteres
+"""
+
+import numpy as np
+
+from backend.utils.normalization import normalize_text
+
+
+def char_trigrams(text: str) -> np.ndarray:
+    """
+    Trigramas de caracteres del texto normalizado, codificados como enteros
+    (ordenados y sin repetir). Cada palabra se rodea de espacios para que los
+    bordes también cuenten.
+
+    La codificación usa los tres puntos de código (21 bits cada uno), así que
+    es estable entre procesos y no tiene colisiones.
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return np.zeros(0, dtype=np.int64)
+
+    padded = f'  {normalized} '
+    codes = np.fromiter((ord(char) for char in padded), dtype=np.int64, count=len(padded))
+    trigrams = (codes[:-2] << 42) | (codes[1:-1] << 21) | codes[2:]
+    return np.unique(trigrams)
+
+
+def trigram_similarity(trigrams1: np.ndarray, trigrams2: np.ndarray) -> float:
+    """
+    Coeficiente de Dice entre dos conjuntos de trigramas
+    """
+    total = len(trigrams1) + len(trigrams2)
+    if not total:
+        return 0.0
+    shared = len(np.intersect1d(trigrams1, trigrams2, assume_unique=True))
+    return 2.0 * shared / total
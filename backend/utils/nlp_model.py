@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Carga diferida del modelo de spaCy
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "es_core_news_sm"
+
+# Textos que se pasan por el pipeline tras cargarlo, para que la primera
+# petición real no pague la inicialización perezosa de spaCy
+DEFAULT_WARMUP_TEXTS = [
+    "¿Qué es la inteligencia artificial?",
+    "¿Cómo funciona machine learning?",
+    "Explica la programación orientada a objetos",
+    "¿Cuál es la fórmula del área de un círculo?",
+]
+
+LOAD_MODES = ('lazy', 'background', 'eager')
+
+
+class ModelNotAvailableError(RuntimeError):
+    """El modelo de spaCy no está instalado"""
+
+
+class ModelManager:
+    """
+    Gestiona la carga del modelo de spaCy.
+
+    Importar el módulo no carga nada: el modelo se carga en el primer uso
+    (`lazy`), en un hilo al crear la aplicación (`background`) o de forma
+    bloqueante al crearla (`eager`). Nunca se descarga el modelo
+    automáticamente; si falta, se lanza ModelNotAvailableError.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        self.model_name = model_name
+        self.warmup_texts: List[str] = list(DEFAULT_WARMUP_TEXTS)
+        self._nlp = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[str] = None
+        self.load_time: Optional[float] = None
+        self.warmup_time: Optional[float] = None
+
+    def init_app(self, app):
+        """
+        Configurar el modelo desde la aplicación y cargarlo según NLP_LOAD_MODE
+        """
+        self.model_name = app.config.get('SPACY_MODEL', self.model_name)
+        if app.config.get('NLP_WARMUP_TEXTS'):
+            self.warmup_texts = list(app.config['NLP_WARMUP_TEXTS'])
+
+        mode = app.config.get('NLP_LOAD_MODE', 'lazy')
+        if mode not in LOAD_MODES:
+            raise ValueError(f"NLP_LOAD_MODE debe ser uno de {LOAD_MODES}")
+
+        if mode == 'background':
+            self.load_in_background()
+        elif mode == 'eager':
+            self.load()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._nlp is not None
+
+    def get(self):
+        """
+        Obtener el pipeline, cargándolo si todavía no está disponible (si hay
+        una carga en segundo plano en curso, se espera a que termine)
+        """
+        if self._nlp is None:
+            self.load()
+        return self._nlp
+
+    def load(self):
+        """
+        Cargar el modelo y ejecutar el calentamiento
+        """
+        with self._lock:
+            if self._nlp is not None:
+                return self._nlp
+
+            start = time.time()
+            import spacy
+
+            try:
+                nlp = spacy.load(self.model_name)
+            except OSError as e:
+                self._error = f"Modelo de spaCy '{self.model_name}' no instalado"
+                raise ModelNotAvailableError(
+                    f"{self._error}. Instálalo con: python scripts/install_spacy.py"
+                ) from e
+            self.load_time = time.time() - start
+
+            self._warmup(nlp)
+            self._nlp = nlp
+            self._error = None
+            logger.info(f"Modelo {self.model_name} cargado en {self.load_time:.2f}s (calentamiento {self.warmup_time:.2f}s)")
+            return nlp
+
+    def load_in_background(self) -> threading.Thread:
+        """
+        Iniciar la carga en un hilo sin bloquear al llamador
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._load_quietly, name='spacy-loader', daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Esperar a que termine la carga en segundo plano
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.is_ready
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Estado de la carga del modelo
+        """
+        return {
+            'model': self.model_name,
+            'ready': self.is_ready,
+            'loading': self._thread is not None and self._thread.is_alive(),
+            'error': self._error,
+            'load_time': self.load_time,
+            'warmup_time': self.warmup_time
+        }
+
+    def _warmup(self, nlp):
+        start = time.time()
+        for _ in nlp.pipe(self.warmup_texts):
+            pass
+        self.warmup_time = time.time() - start
+
+    def _load_quietly(self):
+        try:
+            self.load()
+        except Exception as e:
+            self._error = self._error or str(e)
+            logger.error(f"Error cargando el modelo de spaCy: {e}")
+
+
+# Instancia global del gestor del modelo
+model_manager = ModelManager()
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Normalización de texto para comparaciones exactas y por caracteres
+"""
+
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Forma canónica de un texto: minúsculas, sin tildes ni signos de
+    puntuación (incluidos ¿? y ¡!) y con los espacios colapsados.
+
+    >>> normalize_text('  ¿Qué es   la Programación? ')
+    'que es la programacion'
+    """
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    folded = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(' ', folded).strip()
@@ -1,25 +1,123 @@
-import spacy
 import re
 import string
 from collections import Counter
 import difflib
-from typing import List, Dict, Tuple, Set, Any
+from functools import cached_property
+from typing import List, Dict, Tuple, Set, Any, Iterable, Union
 import json
-import os
+from backend.utils.ngrams import char_trigrams
+from backend.utils.normalization import normalize_text
+from backend.utils.nlp_model import model_manager
+
+class AnalyzedText:
+    """
+    Resultado del análisis de un texto.
+
+    Ejecuta el pipeline reducido de spaCy (perfil 'matching') una sola vez
+    sobre el texto en minúsculas y calcula tokens, palabras clave, tipo de
+    pregunta, intención y vector bajo demanda, guardando cada resultado. Las
+    entidades y la estructura de la oración usan el texto original con el
+    pipeline completo (perfil 'analysis') y solo se procesan si se piden.
+    """
+
+    def __init__(self, text: str, processor: 'AdvancedTextProcessor', doc=None):
+        self.text = text
+        self.lower = text.lower()
+        self._processor = processor
+        if doc is not None:
+            self.doc = doc
+
+    @cached_property
+    def doc(self):
+        return self._processor.parse(self.lower, 'matching')
+
+    @property
+    def is_parsed(self) -> bool:
+        """Indica si el texto ya se procesó con el pipeline de matching"""
+        return 'doc' in self.__dict__
+
+    @cached_property
+    def cased_doc(self):
+        return self._processor.parse(self.text, 'analysis')
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        if not self.text.strip():
+            return []
+        return self._processor.preprocess_doc(self.doc)
+
+    @cached_property
+    def token_set(self) -> Set[str]:
+        return set(self.tokens)
+
+    @cached_property
+    def lemmas(self) -> List[str]:
+        return [token.lemma_ for token in self.doc]
+
+    @cached_property
+    def keywords(self) -> List[str]:
+        return self._processor._keywords_from_doc(self.doc)
+
+    @cached_property
+    def entities(self) -> List[Dict[str, Any]]:
+        return self._processor._entities_from_doc(self.cased_doc)
+
+    @cached_property
+    def question_type(self) -> str:
+        return self._processor._question_type_from_doc(self.doc)
+
+    @cached_property
+    def _detected_intent(self) -> Tuple[str, float]:
+        return self._processor._intent_type_from_text(self.lower)
+
+    @property
+    def intent_type(self) -> str:
+        return self._detected_intent[0]
+
+    @property
+    def intent_confidence(self) -> float:
+        return self._detected_intent[1]
+
+    @cached_property
+    def intent(self) -> Dict[str, Any]:
+        return {
+            'type': self.intent_type,
+            'confidence': self.intent_confidence,
+            'keywords': self.keywords,
+            'question_type': self.question_type,
+            'entities': self.entities
+        }
+
+    @cached_property
+    def vector(self):
+        return self.doc.vector
+
+    @cached_property
+    def trigrams(self):
+        return char_trigrams(self.text)
+
+    @cached_property
+    def normalized(self) -> str:
+        return normalize_text(self.text)
+
+    @cached_property
+    def sentence_structure(self) -> Dict[str, Any]:
+        return self._processor._structure_from_doc(self.cased_doc)
+
+
+TextInput = Union[str, AnalyzedText]
 
-# Cargar modelo de spaCy para español
-try:
-    nlp = spacy.load("es_core_news_sm")
-except OSError:
-    # Si el modelo no está instalado, descargarlo
-    print("Descargando modelo de spaCy para español...")
-    os.system("python -m spacy download es_core_news_sm")
-    nlp = spacy.load("es_core_news_sm")
 
 class AdvancedTextProcessor:
     def __init__(self):
-        self.nlp = nlp
-        
+        # Componentes de spaCy que se desactivan en cada uso del pipeline
+        self.pipeline_profiles = {
+            # Chat: solo tokens, lemas, POS y stop words (tok2vec aporta el vector)
+            'matching': ('parser', 'ner'),
+            # /api/analyze: entidades y estructura de la oración
+            'analysis': (),
+        }
+
         # Stop words específicas del dominio académico
         self.domain_stop_words = {
             'hola', 'gracias', 'por favor', 'ok', 'vale', 'si', 'no',
@@ -73,16 +171,70 @@ class AdvancedTextProcessor:
             r'^(ayuda|ayúdame)\s+con\s+(.+)'
         ]
 
-    def preprocess(self, text: str) -> List[str]:
+    @property
+    def nlp(self):
+        """
+        Pipeline de spaCy (se carga en el primer uso si no está listo)
+        """
+        return model_manager.get()
+
+    def parse(self, text: str, profile: str = 'analysis'):
+        """
+        Procesar un texto con los componentes del perfil indicado
+        """
+        return self.nlp(text, disable=self._disabled_components(profile))
+
+    def parse_many(self, texts: Iterable[str], profile: str = 'analysis', batch_size: int = 256):
+        """
+        Procesar varios textos en lote con los componentes del perfil indicado
+        """
+        return self.nlp.pipe(texts, batch_size=batch_size, disable=self._disabled_components(profile))
+
+    def _disabled_components(self, profile: str) -> List[str]:
+        """
+        Componentes a desactivar que existen en el pipeline cargado
+        """
+        pipe_names = self.nlp.pipe_names
+        return [name for name in self.pipeline_profiles[profile] if name in pipe_names]
+
+    def analyze(self, text: TextInput) -> AnalyzedText:
+        """
+        Analizar un texto (si ya está analizado, se devuelve tal cual)
+        """
+        if isinstance(text, AnalyzedText):
+            return text
+        return AnalyzedText(text, self)
+
+    def analyze_many(self, texts: Iterable[str], batch_size: int = 256) -> List[AnalyzedText]:
+        """
+        Analizar varios textos procesándolos en lote con nlp.pipe
+        """
+        analyses = [AnalyzedText(text, self) for text in texts]
+        self.parse_pending(analyses, batch_size=batch_size)
+        return analyses
+
+    def parse_pending(self, analyses: List[AnalyzedText], batch_size: int = 256):
+        """
+        Procesar en lote con nlp.pipe los análisis que aún no tienen doc
+        """
+        pending = [analysis for analysis in analyses if not analysis.is_parsed]
+        docs = self.parse_many((analysis.lower for analysis in pending), 'matching', batch_size=batch_size)
+        for analysis, doc in zip(pending, docs):
+            analysis.doc = doc
+
+    def preprocess(self, text: TextInput) -> List[str]:
         """
         Procesamiento completo del texto usando spaCy
         """
-        if not text or not text.strip():
+        if not isinstance(text, AnalyzedText) and (not text or not text.strip()):
             return []
         
-        # Procesar con spaCy
-        doc = self.nlp(text.lower())
-        
+        return self.analyze(text).tokens
+
+    def preprocess_doc(self, doc) -> List[str]:
+        """
+        Extraer tokens relevantes de un documento de spaCy ya procesado
+        """
         # Extraer tokens relevantes
         tokens = []
         for token in doc:
@@ -141,12 +293,16 @@ class AdvancedTextProcessor:
         
         return expanded
 
-    def extract_keywords(self, text: str) -> List[str]:
+    def extract_keywords(self, text: TextInput) -> List[str]:
         """
         Extracción de palabras clave usando spaCy
         """
-        doc = self.nlp(text.lower())
-        
+        return self.analyze(text).keywords
+
+    def _keywords_from_doc(self, doc) -> List[str]:
+        """
+        Extraer palabras clave de un documento ya procesado
+        """
         # Extraer sustantivos y verbos como palabras clave
         keywords = []
         for token in doc:
@@ -159,11 +315,16 @@ class AdvancedTextProcessor:
         
         return keywords[:10]  # Limitar a 10 palabras clave
 
-    def extract_entities(self, text: str) -> List[Dict[str, Any]]:
+    def extract_entities(self, text: TextInput) -> List[Dict[str, Any]]:
         """
         Extraer entidades nombradas usando spaCy
         """
-        doc = self.nlp(text)
+        return self.analyze(text).entities
+
+    def _entities_from_doc(self, doc) -> List[Dict[str, Any]]:
+        """
+        Extraer entidades de un documento ya procesado
+        """
         entities = []
         
         for ent in doc.ents:
@@ -176,12 +337,16 @@ class AdvancedTextProcessor:
         
         return entities
 
-    def extract_question_type(self, text: str) -> str:
+    def extract_question_type(self, text: TextInput) -> str:
         """
         Extraer el tipo de pregunta usando spaCy
         """
-        doc = self.nlp(text.lower())
-        
+        return self.analyze(text).question_type
+
+    def _question_type_from_doc(self, doc) -> str:
+        """
+        Extraer el tipo de pregunta de un documento ya procesado
+        """
         # Buscar palabras interrogativas
         question_words = {
             'qué': 'what', 'que': 'what', 'q': 'what',
@@ -198,20 +363,20 @@ class AdvancedTextProcessor:
         
         return 'general'
 
-    def calculate_similarity(self, text1: str, text2: str) -> float:
+    def calculate_similarity(self, text1: TextInput, text2: TextInput) -> float:
         """
         Calcular similitud entre dos textos usando spaCy
         """
-        # Procesar ambos textos
-        doc1 = self.nlp(text1.lower())
-        doc2 = self.nlp(text2.lower())
+        # Procesar ambos textos (una sola vez cada uno)
+        analysis1 = self.analyze(text1)
+        analysis2 = self.analyze(text2)
         
         # Similitud semántica usando spaCy
-        semantic_similarity = doc1.similarity(doc2)
+        semantic_similarity = analysis1.doc.similarity(analysis2.doc)
         
         # Similitud basada en tokens
-        tokens1 = set(self.preprocess(text1))
-        tokens2 = set(self.preprocess(text2))
+        tokens1 = analysis1.token_set
+        tokens2 = analysis2.token_set
         
         if not tokens1 or not tokens2:
             return semantic_similarity
@@ -222,68 +387,68 @@ class AdvancedTextProcessor:
         jaccard = intersection / union if union > 0 else 0
         
         # Sequence matcher para similitud de caracteres
-        sequence_similarity = difflib.SequenceMatcher(None, text1.lower(), text2.lower()).ratio()
+        sequence_similarity = difflib.SequenceMatcher(None, analysis1.lower, analysis2.lower).ratio()
         
         # Promedio ponderado (dar más peso a la similitud semántica)
         final_similarity = (semantic_similarity * 0.5 + jaccard * 0.3 + sequence_similarity * 0.2)
         
         return min(final_similarity, 1.0)
 
-    def find_best_match(self, user_input: str, questions: List[str], threshold: float = 0.3) -> Tuple[str, float]:
+    def find_best_match(self, user_input: TextInput, questions: List[str], threshold: float = 0.3) -> Tuple[str, float]:
         """
         Encontrar la mejor coincidencia usando spaCy
         """
         best_match = ""
         best_score = 0.0
         
+        analysis = self.analyze(user_input)
         for question in questions:
-            score = self.calculate_similarity(user_input, question)
+            score = self.calculate_similarity(analysis, question)
             if score > best_score and score >= threshold:
                 best_score = score
                 best_match = question
         
         return best_match, best_score
 
-    def extract_intent(self, text: str) -> Dict[str, Any]:
+    def extract_intent(self, text: TextInput) -> Dict[str, Any]:
         """
         Extraer intención del usuario usando spaCy
         """
-        doc = self.nlp(text.lower())
-        
-        intent = {
-            'type': 'question',
-            'confidence': 0.8,
-            'keywords': self.extract_keywords(text),
-            'question_type': self.extract_question_type(text),
-            'entities': self.extract_entities(text)
-        }
+        return self.analyze(text).intent
+
+    def _intent_type_from_text(self, text: str) -> Tuple[str, float]:
+        """
+        Detectar el tipo de intención (no requiere procesar con spaCy)
+        """
+        intent_type, confidence = 'question', 0.8
         
         # Detectar saludos
         greetings = ['hola', 'buenos días', 'buenas tardes', 'buenas noches', 'saludos']
-        if any(greeting in text.lower() for greeting in greetings):
-            intent['type'] = 'greeting'
-            intent['confidence'] = 0.9
+        if any(greeting in text for greeting in greetings):
+            intent_type, confidence = 'greeting', 0.9
         
         # Detectar despedidas
         farewells = ['adiós', 'hasta luego', 'nos vemos', 'chao', 'bye']
-        if any(farewell in text.lower() for farewell in farewells):
-            intent['type'] = 'farewell'
-            intent['confidence'] = 0.9
+        if any(farewell in text for farewell in farewells):
+            intent_type, confidence = 'farewell', 0.9
         
         # Detectar agradecimientos
         thanks = ['gracias', 'grasias', 'thank you', 'thanks']
-        if any(thank in text.lower() for thank in thanks):
-            intent['type'] = 'thanks'
-            intent['confidence'] = 0.9
+        if any(thank in text for thank in thanks):
+            intent_type, confidence = 'thanks', 0.9
         
-        return intent
+        return intent_type, confidence
 
-    def get_sentence_structure(self, text: str) -> Dict[str, Any]:
+    def get_sentence_structure(self, text: TextInput) -> Dict[str, Any]:
         """
         Analizar la estructura de la oración usando spaCy
         """
-        doc = self.nlp(text)
-        
+        return self.analyze(text).sentence_structure
+
+    def _structure_from_doc(self, doc) -> Dict[str, Any]:
+        """
+        Analizar la estructura de un documento ya procesado
+        """
         structure = {
             'subject': [],
             'verb': [],
@@ -316,35 +481,37 @@ class AdvancedTextProcessor:
 # Instancia global del procesador
 processor = AdvancedTextProcessor()
 
-def preprocess(text: str) -> List[str]:
+def preprocess(text: TextInput) -> List[str]:
     """
     Función de compatibilidad con el código existente
     """
     return processor.preprocess(text)
 
-def get_best_response(user_input: str, responses_data: Dict) -> Tuple[str, float]:
+def get_best_response(user_input: TextInput, responses_data: Dict) -> Tuple[str, float]:
     """
     Obtener la mejor respuesta basada en el procesamiento con spaCy
     """
+    analysis = processor.analyze(user_input)
+    
     # Extraer intención
-    intent = processor.extract_intent(user_input)
+    intent_type = analysis.intent_type
     
     # Manejar intenciones especiales
-    if intent['type'] == 'greeting':
+    if intent_type == 'greeting':
         greetings = responses_data.get('saludos', ['Hola, ¿en qué puedo ayudarte?'])
         return greetings[0], 1.0
     
-    elif intent['type'] == 'farewell':
+    elif intent_type == 'farewell':
         farewells = responses_data.get('despedidas', ['Hasta luego, ¡que tengas un buen día!'])
         return farewells[0], 1.0
     
-    elif intent['type'] == 'thanks':
+    elif intent_type == 'thanks':
         return '¡De nada! Estoy aquí para ayudarte.', 1.0
     
     # Buscar en preguntas frecuentes
     questions = responses_data.get('preguntas_frecuentes', {})
     if questions:
-        best_match, score = processor.find_best_match(user_input, list(questions.keys()))
+        best_match, score = processor.find_best_match(analysis, list(questions.keys()))
         if best_match and best_match in questions:
             return questions[best_match], score
     
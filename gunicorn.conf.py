@@ -0,0 +1,52 @@
+"""
+Configuración de ejemplo de gunicorn con preload.
+
+El proceso maestro importa la aplicación, carga el modelo de spaCy y
+construye el índice de preguntas antes de crear los workers, que los
+comparten por copy-on-write en lugar de cargar cada uno su copia.
+
+    gunicorn -c gunicorn.conf.py
+    python scripts/memory_report.py --pid <pid del maestro>
+"""
+
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'backend.app:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5002')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+preload_app = True
+
+# El modelo se carga en when_ready; sin hilo de carga en segundo plano en el maestro
+os.environ.setdefault('NLP_LOAD_MODE', 'lazy')
+
+# Sin recolecciones en el maestro mientras se carga: los objetos se congelan
+# antes del fork y cada worker reactiva el recolector
+gc.disable()
+
+
+def when_ready(server):
+    from backend.app import app
+    from backend.services.preload import prepare_for_fork
+
+    # Los workers heredan la configuración del maestro
+    app.config['SERVER_WORKERS'] = server.cfg.workers
+    prepare_for_fork(app)
+
+
+def post_fork(server, worker):
+    from backend.services.preload import after_fork
+
+    after_fork()
+
+
+def worker_exit(server, worker):
+    from backend.services.message_writer import message_writer
+    from backend.services.usage_counter import usage_counter
+
+    # Guardar los mensajes y contadores pendientes antes de salir
+    message_writer.flush()
+    usage_counter.flush()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Script para medir la exhaustividad (recall@k) y la latencia de la búsqueda
+aproximada por IVF frente a la búsqueda exacta por similitud coseno
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.vector_index import IVFIndex
+
+
+def synthetic_vectors(n_rows, dim, seed):
+    """Vectores agrupados alrededor de centros al azar (normalizados)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n_rows // 200), dim)).astype(np.float32)
+    vectors = np.empty((n_rows, dim), dtype=np.float32)
+    for start in range(0, n_rows, 100000):
+        end = min(start + 100000, n_rows)
+        vectors[start:end] = centers[rng.integers(0, len(centers), end - start)]
+        vectors[start:end] += 0.5 * rng.normal(size=(end - start, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def bank_vectors(path):
+    """Vectores del índice guardado en disco o, si no se indica, del banco actual"""
+    if path:
+        from backend.services.index_store import load_index
+        index, _ = load_index(path)
+        return np.asarray(index.vectors)
+
+    from backend.app import create_app
+    from backend.services.question_index import question_index
+
+    app = create_app()
+    with app.app_context():
+        return np.asarray(question_index.get().vectors)
+
+
+def make_queries(vectors, n_queries, noise, seed):
+    """Vectores del banco con ruido, normalizados"""
+    rng = np.random.default_rng(seed + 1)
+    queries = vectors[rng.choice(len(vectors), n_queries, replace=False)].astype(np.float32)
+    queries += noise * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+
+
+def exact_search(vectors, query, k):
+    scores = vectors @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Usar N vectores sintéticos en lugar del banco de preguntas')
+    parser.add_argument('--dim', type=int, default=96, help='Dimensión de los vectores sintéticos')
+    parser.add_argument('--index', help='Archivo del índice de preguntas (por defecto el banco de la base de datos)')
+    parser.add_argument('--queries', type=int, default=200, help='Consultas a evaluar')
+    parser.add_argument('--noise', type=float, default=0.5, help='Ruido añadido a las consultas')
+    parser.add_argument('--k', type=int, default=10, help='Vecinos por consulta')
+    parser.add_argument('--lists', type=int, default=0, help='Listas del IVF (0 = raíz cuadrada del banco)')
+    parser.add_argument('--probes', default='1,2,4,8,16,32', help='Listas exploradas a evaluar, separadas por comas')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic, args.dim, args.seed)
+    else:
+        vectors = bank_vectors(args.index)
+    print(f"📦 {len(vectors)} vectores de dimensión {vectors.shape[1]} ({time.time() - start:.1f}s)")
+
+    start = time.time()
+    ann = IVFIndex.train(vectors, args.lists, seed=args.seed)
+    print(f"🧭 IVF de {len(ann)} listas entrenado en {time.time() - start:.1f}s")
+
+    queries = make_queries(vectors, min(args.queries, len(vectors)), args.noise, args.seed)
+    k = min(args.k, len(vectors))
+
+    start = time.time()
+    truth = [set(exact_search(vectors, query, k).tolist()) for query in queries]
+    exact_ms = (time.time() - start) / len(queries) * 1000
+
+    print(f"\n{'listas':>8}{'recall@' + str(k):>12}{'ms/consulta':>14}{'filas':>10}")
+    print(f"{'exacta':>8}{1.0:>12.3f}{exact_ms:>14.3f}{len(vectors):>10}")
+    for n_probe in (int(value) for value in args.probes.split(',')):
+        hits = 0
+        scanned = 0
+        start = time.time()
+        for query, expected in zip(queries, truth):
+            rows, _ = ann.search(query, vectors, k, n_probe)
+            hits += len(expected.intersection(rows.tolist()))
+        elapsed_ms = (time.time() - start) / len(queries) * 1000
+        for query in queries[:20]:
+            closest = np.argpartition(-(ann.centroids @ query), min(n_probe, len(ann)) - 1)[:n_probe]
+            scanned += sum(len(ann.lists.get(int(cluster))) for cluster in closest)
+        print(f"{n_probe:>8}{hits / (k * len(queries)):>12.3f}{elapsed_ms:>14.3f}{scanned // min(20, len(queries)):>10}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Script para comparar la búsqueda en cascada con la búsqueda exhaustiva
+sobre un conjunto de consultas de referencia
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app import create_app
+from backend.models import Question
+from backend.services.question_index import question_index, EXHAUSTIVE_SETTINGS
+from backend.utils.normalization import normalize_text
+from backend.utils.preprocessing import processor
+
+# Consultas reformuladas y con errores de escritura sobre el banco de
+# backend/responses.json, con las preguntas que las responden
+GOLDEN_QUERIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_queries.jsonl')
+
+
+def load_queries(path):
+    """
+    Cargar consultas de un archivo JSON Lines ({"query": ..., "expected":
+    [preguntas que la responden]}, lista vacía si no debe responderse) o de
+    texto plano (una consulta por línea, sin respuesta esperada)
+    """
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                queries.append((entry['query'], entry.get('expected')))
+            else:
+                queries.append((line, None))
+    return queries
+
+
+def bank_queries(index):
+    """Las preguntas del banco y una variante sin signos ni mayúsculas"""
+    queries = []
+    for text in index.texts:
+        queries.append((text, None))
+        queries.append((text.strip('¿?¡! ').replace('¿', '').replace('?', ''), None))
+    return queries
+
+
+def expected_ids(queries):
+    """
+    Ids de las preguntas esperadas de cada consulta (None si no tiene)
+    """
+    ids_by_text = {normalize_text(q.question_text): q.id for q in Question.query.filter_by(is_active=True)}
+    resolved = []
+    for query, expected in queries:
+        if expected is None:
+            resolved.append(None)
+            continue
+        unknown = [text for text in expected if normalize_text(text) not in ids_by_text]
+        if unknown:
+            print(f"   ⚠️  '{query}': preguntas esperadas que no están en el banco: {unknown}")
+        resolved.append({ids_by_text[normalize_text(text)] for text in expected if normalize_text(text) in ids_by_text})
+    return resolved
+
+
+def accuracy(results, expected):
+    """Fracción de consultas etiquetadas cuya respuesta es una de las esperadas"""
+    labeled = [(result[0], ids) for result, ids in zip(results, expected) if ids is not None]
+    if not labeled:
+        return None
+    hits = sum(1 for question_id, ids in labeled if (question_id in ids if ids else question_id is None))
+    return hits / len(labeled)
+
+
+def timed_search(index, analyses, settings):
+    """Buscar todas las consultas y medir el tiempo medio por consulta"""
+    start = time.time()
+    results = [index.search(analysis, settings=settings) for analysis in analyses]
+    elapsed = (time.time() - start) / max(len(analyses), 1)
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--queries', default=GOLDEN_QUERIES,
+                        help='Archivo de consultas (JSON Lines con respuestas esperadas o una consulta por línea)')
+    parser.add_argument('--bank-questions', action='store_true',
+                        help='Usar las preguntas del banco como consultas (solo mide la coincidencia)')
+    parser.add_argument('--min-agreement', type=float, default=0.99,
+                        help='Consultas sin respuesta esperada: fracción mínima de respuestas iguales '
+                             'a las de la búsqueda exhaustiva')
+    parser.add_argument('--min-golden-agreement', type=float, default=0.75,
+                        help='Consultas con respuesta esperada: fracción mínima de respuestas iguales '
+                             'a las de la búsqueda exhaustiva (más laxa: la cascada puede acertar donde '
+                             'la exhaustiva falla)')
+    parser.add_argument('--min-accuracy', type=float, default=0.9,
+                        help='Consultas con respuesta esperada: fracción mínima de aciertos de la cascada')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.0,
+                        help='Pérdida máxima de aciertos de la cascada respecto a la búsqueda exhaustiva')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        index = question_index.get()
+        queries = bank_queries(index) if args.bank_questions else load_queries(args.queries)
+        expected = expected_ids(queries)
+        print(f"🔍 Evaluando {len(queries)} consultas contra {len(index)} preguntas...")
+
+        # El análisis de las consultas es común a ambos modos: se calculan los
+        # tokens antes de medir para comparar solo la búsqueda
+        analyses = processor.analyze_many([query for query, _ in queries])
+        for analysis in analyses:
+            analysis.token_set
+
+        exhaustive, exhaustive_time = timed_search(index, analyses, EXHAUSTIVE_SETTINGS)
+        cascade, cascade_time = timed_search(index, analyses, question_index.settings)
+
+        exhaustive_accuracy = accuracy(exhaustive, expected)
+        cascade_accuracy = accuracy(cascade, expected)
+        agreement = sum(1 for a, b in zip(exhaustive, cascade) if a[0] == b[0]) / max(len(queries), 1)
+
+        if cascade_accuracy is None:
+            # Sin respuestas esperadas la referencia es la búsqueda exhaustiva
+            for (query, _), reference, got in zip(queries, exhaustive, cascade):
+                if reference[0] != got[0]:
+                    print(f"   ❌ '{query}': exhaustiva={reference[0]} ({reference[1]:.3f}) "
+                          f"cascada={got[0]} ({got[1]:.3f})")
+        else:
+            for (query, _), ids, got in zip(queries, expected, cascade):
+                if ids is not None and not (got[0] in ids if ids else got[0] is None):
+                    print(f"   ❌ '{query}': cascada={got[0]} ({got[1]:.3f}) esperadas={sorted(ids) or 'ninguna'}")
+
+        min_agreement = args.min_agreement if cascade_accuracy is None else args.min_golden_agreement
+        print(f"\n📊 Coincidencia con la exhaustiva: {agreement:.2%} (mínimo {min_agreement:.2%})")
+        if cascade_accuracy is not None:
+            print(f"   • Aciertos exhaustiva: {exhaustive_accuracy:.2%}")
+            print(f"   • Aciertos cascada:    {cascade_accuracy:.2%} (mínimo {args.min_accuracy:.2%})")
+        print(f"   • Exhaustiva: {exhaustive_time * 1000:.2f} ms/consulta")
+        print(f"   • Cascada:    {cascade_time * 1000:.2f} ms/consulta")
+
+        if cascade_accuracy is None:
+            if agreement < min_agreement:
+                print("❌ La cascada no reproduce la búsqueda exhaustiva")
+                sys.exit(1)
+            print("✅ La cascada reproduce la búsqueda exhaustiva")
+            return
+
+        if cascade_accuracy < args.min_accuracy or cascade_accuracy < exhaustive_accuracy - args.max_accuracy_drop:
+            print("❌ La cascada falla demasiadas consultas de referencia")
+            sys.exit(1)
+        if agreement < min_agreement:
+            print("❌ La cascada se aleja demasiado de la búsqueda exhaustiva")
+            sys.exit(1)
+        print("✅ La cascada responde las consultas de referencia")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Script para medir la memoria del proceso maestro de gunicorn y de sus
+workers (RSS, PSS y páginas compartidas o privadas) a partir de
+/proc/<pid>/smaps_rollup
+"""
+
+import argparse
+import json
+import os
+import sys
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_rollup(pid):
+    """Leer los contadores de memoria (en KiB) de un proceso"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(':') in FIELDS:
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values
+
+
+def child_pids(pid):
+    """Procesos hijos directos de un proceso"""
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        path = f'/proc/{pid}/task/{task}/children'
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                children.extend(int(child) for child in f.read().split())
+    return children
+
+
+def find_master():
+    """Buscar el proceso maestro de gunicorn (el que no tiene un padre gunicorn)"""
+    candidates = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode(errors='replace')
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except OSError:
+            continue
+        if 'gunicorn' in cmdline:
+            candidates[int(entry)] = ppid
+    masters = [pid for pid, ppid in candidates.items() if ppid not in candidates]
+    return masters[0] if masters else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memoria por worker de gunicorn')
+    parser.add_argument('--pid', type=int, help='PID del proceso maestro (por defecto se busca)')
+    parser.add_argument('--json', action='store_true', help='Salida en JSON')
+    args = parser.parse_args()
+
+    master = args.pid or find_master()
+    if not master:
+        print('No se encontró el proceso maestro de gunicorn')
+        return 1
+
+    rows = [('master', master, read_rollup(master))]
+    rows += [('worker', pid, read_rollup(pid)) for pid in child_pids(master)]
+
+    workers = [values for role, _, values in rows if role == 'worker']
+    totals = {field: sum(values.get(field, 0) for _, _, values in rows) for field in FIELDS}
+
+    if args.json:
+        print(json.dumps({
+            'processes': [{'role': role, 'pid': pid, **values} for role, pid, values in rows],
+            'total': totals
+        }, indent=2))
+        return 0
+
+    print(f"{'rol':<8}{'pid':>8}" + ''.join(f'{field:>15}' for field in FIELDS))
+    for role, pid, values in rows:
+        print(f'{role:<8}{pid:>8}' + ''.join(f'{values.get(field, 0) / 1024:>12.1f} MB' for field in FIELDS))
+    print(f"{'total':<16}" + ''.join(f'{totals[field] / 1024:>12.1f} MB' for field in FIELDS))
+
+    if workers:
+        private = sum(v.get('Private_Clean', 0) + v.get('Private_Dirty', 0) for v in workers) / len(workers)
+        print(f'\nWorkers: {len(workers)}; memoria privada media por worker: {private / 1024:.1f} MB')
+        print('La suma de PSS es la memoria real usada por todos los procesos (lo compartido se reparte)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Aplicación de pruebas con una base de datos SQLite en archivo (los hilos en
+segundo plano abren sus propias conexiones y tienen que ver los mismos datos)
+"""
+
+import pytest
+from flask import Flask
+
+from backend.config import TestingConfig
+from backend.models import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'chatbot.db'}"
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la versión del banco compartida entre procesos
+"""
+
+import pytest
+
+from backend.cli import init_cli
+from backend.database.database_service import DatabaseService
+from backend.models import db, BankVersion, Question
+from backend.services import question_index as question_index_module
+from backend.services.index_store import bank_signature, bump_bank_version, ensure_bank_version, read_bank_version
+from backend.services.question_index import QuestionIndexManager
+
+
+def _manager(app):
+    manager = QuestionIndexManager()
+    manager.init_app(app)
+    manager.version_check_interval = 0.001
+    return manager
+
+
+@pytest.fixture
+def workers(app, monkeypatch):
+    """
+    Dos gestores del índice como los de dos workers de gunicorn; los
+    cambios de esta sesión se aplican al primero
+    """
+    local, other = _manager(app), _manager(app)
+    monkeypatch.setattr(question_index_module, 'question_index', local)
+
+    db.session.add_all([
+        Question(question_text='¿Qué es Docker?', answer_text='Contenedores'),
+        Question(question_text='¿Qué es Python?', answer_text='Un lenguaje'),
+    ])
+    db.session.commit()
+    local.rebuild()
+    other.rebuild()
+    return local, other
+
+
+def _wait_for_rebuild(manager):
+    manager.get()
+    if manager._builder is not None:
+        manager._builder.join(timeout=30)
+    return manager.get()
+
+
+def test_commits_bump_the_bank_version_once_per_transaction(workers):
+    local, _ = workers
+    assert read_bank_version() == local.bank_version == 1
+
+    for question in Question.query.all():
+        question.keywords = 'cambio'
+    db.session.commit()
+    assert read_bank_version() == local.bank_version == 2
+
+    # Los cambios que no afectan al índice no cambian la versión
+    Question.query.first().usage_count = 5
+    db.session.commit()
+    assert read_bank_version() == 2
+
+
+def test_other_process_picks_up_committed_changes(workers):
+    local, other = workers
+    question = Question.query.filter_by(question_text='¿Qué es Docker?').one()
+    question.question_text = '¿Qué es Kubernetes?'
+    db.session.commit()
+
+    assert '¿qué es kubernetes?' in local.get().texts
+    assert '¿qué es kubernetes?' not in other._index.texts
+
+    index = _wait_for_rebuild(other)
+    assert other.bank_version == local.bank_version
+    assert '¿qué es kubernetes?' in index.texts
+    assert index.version > 0
+
+
+def test_missed_versions_force_a_full_rebuild(workers):
+    local, _ = workers
+    # Otro proceso confirmó un cambio que este todavía no ha recogido
+    with db.engine.begin() as connection:
+        bump_bank_version(connection)
+
+    Question.query.first().keywords = 'cambio'
+    db.session.commit()
+    assert local.is_stale
+
+    _wait_for_rebuild(local)
+    assert not local.is_stale
+    assert local.bank_version == read_bank_version() == 3
+
+
+def test_bank_signature_changes_with_indexed_changes_only(workers):
+    signature = bank_signature()
+    Question.query.first().usage_count = 5
+    db.session.commit()
+    assert bank_signature() == signature
+
+    Question.query.first().synonyms = 'contenedor'
+    db.session.commit()
+    assert bank_signature() != signature
+
+
+def test_schema_migrate_creates_the_bank_version_of_old_databases(app, monkeypatch):
+    monkeypatch.setattr(question_index_module, 'question_index', _manager(app))
+    # Base de datos creada antes de que existiera la tabla
+    BankVersion.__table__.drop(db.engine)
+    assert not DatabaseService.add_question('¿Qué es Docker?', 'Contenedores')
+
+    init_cli(app)
+    result = app.test_cli_runner().invoke(args=['schema', 'migrate'])
+    assert result.exit_code == 0 and 'bank_version' in result.output
+    assert read_bank_version() == 0 and not ensure_bank_version()
+
+    assert DatabaseService.add_question('¿Qué es Docker?', 'Contenedores')
+    assert read_bank_version() == 1
+
+
+def test_missing_bank_version_row_is_inserted_by_the_first_bump(app):
+    with db.engine.begin() as connection:
+        assert bump_bank_version(connection) == 1
+        assert bump_bank_version(connection) == 2
+    assert read_bank_version() == 2 and not ensure_bank_version()
+
+
+def test_rebuild_everywhere_is_picked_up_by_other_processes(workers):
+    local, other = workers
+    local.rebuild_everywhere().join(timeout=30)
+    assert local.bank_version == read_bank_version() == 2
+
+    _wait_for_rebuild(other)
+    assert other.bank_version == 2 and not other.is_stale
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la puntuación BM25
+"""
+
+import numpy as np
+
+from backend.services.bm25 import BM25Index
+from backend.services.postings import Postings
+
+FIELDS = ('question', 'keywords', 'synonyms')
+
+
+def build_bm25(alive=None):
+    postings = {
+        'question': Postings.build([
+            ['sistema', 'operativo'],
+            ['sistema', 'docker'],
+            ['sistema', 'red'],
+            ['sistema', 'base', 'dato'],
+        ]),
+        'keywords': Postings.build([[], ['contenedor'], [], []]),
+        'synonyms': Postings.build([[], [], [], []]),
+    }
+    return BM25Index(postings, FIELDS, alive if alive is not None else np.ones(4, dtype=bool))
+
+
+def test_rare_terms_outweigh_common_ones():
+    rows, scores = build_bm25().score(['sistema', 'docker'], (1.0, 0.7, 0.5))
+    assert rows.tolist() == [0, 1, 2, 3]
+    assert int(rows[np.argmax(scores)]) == 1
+    assert scores.max() <= 1.0
+    assert scores[0] < 0.2
+
+
+def test_keywords_field_contributes():
+    rows, scores = build_bm25().score(['contenedor'], (1.0, 0.7, 0.5))
+    assert rows.tolist() == [1]
+    rows, scores = build_bm25().score(['contenedor'], (1.0, 0.0, 0.5))
+    assert rows.tolist() == []
+
+
+def test_deleted_rows_are_skipped():
+    alive = np.array([True, False, True, True])
+    rows, _ = build_bm25(alive).score(['docker', 'red'], (1.0, 0.7, 0.5))
+    assert rows.tolist() == [2]
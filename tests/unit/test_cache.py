@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché LRU con expiración
+"""
+
+import time
+
+from backend.utils.cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # 'b' pasa a ser la menos usada
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache(max_entries=10, ttl=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['expirations'] == 1 and stats['misses'] == 1 and stats['size'] == 0
+
+
+def test_sliding_ttl_is_renewed_on_read():
+    cache = LRUCache(max_entries=10, ttl=0.05, sliding=True)
+    cache.set('a', 1)
+    for _ in range(3):
+        time.sleep(0.03)
+        assert cache.get('a') == 1
+
+
+def test_zero_entries_disables_cache():
+    cache = LRUCache(max_entries=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+    assert len(cache) == 0
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché de la conversación activa de cada sesión
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from backend.models import db, Conversation
+from backend.services.conversation_cache import active_conversation_ids, add_message_counts, conversation_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_conversation_cache():
+    conversation_cache.clear()
+    yield
+    conversation_cache.clear()
+
+
+@pytest.fixture
+def statements(app):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', listener)
+
+
+def _open(session_id, ended_at=None):
+    conversation = Conversation(session_id=session_id, started_at=datetime.utcnow(),
+                                ended_at=ended_at, total_messages=0)
+    db.session.add(conversation)
+    db.session.commit()
+    return conversation.id
+
+
+def test_sessions_are_resolved_with_one_query_and_then_cached(statements):
+    open_id = _open('abierta')
+    _open('cerrada', ended_at=datetime.utcnow())
+
+    statements.clear()
+    found = active_conversation_ids(['abierta', 'cerrada', 'nueva'])
+    db.session.commit()
+
+    selects = [s for s in statements if s.startswith('SELECT')]
+    assert len(selects) == 1
+    assert found['abierta'] == open_id
+    # Las sesiones sin conversación abierta tienen una nueva, creada en la transacción
+    created = Conversation.query.filter_by(session_id='cerrada', ended_at=None).one()
+    assert found['cerrada'] == created.id
+    assert found['nueva'] == Conversation.query.filter_by(session_id='nueva').one().id
+
+    statements.clear()
+    assert active_conversation_ids(['abierta', 'nueva']) == {'abierta': open_id, 'nueva': found['nueva']}
+    assert statements == []
+
+
+def test_forgotten_sessions_are_looked_up_again(statements):
+    conversation_id = _open('sesion')
+    active_conversation_ids(['sesion'])
+
+    conversation_cache.forget(['sesion'])
+    statements.clear()
+    assert active_conversation_ids(['sesion']) == {'sesion': conversation_id}
+    assert len(statements) == 1
+
+
+def test_message_counts_are_added_per_conversation(app):
+    first, second = _open('a'), _open('b')
+    add_message_counts({first: 3, second: 1})
+    add_message_counts({first: 2})
+    db.session.commit()
+
+    db.session.expire_all()
+    assert db.session.get(Conversation, first).total_messages == 5
+    assert db.session.get(Conversation, second).total_messages == 1
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Pruebas del cierre de conversaciones inactivas
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend.models import db, Conversation, Message
+from backend.services.conversation_cache import conversation_cache
+from backend.services.conversation_sweeper import ConversationSweeper
+
+
+@pytest.fixture
+def sweeper(app):
+    conversation_cache.clear()
+    sweeper = ConversationSweeper(idle_timeout=3600, batch_size=2)
+    sweeper.init_app(app)
+    yield sweeper
+    conversation_cache.clear()
+
+
+def _conversation(session_id, started_ago, message_ages=(), total_messages=0):
+    now = datetime.utcnow()
+    conversation = Conversation(session_id=session_id, started_at=now - timedelta(seconds=started_ago),
+                                total_messages=total_messages)
+    db.session.add(conversation)
+    db.session.flush()
+    db.session.add_all(Message(conversation_id=conversation.id, user_input='hola', bot_response='respuesta',
+                               timestamp=now - timedelta(seconds=age))
+                       for age in message_ages)
+    db.session.commit()
+    conversation_cache.set(session_id, conversation.id)
+    return conversation.id
+
+
+def test_idle_conversations_are_closed_and_recounted(sweeper):
+    # total_messages desactualizado a propósito: el barrido lo recalcula
+    idle = _conversation('inactiva', 10000, message_ages=(9000, 8000, 7200), total_messages=1)
+    empty = _conversation('vacia', 7200)
+    old_but_active = _conversation('activa', 10000, message_ages=(9000, 60), total_messages=2)
+    recent = _conversation('reciente', 60)
+    many = [_conversation(f'lote-{i}', 7200, message_ages=(7000,)) for i in range(3)]
+
+    assert sweeper.sweep() == 5
+
+    db.session.expire_all()
+    closed = {conversation.id: conversation for conversation in
+              Conversation.query.filter(Conversation.ended_at.isnot(None))}
+    assert set(closed) == {idle, empty, *many}
+    assert closed[idle].total_messages == 3
+    assert closed[empty].total_messages == 0
+    assert all(closed[conversation_id].total_messages == 1 for conversation_id in many)
+    assert db.session.get(Conversation, old_but_active).ended_at is None
+    assert db.session.get(Conversation, recent).ended_at is None
+
+    # Las sesiones cerradas se olvidan; las abiertas siguen en caché
+    assert conversation_cache.get('inactiva') is None and conversation_cache.get('lote-0') is None
+    assert conversation_cache.get('activa') == old_but_active
+
+    assert sweeper.sweep() == 0
+    assert sweeper.stats()['closed'] == 5 and sweeper.stats()['open_conversations'] == 2
+
+
+def test_conversation_with_a_message_after_the_select_is_not_closed(sweeper):
+    conversation_id = _conversation('reactivada', 7200, message_ages=(7000,))
+    pending = [True]
+
+    def add_message(conn, cursor, statement, *args):
+        # Otro worker guarda un mensaje justo antes del UPDATE
+        if statement.startswith('UPDATE conversations') and pending:
+            pending.clear()
+            with db.engine.begin() as other:
+                other.execute(Message.__table__.insert().values(
+                    conversation_id=conversation_id, user_input='sigo aquí', bot_response='respuesta',
+                    timestamp=datetime.utcnow()))
+
+    event.listen(db.engine, 'before_cursor_execute', add_message)
+    try:
+        assert sweeper.sweep() == 0
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', add_message)
+
+    db.session.expire_all()
+    assert not pending
+    assert db.session.get(Conversation, conversation_id).ended_at is None
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la búsqueda de respuestas del servicio de base de datos
+"""
+
+import pytest
+
+from backend.database import database_service as database_service_module
+from backend.database.database_service import DatabaseService
+from backend.models import db, Question
+from backend.services import question_index as question_index_module
+from backend.services.question_index import QuestionIndex, QuestionIndexManager
+from backend.services.response_cache import NegativeCache, ResponseCache
+
+
+@pytest.fixture
+def bank(app, monkeypatch):
+    manager = QuestionIndexManager()
+    manager.init_app(app)
+    monkeypatch.setattr(question_index_module, 'question_index', manager)
+    monkeypatch.setattr(database_service_module, 'question_index', manager)
+    monkeypatch.setattr(database_service_module, 'response_cache', ResponseCache())
+    monkeypatch.setattr(database_service_module, 'negative_cache', NegativeCache())
+
+    db.session.add(Question(question_text='¿Qué es Docker y para qué sirve?',
+                            answer_text='Una plataforma de contenedores'))
+    db.session.commit()
+    manager.rebuild()
+    return manager
+
+
+def test_search_errors_are_not_cached_as_no_match(bank, monkeypatch):
+    search = QuestionIndex.search
+
+    def fail_once(self, *args, **kwargs):
+        monkeypatch.setattr(QuestionIndex, 'search', search)
+        raise RuntimeError('fallo de búsqueda')
+
+    monkeypatch.setattr(QuestionIndex, 'search', fail_once)
+    failed = DatabaseService.get_best_response('para que sirve docker')
+    assert failed.confidence == 0.0 and failed.question_id is None
+    assert len(database_service_module.negative_cache._cache) == 0
+    assert len(database_service_module.response_cache._cache) == 0
+
+    # La misma entrada se busca de nuevo en cuanto el índice responde
+    result = DatabaseService.get_best_response('para que sirve docker')
+    assert result.question_id is not None and result.confidence >= 0.3
+
+
+def test_pool_failures_fall_back_to_searching_in_process(bank, monkeypatch):
+    def time_out(text, threshold=0.3, index=None):
+        raise TimeoutError()
+
+    monkeypatch.setattr(database_service_module.nlp_pool, 'enabled', True)
+    monkeypatch.setattr(database_service_module.nlp_pool, 'match', time_out)
+
+    result = DatabaseService.get_best_response('para que sirve docker')
+    assert result.question_id is not None and result.confidence >= 0.3
+    assert result.keywords
+    assert len(database_service_module.negative_cache._cache) == 0
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Pruebas del formato en disco del índice de preguntas
+"""
+
+import numpy as np
+import pytest
+
+from backend.services.index_store import IndexFormatError, StringColumn, load_index, save_index
+from backend.services.postings import Postings
+from backend.services.question_index import QuestionIndex
+
+
+def build_index():
+    texts = ['¿qué es docker?', 'qué es git', 'inteligencia artificial']
+    tokens = [['docker'], ['git'], ['inteligencia', 'artificial']]
+    trigram_offsets = np.array([0, 3, 5, 8], dtype=np.int64)
+    trigram_values = np.array([1, 2, 3, 2, 4, 5, 6, 7], dtype=np.int64)
+    postings = {
+        'question': Postings.build(tokens),
+        'keywords': Postings.build([['contenedor'], [], ['ia']]),
+        'synonyms': Postings.build([[], [], []]),
+        'trigrams': Postings.from_csr(trigram_offsets, trigram_values),
+    }
+    vectors = np.eye(3, 4, dtype=np.float32)
+    token_counts = np.array([len(t) for t in tokens], dtype=np.int32)
+    return QuestionIndex([10, 20, 30], texts, vectors, postings, token_counts, trigram_offsets, trigram_values)
+
+
+def test_string_column_roundtrip():
+    values = ['año', '', 'pregunta larga']
+    column = StringColumn.encode(values)
+    assert len(column) == 3
+    assert column[0] == 'año'
+    assert list(column) == values
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    index = build_index()
+    path = str(tmp_path / 'index.qidx')
+    save_index(index, path, 'es_core_news_sm', 'firma')
+
+    loaded, header = load_index(path)
+    assert header['model_name'] == 'es_core_news_sm'
+    assert header['bank_signature'] == 'firma'
+    assert loaded.ids.tolist() == [10, 20, 30]
+    assert list(loaded.texts) == list(index.texts)
+    assert loaded.exact == index.exact
+    assert np.array_equal(loaded.vectors, index.vectors)
+    for field in ('question', 'keywords', 'synonyms', 'trigrams'):
+        assert loaded.postings[field].vocab == index.postings[field].vocab
+    assert loaded.postings['question'].get('inteligencia').tolist() == [2]
+    assert loaded.postings['trigrams'].get(2).tolist() == [0, 1]
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / 'otro.bin'
+    path.write_bytes(b'no es un indice')
+    with pytest.raises(IndexFormatError):
+        load_index(str(path))
+
+
+def test_ann_roundtrip(tmp_path):
+    index = build_index().build_ann(n_lists=2)
+    path = str(tmp_path / 'index.qidx')
+    save_index(index, path, 'es_core_news_sm', 'firma')
+
+    loaded, _ = load_index(path)
+    assert np.array_equal(loaded.ann.centroids, index.ann.centroids)
+    for cluster in range(2):
+        assert loaded.ann.lists.get(cluster).tolist() == index.ann.lists.get(cluster).tolist()
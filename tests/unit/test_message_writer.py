@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Pruebas del registro de mensajes en segundo plano
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from backend.models import db, Conversation, Message
+from backend.services import message_writer as message_writer_module
+from backend.services.conversation_cache import conversation_cache
+from backend.services.message_writer import MessageRecord, MessageWriter
+
+
+@pytest.fixture(autouse=True)
+def clear_conversation_cache():
+    conversation_cache.clear()
+    yield
+    conversation_cache.clear()
+
+
+@pytest.fixture
+def writer(app, monkeypatch):
+    writer = MessageWriter(batch_size=100)
+    writer.init_app(app)
+    # Sin hilo de escritura: los lotes se guardan solo con flush()
+    monkeypatch.setattr(writer, '_ensure_worker', lambda: None)
+    return writer
+
+
+def _record(session_id, text='hola'):
+    return MessageRecord(session_id=session_id, user_input=text, bot_response='respuesta',
+                         intent_detected='question', confidence_score=0.5, response_time=0.01,
+                         keywords_extracted='hola')
+
+
+def _count_inserts(statements):
+    return sum(1 for statement in statements if statement.startswith('INSERT INTO messages'))
+
+
+def test_batch_is_saved_with_one_insert_and_creates_conversations(writer):
+    existing = Conversation(session_id='existente', started_at=datetime.utcnow(), total_messages=2)
+    db.session.add(existing)
+    db.session.commit()
+
+    for session_id in ('existente', 'existente', 'nueva', 'existente', 'nueva'):
+        assert writer.submit(_record(session_id))
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert writer.flush()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert _count_inserts(statements) == 1
+    db.session.expire_all()
+    created = Conversation.query.filter_by(session_id='nueva').one()
+    assert db.session.get(Conversation, existing.id).total_messages == 5
+    assert created.total_messages == 2 and created.ended_at is None
+    assert Message.query.filter_by(conversation_id=existing.id).count() == 3
+    assert conversation_cache.get('nueva') == created.id
+    assert writer.stats()['written'] == 5 and writer.stats()['batches'] == 1
+
+
+def test_pending_messages_are_flushed_at_exit(app, monkeypatch):
+    registered = []
+    monkeypatch.setattr(message_writer_module.atexit, 'register', registered.append)
+    app.config['MESSAGE_WRITER_ENABLED'] = True
+    writer = MessageWriter()
+    writer.init_app(app)
+    monkeypatch.setattr(writer, '_ensure_worker', lambda: None)
+
+    writer.submit(_record('salida'))
+    writer.submit(_record('salida'))
+    assert Message.query.count() == 0
+
+    assert registered == [writer.flush]
+    registered[0]()
+    assert Message.query.count() == 2
+    assert writer.stats()['queue_depth'] == 0
+
+
+def test_failed_batch_forgets_conversations_created_in_it(writer, monkeypatch):
+    def fail(counts):
+        raise RuntimeError('fallo al contar')
+
+    add_message_counts = message_writer_module.add_message_counts
+    monkeypatch.setattr(message_writer_module, 'add_message_counts', fail)
+    writer.submit(_record('fallida'))
+    writer.flush()
+
+    # La conversación creada en la transacción deshecha no existe ni queda en caché
+    assert conversation_cache.get('fallida') is None
+    assert Conversation.query.filter_by(session_id='fallida').count() == 0
+    assert Message.query.count() == 0
+    assert writer.stats()['failed'] == 1
+
+    monkeypatch.setattr(message_writer_module, 'add_message_counts', add_message_counts)
+    writer.submit(_record('fallida'))
+    writer.flush()
+    assert Conversation.query.filter_by(session_id='fallida').one().total_messages == 1
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la normalización y la similitud por trigramas
+"""
+
+from backend.utils.ngrams import char_trigrams, trigram_similarity
+from backend.utils.normalization import normalize_text
+
+
+def test_normalize_text_folds_accents_and_punctuation():
+    assert normalize_text('  ¿Qué es   la Programación? ') == 'que es la programacion'
+    assert normalize_text('¡Hola!') == 'hola'
+    assert normalize_text('') == ''
+
+
+def test_trigrams_ignore_case_accents_and_punctuation():
+    assert char_trigrams('¿Qué es Docker?').tolist() == char_trigrams('que es docker').tolist()
+
+
+def test_trigram_similarity_tolerates_typos():
+    exact = char_trigrams('que es inteligencia artificial')
+    typo = char_trigrams('que es inteligenci artifical')
+    other = char_trigrams('como instalar docker')
+
+    assert trigram_similarity(exact, exact) == 1.0
+    assert trigram_similarity(exact, typo) > 0.7
+    assert trigram_similarity(exact, other) < 0.3
+    assert trigram_similarity(char_trigrams(''), char_trigrams('')) == 0.0
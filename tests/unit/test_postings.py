@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Pruebas del índice invertido de preguntas
+"""
+
+import numpy as np
+import pytest
+
+from backend.services.postings import Postings
+
+
+def build_postings():
+    return Postings.build([
+        ['inteligencia', 'artificial'],
+        ['aprendizaje', 'automático', 'inteligencia'],
+        [],
+        ['docker', 'contenedor'],
+    ])
+
+
+def test_get_returns_rows_for_term():
+    postings = build_postings()
+    assert postings.get('inteligencia').tolist() == [0, 1]
+    assert postings.get('docker').tolist() == [3]
+    assert postings.get('inexistente').tolist() == []
+
+
+def test_union_deduplicates_rows():
+    postings = build_postings()
+    assert postings.union(['inteligencia', 'artificial', 'contenedor']).tolist() == [0, 1, 3]
+    assert postings.union(['nada']).tolist() == []
+
+
+def test_count_matches_counts_shared_terms_per_row():
+    postings = build_postings()
+    counts = postings.count_matches(['inteligencia', 'artificial', 'inteligencia'], 4)
+    assert counts.tolist() == [2, 1, 0, 0]
+
+
+def test_add_rows_keeps_original_and_adds_delta():
+    postings = build_postings()
+    extended = postings.add_rows([['docker', 'kubernetes']], first_row=4)
+    assert extended.get('docker').tolist() == [3, 4]
+    assert extended.get('kubernetes').tolist() == [4]
+    assert 'kubernetes' not in postings
+    assert postings.get('docker').tolist() == [3]
+
+
+def test_compact_drops_rows_and_renumbers():
+    postings = build_postings().add_rows([['docker', 'kubernetes']], first_row=4)
+    keep = np.array([True, False, True, False, True])
+    compacted = postings.compact(keep)
+    assert compacted.delta == {}
+    assert compacted.get('inteligencia').tolist() == [0]
+    assert compacted.get('docker').tolist() == [2]
+    assert compacted.get('kubernetes').tolist() == [2]
+    assert 'aprendizaje' not in compacted
+
+
+def _question(question_id, text, keywords=None, synonyms=None):
+    from types import SimpleNamespace
+    return SimpleNamespace(id=question_id, question_text=text, keywords=keywords, synonyms=synonyms)
+
+
+def _by_id(index):
+    """Contenido del índice por id de pregunta (el orden de las filas no importa)"""
+    rows = {int(question_id): row for row, question_id in enumerate(index.ids) if index.alive[row]}
+    postings = {
+        name: {term: sorted(int(index.ids[row]) for row in postings.get(term) if index.alive[row])
+               for term in set(postings.vocab) | set(postings.delta)}
+        for name, postings in index.postings.items()
+    }
+    return {
+        'texts': {question_id: index.texts[row] for question_id, row in rows.items()},
+        'vectors': {question_id: index.vectors[row].tolist() for question_id, row in rows.items()},
+        'token_counts': {question_id: int(index.token_counts[row]) for question_id, row in rows.items()},
+        'trigrams': {question_id: index.trigram_values[index.trigram_offsets[row]:index.trigram_offsets[row + 1]].tolist()
+                     for question_id, row in rows.items()},
+        'postings': {name: {term: ids for term, ids in terms.items() if ids} for name, terms in postings.items()},
+        'exact': index.exact,
+    }
+
+
+def test_incremental_changes_and_compaction_match_a_fresh_build():
+    from backend.services.question_index import MatchSettings, QuestionChange, QuestionIndex
+
+    bank = {
+        1: _question(1, '¿Qué es Docker?', 'docker, contenedor'),
+        2: _question(2, 'que es docker', None, 'contenedores'),
+        3: _question(3, '¿Qué es git?', 'git, control de versiones'),
+        4: _question(4, '¿Qué es la inteligencia artificial?', 'ia', 'ai'),
+    }
+    index = QuestionIndex.build(list(bank.values()))
+
+    # Edición, alta, borrado y desactivación (la 1 y la 2 tienen la misma redacción)
+    bank[1] = _question(1, '¿Qué es Kubernetes?', 'kubernetes, k8s')
+    bank[5] = _question(5, '¿Cómo se crea una rama en git?', 'git, rama')
+    changes = [
+        QuestionChange(1, bank[1].question_text, bank[1].keywords),
+        QuestionChange(5, bank[5].question_text, bank[5].keywords),
+        QuestionChange(3, deleted=True),
+        QuestionChange(4, bank[4].question_text, bank[4].keywords, bank[4].synonyms, is_active=False),
+    ]
+    del bank[3], bank[4]
+    updated = index.apply(changes[:2], version=1).apply(changes[2:], version=2)
+    fresh = QuestionIndex.build(sorted(bank.values(), key=lambda q: q.id))
+
+    assert _by_id(updated) == _by_id(fresh)
+    compacted = updated.compact()
+    assert compacted.pending_changes == 0
+    assert _by_id(compacted) == _by_id(fresh)
+
+    settings = MatchSettings()
+    for query in ('que es docker', 'kubernetes', 'rama de git', 'inteligencia artificial', 'dokcer'):
+        for candidate in (updated, compacted):
+            assert candidate.search(query, threshold=0.0, settings=settings) == \
+                pytest.approx(fresh.search(query, threshold=0.0, settings=settings))
+
+
+def test_search_many_in_chunks_matches_a_single_pass(monkeypatch):
+    from backend.services import question_index as question_index_module
+    from backend.services.question_index import MatchSettings, QuestionIndex
+    from backend.utils.preprocessing import processor
+
+    index = QuestionIndex.build([
+        _question(1, '¿Qué es Docker?', 'docker, contenedor'),
+        _question(2, '¿Qué es git?', 'git, control de versiones'),
+        _question(3, '¿Qué es la inteligencia artificial?', 'ia', 'ai'),
+    ])
+    analyses = processor.analyze_many(['que es docker', 'git', 'inteligencia', 'dokcer', 'paella'])
+    settings = MatchSettings()
+    single = index.search_many(analyses, threshold=0.0, top_k=2, settings=settings)
+
+    # Una entrada por tramo
+    monkeypatch.setattr(question_index_module, 'SEARCH_MANY_MAX_CELLS', len(index))
+    chunked = index.search_many(analyses, threshold=0.0, top_k=2, settings=settings)
+
+    assert [[question_id for question_id, _ in matches] for matches in chunked] == \
+        [[question_id for question_id, _ in matches] for matches in single]
+    for got, expected in zip(chunked, single):
+        assert [score for _, score in got] == pytest.approx([score for _, score in expected], abs=1e-6)
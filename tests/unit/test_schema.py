@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Pruebas de las sentencias de creación de índices
+"""
+
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from backend.database import schema
+from backend.database.schema import create_index_sql
+from backend.models import Message
+
+
+def _index(name):
+    return next(index for index in Message.__table__.indexes if index.name == name)
+
+
+def test_postgresql_creates_indexes_concurrently():
+    sql = create_index_sql(_index('ix_messages_conversation_id_timestamp'), postgresql.dialect())
+    assert sql == ('CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_conversation_id_timestamp '
+                   'ON messages (conversation_id, timestamp)')
+
+
+def test_other_dialects():
+    index = _index('ix_messages_timestamp')
+    assert create_index_sql(index, sqlite.dialect()) == \
+        'CREATE INDEX IF NOT EXISTS ix_messages_timestamp ON messages (timestamp)'
+    assert create_index_sql(index, mysql.dialect()).endswith('ALGORITHM=INPLACE LOCK=NONE')
+
+
+def test_invalid_postgresql_indexes_are_dropped_and_recreated(monkeypatch):
+    index = _index('ix_messages_timestamp')
+    engine = SimpleNamespace(dialect=postgresql.dialect())
+    monkeypatch.setattr(schema, 'invalid_indexes', lambda engine=None: {'ix_messages_timestamp'})
+    monkeypatch.setattr(schema, 'missing_indexes', lambda engine=None: [index])
+
+    assert schema.create_missing_indexes(engine, dry_run=True) == [
+        'DROP INDEX CONCURRENTLY IF EXISTS ix_messages_timestamp',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_messages_timestamp ON messages (timestamp)',
+    ]
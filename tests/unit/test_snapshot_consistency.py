@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Pruebas de que el microlote y el pool NLP buscan en la instantánea del
+índice que tomó la petición
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from backend.services import nlp_pool as nlp_pool_module
+from backend.services.micro_batcher import MicroBatcher
+from backend.services.nlp_pool import NLPWorkerPool
+from backend.services.question_index import QuestionIndex
+from backend.utils.preprocessing import processor
+
+
+def _snapshot(version, text):
+    return QuestionIndex.build([SimpleNamespace(id=1, question_text=text, keywords=None, synonyms=None)],
+                               version=version)
+
+
+def test_micro_batcher_scores_each_job_with_its_snapshot(app):
+    old, new = _snapshot(1, '¿Qué es Docker?'), _snapshot(2, '¿Qué es Python?')
+    batcher = MicroBatcher(window_ms=50)
+    batcher.init_app(app)
+
+    futures = [
+        batcher.submit(processor.analyze('que es docker'), threshold=0.5, index=old),
+        batcher.submit(processor.analyze('que es docker'), threshold=0.5, index=new),
+    ]
+    (old_id, old_score), (new_id, new_score) = [future.result(timeout=30) for future in futures]
+
+    assert old_id == 1 and old_score > 0.7
+    assert new_id is None and new_score == 0.0
+
+
+def test_pool_result_from_another_version_is_recomputed_with_the_snapshot(monkeypatch):
+    snapshot = _snapshot(3, '¿Qué es Docker?')
+    pool = NLPWorkerPool()
+    pool._index = snapshot
+    monkeypatch.setattr(pool, '_get_executor', lambda: None)
+    stale = [{'question_id': 99, 'confidence': 1.0, 'keywords': []}]
+
+    monkeypatch.setattr(pool, '_run', lambda fn, *args: (snapshot.version, stale))
+    assert pool.match_many(['que es docker'], index=snapshot) == stale
+
+    # Los procesos respondieron con otra versión
+    monkeypatch.setattr(pool, '_run', lambda fn, *args: (snapshot.version - 1, stale))
+    question_id, confidence, _ = pool.match('que es docker', index=snapshot)
+    assert question_id == 1 and confidence > 0.7
+
+    # El pool ya tiene otra versión: ni se le envía el trabajo
+    pool._index = _snapshot(2, '¿Qué es Docker?')
+    monkeypatch.setattr(pool, '_run', lambda fn, *args: pytest.fail('no debe usarse el pool'))
+    assert pool.match('que es docker', index=snapshot)[0] == 1
+    assert pool.stats()['version_mismatches'] == 2
+
+
+class FakeExecutor:
+    def __init__(self, index):
+        self.index = index
+        self.shut_down = False
+
+    def map(self, fn, values):
+        return [self.index.version for _ in values]
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_pool_is_replaced_in_the_background_when_the_index_changes(monkeypatch):
+    old, new = _snapshot(1, '¿Qué es Docker?'), _snapshot(2, '¿Qué es Python?')
+    current = [old]
+    monkeypatch.setattr(nlp_pool_module.question_index, 'get', lambda: current[0])
+    pool = NLPWorkerPool()
+    monkeypatch.setattr(pool, '_create_executor', FakeExecutor)
+
+    first = pool._get_executor()
+    assert first.index is old and pool._get_executor() is first
+
+    # Con otra versión se sigue usando el pool actual mientras se prepara el nuevo
+    current[0] = new
+    assert pool._get_executor() is first
+    pool._replacement.join(timeout=10)
+
+    replacement = pool._get_executor()
+    assert replacement.index is new and first.shut_down and not replacement.shut_down
+    assert pool.stats()['recycles'] == 1
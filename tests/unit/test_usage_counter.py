@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Pruebas de los contadores de uso acumulados
+"""
+
+import threading
+
+from sqlalchemy import event
+
+from backend.models import db, Question
+from backend.services.usage_counter import UsageCounter
+
+
+class FakeQuestion:
+    __tablename__ = 'questions'
+
+
+class FakeResponse:
+    __tablename__ = 'responses'
+
+
+def test_increments_are_grouped_by_table_and_row():
+    counter = UsageCounter()
+    counter.add(FakeQuestion, 1)
+    counter.add(FakeQuestion, 1)
+    counter.add(FakeQuestion, 2, delta=3)
+    counter.add(FakeResponse, 1)
+
+    assert counter.pending(FakeQuestion, 1) == 2
+    assert counter._take() == {'questions': {1: 2, 2: 3}, 'responses': {1: 1}}
+    assert counter.pending(FakeQuestion, 1) == 0
+    assert counter._take() == {}
+
+
+def test_concurrent_increments_are_added_to_the_stored_counts(app):
+    questions = [Question(question_text=f'Pregunta {i}', answer_text='Respuesta', usage_count=10)
+                 for i in range(2)]
+    db.session.add_all(questions)
+    db.session.commit()
+    first, second = (question.id for question in questions)
+
+    counter = UsageCounter()
+    counter.init_app(app)
+    counter._ensure_worker = lambda: None  # Sin hilo: se guarda solo con flush()
+
+    def count(row_id, times):
+        for _ in range(times):
+            counter.add(Question, row_id)
+
+    threads = [threading.Thread(target=count, args=(row_id, 250))
+               for row_id in (first, first, second, first)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Otro worker guardó sus incrementos entre medias: se suman, no se sobrescriben
+    db.session.execute(db.update(Question).where(Question.id == first).values(usage_count=Question.usage_count + 5))
+    db.session.commit()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert counter.flush() == 2
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    updates = [s for s in statements if s.startswith('UPDATE questions')]
+    # Un solo UPDATE (executemany) que suma sobre el valor guardado
+    assert len(updates) == 1 and 'coalesce(questions.usage_count' in updates[0]
+    db.session.expire_all()
+    assert db.session.get(Question, first).usage_count == 10 + 750 + 5
+    assert db.session.get(Question, second).usage_count == 10 + 250
+    assert counter.flush() == 0 and counter.stats()['rows_updated'] == 2
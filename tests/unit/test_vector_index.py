@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Pruebas del índice IVF de vectores
+"""
+
+import numpy as np
+
+from backend.services.vector_index import IVFIndex
+
+
+def clustered_vectors(n_rows=600, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(12, dim))
+    vectors = centers[rng.integers(0, len(centers), n_rows)] + 0.3 * rng.normal(size=(n_rows, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_probing_every_list_is_exact():
+    vectors = clustered_vectors()
+    ann = IVFIndex.train(vectors, n_lists=10)
+    query = vectors[42]
+    rows, scores = ann.search(query, vectors, k=5, n_probe=len(ann))
+    exact = np.argsort(-(vectors @ query))[:5]
+    assert rows.tolist() == exact.tolist()
+    assert scores[0] >= scores[-1]
+
+
+def test_added_rows_are_searchable():
+    vectors = clustered_vectors()
+    ann = IVFIndex.train(vectors[:500], n_lists=10).add(vectors[500:], first_row=500)
+    rows, _ = ann.search(vectors[550], vectors, k=1, n_probe=2)
+    assert rows.tolist() == [550]
+
+
+def test_compact_skips_deleted_rows():
+    vectors = clustered_vectors()
+    ann = IVFIndex.train(vectors, n_lists=10)
+    keep = np.ones(len(vectors), dtype=bool)
+    keep[42] = False
+    rows, _ = ann.compact(keep).search(vectors[42], vectors[keep], k=1, n_probe=len(ann))
+    assert rows.tolist() != [42]
+    assert len(ann.compact(keep).lists.rows) == len(vectors) - 1